@@ -6,7 +6,8 @@ Adds a small selection of popular courses including dialogues courses.
 
 import sys
 from sqlalchemy.orm import Session
-from database import SessionLocal, School, Course, Professor, Book, Rating
+from database import SessionLocal, School, Course
+from import_courses import CourseImporter
 from sqlalchemy import func
 
 # Comprehensive selection of Truman State University courses
@@ -180,48 +181,17 @@ def get_or_create_school(db: Session, school_name: str) -> School:
     return school
 
 
-def course_exists(db: Session, school_id: int, course_number: str) -> bool:
-    """Check if a course already exists"""
-    existing = db.query(Course).filter(
-        Course.school_id == school_id,
-        Course.course_number == course_number
-    ).first()
-    return existing is not None
-
-
 def add_courses(db: Session, school: School):
     """Add courses to the database"""
-    added_count = 0
-    skipped_count = 0
+    importer = CourseImporter(db, chunk_size=len(COURSES) or 1)
+    for line_number, course_data in enumerate(COURSES, start=1):
+        importer.add(line_number, course_data, default_school=school.school_name)
+    importer.finish()
     
-    for course_data in COURSES:
-        # Check if course already exists
-        if course_exists(db, school.school_id, course_data["course_number"]):
-            print(f"⊘ Skipping {course_data['course_number']} - already exists")
-            skipped_count += 1
-            continue
-        
-        # Create course
-        course = Course(
-            course_name=course_data["course_name"],
-            course_number=course_data["course_number"],
-            major=course_data["major"],
-            school_id=school.school_id,
-            dialogues_requirement=course_data["dialogues_requirement"],
-            delivery_mode=course_data["delivery_mode"]
-        )
-        
-        db.add(course)
-        db.commit()
-        db.refresh(course)
-        
-        print(f"✓ Added: {course_data['course_number']} - {course_data['course_name']} ({course_data['major']})")
-        if course_data["dialogues_requirement"]:
-            print(f"  └─ Dialogues: {course_data['dialogues_requirement']}")
-        
-        added_count += 1
+    for line_number, message in importer.errors:
+        print(f"✗ Entry {line_number}: {message}")
     
-    return added_count, skipped_count
+    return importer.added, importer.skipped
 
 
 def main():
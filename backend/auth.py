@@ -1,20 +1,127 @@
+"""
+Password hashing, JWT issuing and the auth dependencies.
+
+AUTH_MODE selects how a bearer token becomes a user:
+
+- database (default): verify the token, then load the user row on every
+  request.
+- stateless: trust the role claim of a verified token. Verified tokens are
+  kept in a bounded LRU (AUTH_TOKEN_CACHE_SIZE, default 4096), so repeat
+  requests skip both the signature check and the database.
+
+In both modes each token carries the user's token version ("ver"), and
+tokens with a version below user.token_version are rejected.
+revoke_tokens bumps the stored version, which invalidates every token
+issued to the user before it in every worker. Database mode checks the
+version on the user row it loads anyway; stateless mode caches versions
+for AUTH_TOKEN_VERSION_TTL_SECONDS (default 5), so a revoked token can be
+accepted by another worker for up to that long.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from database import get_db, User, UserRole
+from database import get_request_db, run_db, User, UserRole
 
 # Security configuration
 SECRET_KEY = "your-secret-key-change-in-production"  # Change this in production!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+AUTH_MODE = os.getenv("AUTH_MODE", "database").lower()
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+AUTH_TOKEN_VERSION_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_VERSION_TTL_SECONDS", "5"))
+
 security = HTTPBearer()
 
 
+class TokenUser:
+    """The user described by a verified token's claims"""
+
+    def __init__(self, username: str, role: UserRole, version: int):
+        self.username = username
+        self.role = role
+        self.version = version
+
+
+class TokenStore:
+    """Bounded LRU of verified tokens plus recently read user token versions"""
+
+    def __init__(self, max_entries: int, version_ttl: float):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self._lock = threading.Lock()
+        self._verified = OrderedDict()   # token -> (TokenUser, expires at)
+        self._versions = OrderedDict()   # username -> (token version, read at)
+
+    def get(self, token: str) -> Optional[TokenUser]:
+        with self._lock:
+            entry = self._verified.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if time.time() >= expires_at:
+                del self._verified[token]
+                return None
+            self._verified.move_to_end(token)
+            return user
+
+    def put(self, token: str, user: TokenUser, expires_at: float):
+        with self._lock:
+            self._verified[token] = (user, expires_at)
+            self._verified.move_to_end(token)
+            while len(self._verified) > self.max_entries:
+                self._verified.popitem(last=False)
+
+    def version(self, username: str) -> Optional[int]:
+        """The user's cached token version, or None if it is unknown or too old"""
+        with self._lock:
+            entry = self._versions.get(username)
+            if entry is None or time.monotonic() - entry[1] >= self.version_ttl:
+                return None
+            return entry[0]
+
+    def put_version(self, username: str, version: int):
+        with self._lock:
+            self._versions[username] = (version, time.monotonic())
+            self._versions.move_to_end(username)
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+
+token_store = TokenStore(AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_VERSION_TTL_SECONDS)
+
+
+def get_token_version(db: Session, username: str) -> Optional[int]:
+    """The user's current token version; None if the user does not exist"""
+    return db.query(User.token_version).filter(User.username == username).scalar()
+
+
+def revoke_tokens(db: Session, username: str):
+    """Invalidate every token issued to username so far"""
+    db.execute(
+        update(User).where(User.username == username).values(token_version=User.token_version + 1)
+    )
+    db.commit()
+    version = get_token_version(db, username)
+    if version is not None:
+        token_store.put_version(username, version)
+
+
+def _jose():
+    """python-jose loads every key backend on import (tens of ms), so import it on first use"""
+    from jose import JWTError, jwt
+    return jwt, JWTError
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash"""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -34,14 +141,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    jwt, _ = _jose()
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def get_current_user(
+def get_user_by_username(db: Session, username: str) -> Optional[User]:
+    return db.query(User).filter(User.username == username).first()
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_request_db)
 ):
     """Get the current authenticated user"""
     credentials_exception = HTTPException(
@@ -50,22 +162,51 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    token = credentials.credentials
+    claims = token_store.get(token)
+    if claims is None:
+        claims = _verify_token(token)
+        if claims is None:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    # Revocation is checked on every request, cached or not
+    if AUTH_MODE == "stateless":
+        version = token_store.version(claims.username)
+        if version is None:
+            version = await run_db(db, get_token_version, claims.username)
+            if version is None:
+                raise credentials_exception
+            token_store.put_version(claims.username, version)
+        if claims.version < version:
+            raise credentials_exception
+        return claims
+    
+    user = await run_db(db, get_user_by_username, claims.username)
+    if user is None or claims.version < user.token_version:
         raise credentials_exception
     
     return user
 
 
+def _verify_token(token: str) -> Optional[TokenUser]:
+    """Check a token's signature and expiry, caching its claims; None if invalid"""
+    jwt, JWTError = _jose()
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username = payload.get("sub")
+        role = UserRole(payload.get("role"))
+        version = int(payload.get("ver", 0))
+        expires_at = float(payload["exp"])
+    except (JWTError, ValueError, KeyError, TypeError):
+        return None
+    if username is None:
+        return None
+    
+    claims = TokenUser(username, role, version)
+    token_store.put(token, claims, expires_at)
+    return claims
+
+
 def get_current_admin(
     current_user: User = Depends(get_current_user)
 ):
@@ -0,0 +1,100 @@
+"""
+Lifecycle of the in-process indexes built from the database (search.py,
+suggest.py).
+
+A BackgroundIndex is built in a daemon thread with its own sessions when
+the worker starts, retried every BUILD_RETRY_SECONDS until the database
+answers, and optionally caught up every refresh_seconds after that.
+Requests that need the index wait up to wait_seconds for the first build
+and get a 503 with Retry-After if it has not finished, or right away if
+the last attempt failed.
+
+Subclasses implement build(db), which replaces the index contents, and
+catch_up(db) if they refresh.
+"""
+
+import threading
+import time
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from database import SessionLocal
+
+# Seconds between attempts to build an index after a failure
+BUILD_RETRY_SECONDS = 5
+
+
+class BackgroundIndex:
+    def __init__(self, name: str, wait_seconds: float, refresh_seconds: Optional[float] = None):
+        self.name = name
+        self.wait_seconds = wait_seconds
+        self.refresh_seconds = refresh_seconds
+        self._started = False
+        self.ready = threading.Event()
+        # Why the last build attempt failed, until a build succeeds
+        self.build_error = None
+
+    def build(self, db: Session):
+        raise NotImplementedError
+
+    def catch_up(self, db: Session):
+        raise NotImplementedError
+
+    def start(self):
+        """Build, retrying until it succeeds, then keep catching up; in a daemon thread"""
+        if self._started:
+            return
+        self._started = True
+        threading.Thread(target=self._run, name=f"{self.name.replace(' ', '-')}-index", daemon=True).start()
+
+    def _run(self):
+        while True:
+            db = SessionLocal()
+            try:
+                self.build(db)
+                self.build_error = None
+                break
+            except Exception as e:
+                self.build_error = e
+                print(f"Warning: Could not build the {self.name} index, retrying in {BUILD_RETRY_SECONDS}s: {e}")
+            finally:
+                db.close()
+            time.sleep(BUILD_RETRY_SECONDS)
+        self.ready.set()
+
+        while self.refresh_seconds is not None:
+            time.sleep(self.refresh_seconds)
+            db = SessionLocal()
+            try:
+                self.catch_up(db)
+            except Exception as e:
+                print(f"Warning: Could not refresh the {self.name} index: {e}")
+            finally:
+                db.close()
+
+    def wait_until_ready(self) -> bool:
+        """Wait up to wait_seconds for the first build; False if it failed or is still running"""
+        if self.ready.is_set():
+            return True
+        if self.build_error is not None:
+            return False
+        return self.ready.wait(self.wait_seconds)
+
+    def unavailable(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The {self.name} index is starting up, try again shortly",
+            headers={"Retry-After": str(BUILD_RETRY_SECONDS)},
+        )
+
+    def require_ready(self):
+        """Wait for the first build; 503 if it is not ready"""
+        if not self.wait_until_ready():
+            raise self.unavailable()
+
+    async def wait_ready(self):
+        """require_ready, waiting off the event loop"""
+        if not self.ready.is_set():
+            if not await run_in_threadpool(self.wait_until_ready):
+                raise self.unavailable()
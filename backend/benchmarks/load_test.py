@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for the RateMyClass API.
+
+Drives the real app with concurrent clients over a weighted mix of read
+and write endpoints and writes per-endpoint throughput and p50/p95/p99
+latency to a JSON file with stable key order, so two runs can be diffed.
+
+By default the app is loaded in-process (httpx ASGITransport, startup
+events included) against DATABASE_URL; pass --url to hit a running
+server instead. Seed the database first with benchmarks/seed.py.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --reset
+    DATABASE_URL=sqlite:///bench.db python benchmarks/load_test.py --requests 5000 --concurrency 20
+    python benchmarks/load_test.py --url http://localhost:8000 --duration 60 --output after.json
+    python benchmarks/load_test.py --endpoints list_courses,course_detail --output reads.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx
+from seed import SUBJECTS
+
+ADMIN_USERNAME = "courseadmin"
+ADMIN_PASSWORD = "password"
+
+
+class Context:
+    """Ids discovered before the run, shared by every client"""
+
+    def __init__(self, school_ids, course_ids, token):
+        self.school_ids = school_ids
+        self.course_ids = course_ids
+        self.admin_headers = {"Authorization": f"Bearer {token}"}
+        self.created = 0
+
+
+def list_courses(client, ctx, rng):
+    return client.get("/courses", params={"limit": 50})
+
+
+def search_courses(client, ctx, rng):
+    return client.get("/courses", params={"search": rng.choice(SUBJECTS).split()[0][:4], "limit": 50})
+
+
+def filter_courses(client, ctx, rng):
+    return client.get("/courses", params={"school_id": rng.choice(ctx.school_ids), "limit": 50})
+
+
+def get_course(client, ctx, rng):
+    return client.get(f"/courses/{rng.choice(ctx.course_ids)}")
+
+
+def course_detail(client, ctx, rng):
+    return client.get(f"/courses/{rng.choice(ctx.course_ids)}/detail", params={"limit": 20})
+
+
+def list_schools(client, ctx, rng):
+    return client.get("/schools")
+
+
+def school_courses(client, ctx, rng):
+    return client.get(f"/schools/{rng.choice(ctx.school_ids)}/courses")
+
+
+def create_rating(client, ctx, rng):
+    return client.post("/ratings", json={
+        "course_id": rng.choice(ctx.course_ids),
+        "rating": rng.randint(1, 5),
+        "review": "Load test review",
+        "textbook": rng.choice([None, f"{rng.choice(SUBJECTS)} Volume {rng.randrange(1000)}"]),
+    })
+
+
+def create_course(client, ctx, rng):
+    ctx.created += 1
+    return client.post("/courses", headers=ctx.admin_headers, json={
+        "course_name": f"Load Test Course {ctx.created}",
+        "course_number": f"LOAD {rng.randrange(10 ** 9)}",
+        "major": "Computer Science",
+        "school_name": "Benchmark University 1",
+        "delivery_mode": "Online",
+    })
+
+
+# name -> (request function, relative weight)
+ENDPOINTS = {
+    "list_courses": (list_courses, 20),
+    "search_courses": (search_courses, 15),
+    "filter_courses": (filter_courses, 10),
+    "get_course": (get_course, 15),
+    "course_detail": (course_detail, 20),
+    "list_schools": (list_schools, 5),
+    "school_courses": (school_courses, 5),
+    "create_rating": (create_rating, 9),
+    "create_course": (create_course, 1),
+}
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+async def discover(client) -> Context:
+    """Log in as the admin and collect school and course ids to request"""
+    response = await client.post("/auth/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+
+    schools = (await client.get("/schools")).json()
+    school_ids = [school["school_id"] for school in schools]
+    course_ids = []
+    for school_id in school_ids:
+        courses = (await client.get(f"/schools/{school_id}/courses")).json()
+        course_ids.extend(course["course_id"] for course in courses)
+    if not course_ids:
+        raise RuntimeError("No courses found; seed the database with benchmarks/seed.py first")
+    return Context(school_ids, course_ids, token)
+
+
+async def run(client, ctx, names, args) -> dict:
+    rng = random.Random(args.seed)
+    weights = [ENDPOINTS[name][1] for name in names]
+    plan = rng.choices(names, weights=weights, k=args.requests) if not args.duration else None
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    position = 0
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else None
+
+    def next_name():
+        nonlocal position
+        if deadline is not None:
+            return rng.choices(names, weights=weights)[0] if time.perf_counter() < deadline else None
+        if position >= len(plan):
+            return None
+        position += 1
+        return plan[position - 1]
+
+    async def worker(worker_rng):
+        while True:
+            name = next_name()
+            if name is None:
+                return
+            request_started = time.perf_counter()
+            try:
+                response = await ENDPOINTS[name][0](client, ctx, worker_rng)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies[name].append((time.perf_counter() - request_started) * 1000)
+            if not ok:
+                errors[name] += 1
+
+    await asyncio.gather(*(worker(random.Random(args.seed + i + 1)) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "endpoints": {name: summarize(latencies[name], errors[name], elapsed) for name in names},
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+    }
+
+
+async def main_async(args, names) -> dict:
+    async with AsyncExitStack() as stack:
+        if args.url:
+            transport = httpx.AsyncHTTPTransport()
+            base_url = args.url
+        else:
+            import database
+            import main as app_module
+            # SQL logging would dominate the measurements
+            database.engine.echo = False
+            if database.DB_ASYNC:
+                database.async_engine.echo = False
+            await stack.enter_async_context(app_module.app.router.lifespan_context(app_module.app))
+            transport = httpx.ASGITransport(app=app_module.app)
+            base_url = "http://benchmark"
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout)
+        )
+        ctx = await discover(client)
+        if args.warmup:
+            warmup = argparse.Namespace(**dict(vars(args), requests=args.warmup, duration=None))
+            await run(client, ctx, names, warmup)
+        return await run(client, ctx, names, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RateMyClass API")
+    parser.add_argument("--url", help="Base URL of a running server (default: load the app in-process)")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of --requests")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("--warmup", type=int, default=100, help="Untimed requests before the run")
+    parser.add_argument("--endpoints", help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the request mix")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", default="load_test_results.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    names = args.endpoints.split(",") if args.endpoints else list(ENDPOINTS)
+    unknown = [name for name in names if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    try:
+        results = asyncio.run(main_async(args, names))
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+    results["config"] = {
+        "target": args.url or "in-process",
+        "database": os.getenv("DATABASE_URL", "default").split("://")[0],
+        "requests": args.requests if not args.duration else None,
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+        output.write("\n")
+
+    print(f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, summary in list(results["endpoints"].items()) + [("TOTAL", results["total"])]:
+        print(
+            f"{name:<16}{summary['requests']:>10,}{summary['errors']:>8,}{summary['throughput_rps']:>10,.1f}"
+            f"{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}{summary['p99_ms']:>10.1f}"
+        )
+    print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
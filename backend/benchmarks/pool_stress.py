@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Connection pool stress test for the RateMyClass API.
+
+Runs the load test's request mix in-process with more concurrent clients
+than the pool has connections, while killing pooled connections the way a
+server does when they sit idle past MySQL's wait_timeout or a proxy
+restarts: every --drop-every'th connection returned to the pool is closed
+underneath it. With DB_POOL_PRE_PING on (the default) the pool notices on
+checkout and reconnects, so no request fails; run with
+DB_POOL_PRE_PING=false to see the failures it prevents. Exits non-zero if
+any request failed or timed out waiting for a connection (a 503).
+tests/test_pool.py checks that exhausting the pool gives that 503 after
+DB_POOL_TIMEOUT and counts the timeout.
+
+Seed the database first with benchmarks/seed.py.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/pool_stress.py
+    DATABASE_URL=sqlite:///bench.db python benchmarks/pool_stress.py --requests 5000 --concurrency 50 --drop-every 3
+    DATABASE_URL=sqlite:///bench.db DB_POOL_PRE_PING=false python benchmarks/pool_stress.py
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+from contextlib import AsyncExitStack
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# A small pool so bursts queue for connections; the environment can override it
+os.environ.setdefault("DB_POOL_SIZE", "4")
+os.environ.setdefault("DB_MAX_OVERFLOW", "4")
+# Every request must reach the primary database
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+
+import httpx
+from sqlalchemy import event
+from load_test import ENDPOINTS, discover, run
+
+
+class ConnectionDropper:
+    """Close every Nth connection checked back into a pool, leaving a dead connection behind"""
+
+    def __init__(self, every: int):
+        self.every = every
+        self.enabled = False
+        self.returned = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine):
+        event.listen(engine.pool, "checkin", self.checkin)
+
+    def checkin(self, dbapi_connection, connection_record):
+        if not self.enabled or dbapi_connection is None:
+            return
+        with self._lock:
+            self.returned += 1
+            if self.returned % self.every:
+                return
+            self.dropped += 1
+        dbapi_connection.close()
+
+
+async def main_async(args):
+    import database
+    import main as app_module
+    from sql_metrics import pool_status
+
+    dropper = ConnectionDropper(args.drop_every)
+    dropper.attach(database.engine)
+    if database.DB_ASYNC:
+        dropper.attach(database.async_engine.sync_engine)
+
+    async with AsyncExitStack() as stack:
+        await stack.enter_async_context(app_module.app.router.lifespan_context(app_module.app))
+        # A failed request becomes a 500 response instead of an exception in the client
+        transport = httpx.ASGITransport(app=app_module.app, raise_app_exceptions=False)
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url="http://stress", timeout=args.timeout)
+        )
+        ctx = await discover(client)
+        dropper.enabled = True
+        results = await run(client, ctx, list(ENDPOINTS), args)
+        dropper.enabled = False
+        return results, dropper, pool_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress the connection pool while dropping connections")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--drop-every", type=int, default=5, help="Close every Nth connection returned to the pool")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the request mix")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+    args.duration = None
+
+    try:
+        results, dropper, pools = asyncio.run(main_async(args))
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+    total = results["total"]
+    print(f"{'pool':<16}{'checkouts':>10}{'invalidated':>12}{'timeouts':>10}{'mean wait ms':>14}{'max wait ms':>13}")
+    for name, status in pools.items():
+        print(
+            f"{name:<16}{status['checkouts']:>10,}{status['invalidated']:>12,}{status['timeouts']:>10,}"
+            f"{status['mean_checkout_wait_ms']:>14.3f}{status['max_checkout_wait_ms']:>13.3f}"
+        )
+    print(
+        f"{total['requests']:,} requests at concurrency {args.concurrency}, {dropper.dropped:,} connections dropped, "
+        f"{total['throughput_rps']:,.1f} req/s, p99 {total['p99_ms']:.1f} ms"
+    )
+    if total["errors"]:
+        print(f"✗ {total['errors']:,} requests failed")
+        sys.exit(1)
+    print("✓ No requests failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Seed the database in DATABASE_URL with synthetic benchmark data.
+
+Creates schools, courses, books and ratings with the models in
+database.py, using multi-row inserts, then rebuilds course_stats. The
+same --seed always produces the same data, so runs against a freshly
+seeded database are comparable.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --reset
+    python benchmarks/seed.py --reset --schools 20 --courses 20000 --books 5000 --ratings 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import func, insert
+from database import Base, SessionLocal, engine, Book, Course, Professor, Rating, School
+from course_stats import rebuild_course_stats
+from textbooks import title_hash
+
+# SQL logging would dominate the run time
+engine.echo = False
+
+MAJORS = {
+    "Computer Science": "CS",
+    "Biology": "BIOL",
+    "Chemistry": "CHEM",
+    "Mathematics": "MATH",
+    "History": "HIST",
+    "Psychology": "PSYC",
+    "Economics": "ECON",
+    "English": "ENG",
+    "Physics": "PHYS",
+    "Art": "ART",
+}
+TOPICS = [
+    "Introduction to", "Principles of", "Advanced", "Topics in", "Seminar in",
+    "Foundations of", "Methods in", "Survey of", "Applied", "Theory of",
+]
+SUBJECTS = [
+    "Algorithms", "Genetics", "Organic Structures", "Linear Systems", "Modern Europe",
+    "Cognition", "Markets", "Poetry", "Mechanics", "Drawing", "Data", "Ecology",
+]
+DELIVERY_MODES = ["In-Person", "Online", "Hybrid"]
+REVIEWS = [
+    "Great course, would take again.",
+    "Heavy workload but fair grading.",
+    "Lectures were hard to follow.",
+    "The textbook was essential.",
+    "Exams matched the homework closely.",
+]
+CHUNK_SIZE = 5000
+
+
+def insert_chunked(table, rows):
+    with engine.begin() as conn:
+        for start in range(0, len(rows), CHUNK_SIZE):
+            conn.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def make_isbn(rng: random.Random) -> str:
+    body = "978" + "".join(rng.choice("0123456789") for _ in range(9))
+    total = sum(int(digit) * (1 if position % 2 == 0 else 3) for position, digit in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+def seed(schools: int, courses: int, books: int, ratings: int, random_seed: int):
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        school_start = (db.query(func.max(School.school_id)).scalar() or 0) + 1
+        insert_chunked(School, [
+            {"school_name": f"Benchmark University {school_start + i}", "created_at": now, "updated_at": now}
+            for i in range(schools)
+        ])
+        school_ids = [school_id for (school_id,) in db.query(School.school_id).filter(School.school_id >= school_start)]
+
+        course_rows = []
+        for i in range(courses):
+            major = rng.choice(list(MAJORS))
+            course_rows.append({
+                "course_name": f"{rng.choice(TOPICS)} {rng.choice(SUBJECTS)} {i}",
+                "course_number": f"{MAJORS[major]} {100 + i}",
+                "major": major,
+                "school_id": school_ids[i % len(school_ids)],
+                "dialogues_requirement": None,
+                "delivery_mode": rng.choice(DELIVERY_MODES),
+                "created_at": now,
+                "updated_at": now,
+            })
+        course_start = (db.query(func.max(Course.course_id)).scalar() or 0) + 1
+        insert_chunked(Course, course_rows)
+        course_ids = [course_id for (course_id,) in db.query(Course.course_id).filter(Course.course_id >= course_start)]
+
+        book_rows = []
+        isbns = {isbn for (isbn,) in db.query(Book.isbn).filter(Book.isbn.isnot(None))}
+        for i in range(books):
+            if i % 2:
+                title = f"{rng.choice(SUBJECTS)} Volume {i}"
+                book_rows.append({"title": title, "title_hash": title_hash(title), "isbn": None})
+            else:
+                isbn = make_isbn(rng)
+                if isbn not in isbns:
+                    isbns.add(isbn)
+                    book_rows.append({"title": None, "title_hash": None, "isbn": isbn})
+        book_start = (db.query(func.max(Book.book_id)).scalar() or 0) + 1
+        # Multi-row inserts need the same keys in every row
+        insert_chunked(Book, [dict(row, created_at=now, updated_at=now) for row in book_rows])
+        book_ids = [book_id for (book_id,) in db.query(Book.book_id).filter(Book.book_id >= book_start)]
+
+        professor = db.query(Professor).filter(Professor.first_name == "Unknown", Professor.last_name == "Professor").first()
+        if not professor:
+            professor = Professor(first_name="Unknown", last_name="Professor")
+            db.add(professor)
+            db.commit()
+
+        rating_rows = []
+        for i in range(ratings):
+            rated_at = now - timedelta(minutes=rng.randrange(0, 60 * 24 * 365))
+            rating_rows.append({
+                "course_id": rng.choice(course_ids),
+                "professor_id": professor.professor_id,
+                "book_id": rng.choice(book_ids) if book_ids and rng.random() < 0.5 else None,
+                "rating": rng.randint(1, 5),
+                "review": rng.choice(REVIEWS),
+                "created_at": rated_at,
+                "updated_at": rated_at,
+            })
+            if len(rating_rows) >= CHUNK_SIZE:
+                insert_chunked(Rating, rating_rows)
+                rating_rows = []
+        insert_chunked(Rating, rating_rows)
+
+        rebuild_course_stats(db)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed synthetic benchmark data")
+    parser.add_argument("--schools", type=int, default=5)
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--ratings", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    args = parser.parse_args()
+    if args.schools < 1 or args.courses < 1:
+        parser.error("--schools and --courses must be at least 1")
+
+    started = time.monotonic()
+    try:
+        if args.reset:
+            Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        seed(args.schools, args.courses, args.books, args.ratings, args.seed)
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+    print(
+        f"✓ Seeded {args.schools:,} schools, {args.courses:,} courses, {args.books:,} books "
+        f"and {args.ratings:,} ratings in {time.monotonic() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
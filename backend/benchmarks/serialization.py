@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Per-row serialization cost of the course list response.
+
+Compares the old path (a CourseWithRatings object per row, re-validated
+against List[CourseWithRatings] and encoded by FastAPI) with the fast path
+used by the read endpoints (a dict per row encoded once by
+serialization.dumps). No database is needed; rows are synthetic.
+
+Usage:
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 5000 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from schemas import CourseWithRatings
+from serialization import dumps, orjson
+
+Row = namedtuple("Row", [
+    "course_id", "course_name", "course_number", "major", "school_name", "dialogues_requirement",
+    "delivery_mode", "rating_sum", "rating_count", "created_at",
+])
+
+
+def make_rows(count: int):
+    now = datetime.utcnow()
+    return [
+        Row(i, f"Course {i}", f"CS {i}", "Computer Science", "Truman State University",
+            None if i % 3 else "Statistics", "In-Person", (i % 50) * 4, i % 50, now)
+        for i in range(1, count + 1)
+    ]
+
+
+def pydantic_path(rows) -> bytes:
+    """Old path: model per row, then FastAPI's validate + jsonable_encoder + json.dumps"""
+    courses = [
+        CourseWithRatings(
+            course_id=row.course_id,
+            course_name=row.course_name,
+            course_number=row.course_number,
+            major=row.major,
+            school_name=row.school_name,
+            dialogues_requirement=row.dialogues_requirement,
+            delivery_mode=row.delivery_mode,
+            average_rating=row.rating_sum / row.rating_count if row.rating_count else None,
+            rating_count=row.rating_count,
+            created_at=row.created_at
+        )
+        for row in rows
+    ]
+    validated = TypeAdapter(List[CourseWithRatings]).validate_python(courses, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def fast_path(rows) -> bytes:
+    """New path: dict per row, encoded once"""
+    return dumps([
+        {
+            "course_id": row.course_id,
+            "course_name": row.course_name,
+            "course_number": row.course_number,
+            "major": row.major,
+            "school_name": row.school_name,
+            "dialogues_requirement": row.dialogues_requirement,
+            "delivery_mode": row.delivery_mode,
+            "average_rating": row.rating_sum / row.rating_count if row.rating_count else None,
+            "rating_count": row.rating_count or 0,
+            "created_at": row.created_at,
+        }
+        for row in rows
+    ])
+
+
+def measure(fn, rows, repeat: int) -> float:
+    """Best per-row time in microseconds over repeat runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark course list serialization")
+    parser.add_argument("--rows", type=int, default=3000, help="Rows per response")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per path (best is reported)")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    if json.loads(pydantic_path(rows)) != json.loads(fast_path(rows)):
+        print("✗ The two paths produce different JSON")
+        sys.exit(1)
+
+    before = measure(pydantic_path, rows, args.repeat)
+    after = measure(fast_path, rows, args.repeat)
+    print(f"Serializing {args.rows:,} courses (encoder: {'orjson' if orjson else 'json'})")
+    print(f"  Pydantic path: {before:8.2f} µs/row")
+    print(f"  Fast path:     {after:8.2f} µs/row")
+    print(f"  ✓ {before / after:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+In-process response cache for the catalog read endpoints.
+
+Entries are keyed by endpoint plus query parameters and carry
+tags ("schools", "school:<id>", "courses", "course:<id>") so the write
+endpoints can drop exactly the entries a new course or rating affects.
+The cache is a bounded LRU with a TTL as a backstop for writes made by
+other workers or offline scripts.
+
+An entry past its TTL is still served for RESPONSE_CACHE_STALE_SECONDS
+while one background refresh replaces it (stale-while-revalidate), and
+an expired or invalidated entry is kept for
+RESPONSE_CACHE_STALE_IF_ERROR_SECONDS so the last good result can be
+served while the database is unavailable. Invalidated entries are never
+served otherwise, so writers still read their own writes.
+
+Identical loads that are in flight at the same time share one database
+execution (single-flight): the first request computes the value and the
+others wait for its result. Flights belong to the worker's event loop.
+
+Configuration:
+    RESPONSE_CACHE_ENABLED                - "true" (default) or "false"
+    RESPONSE_CACHE_MAX_ENTRIES            - LRU capacity (default 1024)
+    RESPONSE_CACHE_TTL_SECONDS            - entry lifetime (default 60)
+    RESPONSE_CACHE_STALE_SECONDS          - serve-stale-while-refreshing window after the TTL (default 30)
+    RESPONSE_CACHE_STALE_IF_ERROR_SECONDS - how long after the TTL or an invalidation an entry
+                                            may be served when the database fails (default 300)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Awaitable, Callable, Hashable, Iterable
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_STALE_SECONDS = float(os.getenv("RESPONSE_CACHE_STALE_SECONDS", "30"))
+RESPONSE_CACHE_STALE_IF_ERROR_SECONDS = float(os.getenv("RESPONSE_CACHE_STALE_IF_ERROR_SECONDS", "300"))
+
+# Returned by ResponseCache.lookup() on a miss (None is a valid cached value)
+MISSING = object()
+
+# Entry states returned by ResponseCache.lookup()
+FRESH = "fresh"
+STALE = "stale"          # serve it and refresh in the background
+FALLBACK = "fallback"    # serve it only if loading from the database fails
+
+
+def cache_key(endpoint: str, **params) -> tuple:
+    """
+    Endpoint name plus query parameters, ignoring unset ones and parameter order.
+
+    Values are used as given: callers normalize a parameter only where the
+    query itself ignores the difference (e.g. case or spacing in a search
+    term), so a key never covers requests that would return other rows.
+    """
+    return (endpoint, tuple((name, value) for name, value in sorted(params.items()) if value is not None))
+
+
+class ResponseCache:
+    """Thread-safe LRU/TTL cache with tag-based invalidation"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        enabled: bool = True,
+        stale_seconds: float = 0.0,
+        stale_if_error_seconds: float = 0.0
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.stale_if_error_seconds = stale_if_error_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, value, tags, invalidated)
+        self._tags = defaultdict(set)   # tag -> keys
+        # Bumped on every invalidation so reads that started before a write
+        # don't store a result computed from the old data
+        self._generation = 0
+        # time.monotonic() of the last invalidation
+        self.invalidated_at = 0.0
+        # flight key -> future of the load in progress (event loop only)
+        self._flights = {}
+        # Background refresh tasks, referenced until they finish
+        self._refreshes = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.stale_if_error = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @property
+    def generation(self) -> int:
+        """Read before computing a value and pass to set() to detect racing writes"""
+        return self._generation
+
+    def lookup(self, key: Hashable):
+        """Return (state, value) for key, or (None, MISSING)"""
+        if not self.enabled:
+            return None, MISSING
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, MISSING
+            expires_at, value, _, invalidated = entry
+            if not invalidated and now < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return FRESH, value
+            if not invalidated and now < expires_at + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.stale_served += 1
+                return STALE, value
+            self.misses += 1
+            if now < expires_at + self.stale_if_error_seconds:
+                return FALLBACK, value
+            self._remove(key)
+            return None, MISSING
+
+    def set(self, key: Hashable, value, tags: Iterable[str], generation: int):
+        """Store value unless an invalidation happened since generation was read"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._store(key, value, tuple(tags), time.monotonic() + self.ttl_seconds)
+
+    def served_stale_on_error(self):
+        """Count a FALLBACK value served because the database failed"""
+        with self._lock:
+            self.stale_served += 1
+            self.stale_if_error += 1
+
+    async def load(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """
+        Await fn() once for concurrent callers with the same key: the first
+        caller runs it and the others share its result or exception. Include
+        the generation in the key so loads after a write start a new flight.
+        """
+        while True:
+            future = self._flights.get(key)
+            if future is None:
+                break
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The request running the load went away; take it over
+                if future.cancelled():
+                    continue
+                raise
+            with self._lock:
+                self.coalesced += 1
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it; don't log it as never retrieved when there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def refresh(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Run load(key, fn) in the background unless that load is already in flight"""
+        if key in self._flights:
+            return
+        task = asyncio.get_running_loop().create_task(self._refresh(key, fn))
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _refresh(self, key, fn):
+        try:
+            await self.load(key, fn)
+            with self._lock:
+                self.refreshes += 1
+        except Exception:
+            # The stale entry stays until the next request retries the load
+            with self._lock:
+                self.refresh_errors += 1
+
+    def _store(self, key, value, tags, expires_at):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, value, tags, False)
+        for tag in tags:
+            self._tags[tag].add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str):
+        """Stop serving every entry carrying any of the given tags (kept only as a fallback)"""
+        with self._lock:
+            self._generation += 1
+            self.invalidated_at = time.monotonic()
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    expires_at, value, entry_tags, invalidated = self._entries[key]
+                    if invalidated:
+                        continue
+                    if self.stale_if_error_seconds > 0:
+                        self._entries[key] = (expires_at, value, entry_tags, True)
+                    else:
+                        self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidated_at = time.monotonic()
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "stale_seconds": self.stale_seconds,
+                "stale_if_error_seconds": self.stale_if_error_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalesced": self.coalesced,
+                "stale_served": self.stale_served,
+                "stale_if_error": self.stale_if_error,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "in_flight": len(self._flights),
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    enabled=RESPONSE_CACHE_ENABLED,
+    stale_seconds=RESPONSE_CACHE_STALE_SECONDS,
+    stale_if_error_seconds=RESPONSE_CACHE_STALE_IF_ERROR_SECONDS,
+)
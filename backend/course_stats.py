@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Per-course rating aggregates for RateMyClass.
+
+The course read endpoints join the course_stats table instead of grouping the
+whole rating table on every request. Writers call record_ratings() inside
+their own transaction, so the aggregates commit or roll back together with
+the ratings they describe.
+
+Each row also carries the course's ranking: its average and a Bayesian
+average that pulls courses with few ratings towards RANKING_PRIOR_MEAN, as
+if every course had RANKING_PRIOR_WEIGHT extra ratings at that value. The
+course's school_id and major are copied alongside, so sorted listings and
+per-school/major leaderboards are index range scans. Rankings are refreshed
+together with the counters; after changing the prior, run rebuild.
+
+Usage:
+    python course_stats.py rebuild   # recompute every row from the rating table
+    python course_stats.py verify    # report rows that drifted from the rating table
+"""
+
+import argparse
+import math
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import Float, case, cast, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal, Course, CourseStats, Rating
+
+RANKING_PRIOR_MEAN = float(os.getenv("RANKING_PRIOR_MEAN", "3.0"))
+RANKING_PRIOR_WEIGHT = float(os.getenv("RANKING_PRIOR_WEIGHT", "5"))
+
+STAR_COLUMNS = {
+    1: CourseStats.star_1_count,
+    2: CourseStats.star_2_count,
+    3: CourseStats.star_3_count,
+    4: CourseStats.star_4_count,
+    5: CourseStats.star_5_count,
+}
+
+
+def average_rating(stats: CourseStats) -> float:
+    """Average rating for a stats row, or None when the course has no ratings"""
+    if stats is None or not stats.rating_count:
+        return None
+    return stats.rating_sum / stats.rating_count
+
+
+def ranking_values(rating_sum: int, rating_count: int) -> dict:
+    """avg_rating and bayesian_score for the given totals (None without ratings)"""
+    if not rating_count:
+        return {"avg_rating": None, "bayesian_score": None}
+    return {
+        "avg_rating": rating_sum / rating_count,
+        "bayesian_score": (RANKING_PRIOR_WEIGHT * RANKING_PRIOR_MEAN + rating_sum) / (RANKING_PRIOR_WEIGHT + rating_count),
+    }
+
+
+def refresh_rankings(db: Session, course_ids):
+    """Recompute ranking columns and copy school_id/major from course (caller commits)"""
+    course_ids = list(course_ids)
+    if not course_ids:
+        return
+    stats = CourseStats.__table__
+    course = Course.__table__
+    rated = stats.c.rating_count > 0
+    total = cast(stats.c.rating_sum, Float)
+    db.execute(
+        update(stats).where(stats.c.course_id.in_(course_ids)).values(
+            avg_rating=case((rated, total / stats.c.rating_count), else_=None),
+            bayesian_score=case(
+                (rated, (RANKING_PRIOR_WEIGHT * RANKING_PRIOR_MEAN + total) / (RANKING_PRIOR_WEIGHT + stats.c.rating_count)),
+                else_=None
+            ),
+            school_id=select(course.c.school_id).where(course.c.course_id == stats.c.course_id).scalar_subquery(),
+            major=select(course.c.major).where(course.c.course_id == stats.c.course_id).scalar_subquery(),
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def _empty_delta():
+    return {"sum": 0, "count": 0, "stars": defaultdict(int), "last_rated_at": None}
+
+
+def record_ratings(db: Session, ratings):
+    """Fold (course_id, rating, rated_at) tuples into course_stats (caller commits)"""
+    deltas = defaultdict(_empty_delta)
+    for course_id, rating_value, rated_at in ratings:
+        delta = deltas[course_id]
+        delta["sum"] += rating_value
+        delta["count"] += 1
+        delta["stars"][rating_value] += 1
+        rated_at = rated_at or datetime.utcnow()
+        if delta["last_rated_at"] is None or rated_at > delta["last_rated_at"]:
+            delta["last_rated_at"] = rated_at
+
+    # Make pending courses/stats rows visible to the UPDATE below
+    db.flush()
+
+    for course_id, delta in deltas.items():
+        if _apply_delta(db, course_id, delta) == 0:
+            # No stats row yet (e.g. course imported before stats existed)
+            try:
+                with db.begin_nested():
+                    db.add(CourseStats(
+                        course_id=course_id,
+                        rating_sum=delta["sum"],
+                        rating_count=delta["count"],
+                        last_rated_at=delta["last_rated_at"],
+                        **{f"star_{star}_count": n for star, n in delta["stars"].items()}
+                    ))
+            except IntegrityError:
+                # A concurrent writer created the row first
+                _apply_delta(db, course_id, delta)
+
+    refresh_rankings(db, deltas)
+
+
+def record_rating(db: Session, course_id: int, rating_value: int, rated_at: datetime = None):
+    """Fold a single new rating into course_stats (caller commits)"""
+    record_ratings(db, [(course_id, rating_value, rated_at)])
+
+
+def _apply_delta(db: Session, course_id: int, delta) -> int:
+    """Increment an existing stats row in place; returns the number of rows updated"""
+    last_rated_at = delta["last_rated_at"]
+    values = {
+        CourseStats.rating_sum: CourseStats.rating_sum + delta["sum"],
+        CourseStats.rating_count: CourseStats.rating_count + delta["count"],
+        CourseStats.last_rated_at: case(
+            (CourseStats.last_rated_at.is_(None), last_rated_at),
+            (CourseStats.last_rated_at < last_rated_at, last_rated_at),
+            else_=CourseStats.last_rated_at
+        ),
+        CourseStats.updated_at: datetime.utcnow(),
+    }
+    for star, n in delta["stars"].items():
+        values[STAR_COLUMNS[star]] = STAR_COLUMNS[star] + n
+    return db.query(CourseStats).filter(
+        CourseStats.course_id == course_id
+    ).update(values, synchronize_session=False)
+
+
+def compute_course_stats(db: Session):
+    """Aggregate the rating table into {course_id: stats dict} for every course"""
+    star_sums = [
+        func.sum(case((Rating.rating == star, 1), else_=0)).label(f"star_{star}_count")
+        for star in STAR_COLUMNS
+    ]
+    rows = db.query(
+        Rating.course_id,
+        func.sum(Rating.rating).label("rating_sum"),
+        func.count(Rating.rating_id).label("rating_count"),
+        func.max(Rating.created_at).label("last_rated_at"),
+        *star_sums
+    ).group_by(Rating.course_id).all()
+
+    computed = {
+        course_id: {
+            "course_id": course_id,
+            "school_id": school_id,
+            "major": major,
+            "rating_sum": 0,
+            "rating_count": 0,
+            "last_rated_at": None,
+            **{f"star_{star}_count": 0 for star in STAR_COLUMNS},
+            **ranking_values(0, 0),
+        }
+        for course_id, school_id, major in db.query(Course.course_id, Course.school_id, Course.major)
+    }
+    for row in rows:
+        values = computed.get(row.course_id)
+        if values is None:
+            continue
+        values["rating_sum"] = row.rating_sum or 0
+        values["rating_count"] = row.rating_count
+        values["last_rated_at"] = row.last_rated_at
+        for star in STAR_COLUMNS:
+            values[f"star_{star}_count"] = getattr(row, f"star_{star}_count") or 0
+        values.update(ranking_values(values["rating_sum"], values["rating_count"]))
+    return computed
+
+
+def rebuild_course_stats(db: Session) -> int:
+    """Replace every course_stats row with values recomputed from ratings"""
+    computed = compute_course_stats(db)
+    now = datetime.utcnow()
+    db.query(CourseStats).delete(synchronize_session=False)
+    if computed:
+        db.bulk_insert_mappings(CourseStats, [dict(values, updated_at=now) for values in computed.values()])
+    db.commit()
+    return len(computed)
+
+
+def verify_course_stats(db: Session):
+    """Return a list of (course_id, field, stored, expected) mismatches"""
+    computed = compute_course_stats(db)
+    stored = {stats.course_id: stats for stats in db.query(CourseStats)}
+    fields = ["school_id", "major", "rating_sum", "rating_count", "last_rated_at"] + [f"star_{star}_count" for star in STAR_COLUMNS]
+
+    mismatches = []
+    for course_id, expected in computed.items():
+        stats = stored.get(course_id)
+        for field in fields:
+            actual = getattr(stats, field) if stats else (None if field == "last_rated_at" else 0)
+            if actual != expected[field]:
+                mismatches.append((course_id, field, actual, expected[field]))
+        for field in ("avg_rating", "bayesian_score"):
+            actual = getattr(stats, field) if stats else None
+            if (actual is None) != (expected[field] is None) or (
+                actual is not None and not math.isclose(actual, expected[field], rel_tol=1e-9)
+            ):
+                mismatches.append((course_id, field, actual, expected[field]))
+    for course_id in stored.keys() - computed.keys():
+        mismatches.append((course_id, "course_id", course_id, None))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the course_stats read model")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            count = rebuild_course_stats(db)
+            print(f"✓ Rebuilt stats for {count} courses")
+        else:
+            mismatches = verify_course_stats(db)
+            if not mismatches:
+                print("✓ course_stats matches the rating table")
+                return
+            for course_id, field, actual, expected in mismatches:
+                print(f"✗ course {course_id}: {field} is {actual}, expected {expected}")
+            print(f"\n{len(mismatches)} mismatches found; run 'python course_stats.py rebuild' to repair")
+            sys.exit(1)
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Streaming exports for GET /export/courses and GET /export/ratings.
+
+Rows are read through a server-side cursor (stream_results with
+yield_per=EXPORT_BATCH_SIZE, default 1000) on a connection owned by the
+response stream, and each batch is encoded and sent before the next one
+is fetched, so memory stays flat no matter how large the tables are.
+Rows come out in primary key order as NDJSON (one object per line) or CSV
+with a header row.
+
+A course's updated_at is the later of its own updated_at and its last
+rating, so the updated_since/updated_before filters of an incremental
+export pick up courses whose ratings changed.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+from sqlalchemy import case, select
+from database import engine, Book, Course, CourseStats, Rating, School
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+COURSE_COLUMNS = (
+    "course_id", "course_name", "course_number", "major", "school_id", "school_name",
+    "dialogues_requirement", "delivery_mode", "average_rating", "rating_count", "created_at", "updated_at",
+)
+
+RATING_COLUMNS = (
+    "rating_id", "course_id", "school_id", "professor_id", "book_id", "book_title", "book_isbn",
+    "rating", "review", "created_at", "updated_at",
+)
+
+
+def _filtered(statement, updated_column, school_id, updated_since, updated_before):
+    if school_id is not None:
+        statement = statement.where(Course.school_id == school_id)
+    if updated_since is not None:
+        statement = statement.where(updated_column >= updated_since)
+    if updated_before is not None:
+        statement = statement.where(updated_column < updated_before)
+    return statement
+
+
+# Course rows change when the course is edited or when it is rated
+course_updated_at = case(
+    (CourseStats.last_rated_at > Course.updated_at, CourseStats.last_rated_at),
+    else_=Course.updated_at
+)
+
+
+def course_export_query(school_id: Optional[int] = None, updated_since: Optional[datetime] = None,
+                        updated_before: Optional[datetime] = None):
+    statement = select(
+        Course.course_id, Course.course_name, Course.course_number, Course.major, Course.school_id,
+        School.school_name, Course.dialogues_requirement, Course.delivery_mode,
+        CourseStats.rating_sum, CourseStats.rating_count, Course.created_at,
+        course_updated_at.label("updated_at")
+    ).join(School, Course.school_id == School.school_id).outerjoin(CourseStats).order_by(Course.course_id)
+    return _filtered(statement, course_updated_at, school_id, updated_since, updated_before)
+
+
+def rating_export_query(school_id: Optional[int] = None, updated_since: Optional[datetime] = None,
+                        updated_before: Optional[datetime] = None):
+    statement = select(
+        Rating.rating_id, Rating.course_id, Course.school_id, Rating.professor_id, Rating.book_id,
+        Book.title.label("book_title"), Book.isbn.label("book_isbn"),
+        Rating.rating, Rating.review, Rating.created_at, Rating.updated_at
+    ).join(Course, Rating.course_id == Course.course_id).outerjoin(Book).order_by(Rating.rating_id)
+    return _filtered(statement, Rating.updated_at, school_id, updated_since, updated_before)
+
+
+def _course_record(row) -> dict:
+    record = dict(row._mapping)
+    rating_sum = record.pop("rating_sum")
+    record["rating_count"] = record["rating_count"] or 0
+    # Unrounded, as the API returns it
+    record["average_rating"] = rating_sum / record["rating_count"] if record["rating_count"] else None
+    return record
+
+
+def _rating_record(row) -> dict:
+    return dict(row._mapping)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode(records, columns, export_format: str) -> str:
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([["" if record[c] is None else _value(record[c]) for c in columns] for record in records])
+        return buffer.getvalue()
+    return "".join(json.dumps({c: _value(record[c]) for c in columns}) + "\n" for record in records)
+
+
+def _stream(statement, columns, to_record, export_format: str) -> Iterator[str]:
+    if export_format == "csv":
+        yield _encode([dict(zip(columns, columns))], columns, "csv")
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(statement)
+        for rows in result.partitions():
+            yield _encode([to_record(row) for row in rows], columns, export_format)
+
+
+def stream_courses(export_format: str, **filters) -> Iterator[str]:
+    return _stream(course_export_query(**filters), COURSE_COLUMNS, _course_record, export_format)
+
+
+def stream_ratings(export_format: str, **filters) -> Iterator[str]:
+    return _stream(rating_export_query(**filters), RATING_COLUMNS, _rating_record, export_format)
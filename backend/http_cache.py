@@ -0,0 +1,185 @@
+"""
+Strong ETags and conditional GET for the catalog read endpoints.
+
+An ETag is a hash of the cache key (endpoint plus normalized parameters)
+and a cheap version signal for the data behind it, so a matching
+If-None-Match is answered with 304 before the course query runs or any
+response model is built. Version signals:
+
+- schools:      max school id and max school updated_at
+- course list:  max course id, max course updated_at and max rating id
+- one course:   the course's updated_at plus its course_stats counters
+
+Rating and course ids are auto-increment primary keys, so new rows always
+change the signal even when several writes share a timestamp.
+
+Values read from a replica within READ_YOUR_WRITES_SECONDS of a cache
+invalidation are served but not cached, so replication lag cannot put
+pre-write data back into the cache.
+
+Concurrent misses for one key share a single load, a stale entry is
+served while a background load on the primary refreshes it, and the last
+good entry is served when the database fails (see cache.py).
+
+HTTP_CACHE_MAX_AGE (seconds, default 0) sets Cache-Control; with the
+default clients revalidate on every view and get a 304 when nothing changed.
+"""
+
+import hashlib
+import os
+import time
+from typing import Callable, Hashable, Iterable
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from cache import FALLBACK, FRESH, MISSING, STALE, response_cache
+from database import School, Course, CourseStats, Rating, SessionLocal, run_db
+from replicas import READ_YOUR_WRITES_SECONDS, is_replica_session
+
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+
+
+def cache_control() -> str:
+    if HTTP_CACHE_MAX_AGE > 0:
+        return f"public, max-age={HTTP_CACHE_MAX_AGE}"
+    return "no-cache"
+
+
+def make_etag(key: Hashable, version) -> str:
+    digest = hashlib.sha1(repr((key, version)).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match header lists etag (or is '*')"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == etag
+        for candidate in candidates
+    )
+
+
+def schools_version(db: Session):
+    return tuple(db.query(func.max(School.school_id), func.max(School.updated_at)).one())
+
+
+def school_courses_version(db: Session, school_id: int):
+    return tuple(db.query(func.max(Course.course_id), func.max(Course.updated_at)).filter(
+        Course.school_id == school_id
+    ).one())
+
+
+def course_list_version(db: Session):
+    return (
+        db.query(func.max(Course.course_id)).scalar(),
+        db.query(func.max(Course.updated_at)).scalar(),
+        db.query(func.max(Rating.rating_id)).scalar(),
+    )
+
+
+def course_version(db: Session, course_id: int):
+    """Version of one course, or None if it does not exist"""
+    row = db.query(
+        Course.updated_at,
+        CourseStats.rating_count,
+        CourseStats.rating_sum,
+        CourseStats.last_rated_at
+    ).outerjoin(CourseStats).filter(Course.course_id == course_id).first()
+    return tuple(row) if row else None
+
+
+def _not_modified(etag: str) -> HTTPException:
+    # FastAPI renders this as an empty 304 response with the given headers
+    return HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control()})
+
+
+async def _load(db, key: Hashable, tags: Iterable[str], version: Callable, compute: Callable, generation: int, current_version=MISSING):
+    """(value, etag) computed with db, stored in the response cache"""
+    if current_version is MISSING:
+        current_version = await run_db(db, version)
+    value = await run_db(db, compute)
+    etag = make_etag(key, current_version)
+    if not (is_replica_session(db) and time.monotonic() - response_cache.invalidated_at < READ_YOUR_WRITES_SECONDS):
+        response_cache.set(key, (value, etag), tags, generation)
+    return value, etag
+
+
+def _load_from_primary(key: Hashable, tags: Iterable[str], version: Callable, compute: Callable, generation: int):
+    """A load on a primary session of its own, for a refresh that outlives the request"""
+    def load_sync():
+        db = SessionLocal()
+        try:
+            return version(db), compute(db)
+        finally:
+            db.close()
+
+    async def load():
+        current_version, value = await run_in_threadpool(load_sync)
+        etag = make_etag(key, current_version)
+        response_cache.set(key, (value, etag), tags, generation)
+        return value, etag
+    return load
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db,
+    key: Hashable,
+    tags: Iterable[str],
+    version: Callable,
+    compute: Callable
+):
+    """
+    Serve a read through the response cache with ETag handling.
+
+    version and compute are called as fn(session) on a cache miss only;
+    version must be much cheaper than compute. Returns the computed (or
+    cached) value with ETag/Cache-Control set on response, or raises a 304
+    when the client's copy is current. Cache hits never touch the database.
+
+    Concurrent misses for the same key share one load. A stale entry is
+    served while a background load refreshes it, and the last good entry
+    is served if the load fails with a database error.
+    """
+    state, cached = response_cache.lookup(key)
+    generation = response_cache.generation
+    if state is STALE:
+        # Flights are per generation and session kind, so a load that started
+        # before a write, or on a lagging replica, is never shared after it
+        response_cache.refresh((key, generation, False), _load_from_primary(key, tags, version, compute, generation))
+    if state is FRESH or state is STALE:
+        value, etag = cached
+        if etag_matches(request, etag):
+            raise _not_modified(etag)
+    else:
+        flight = (key, generation, is_replica_session(db))
+        try:
+            current_version = MISSING
+            if "if-none-match" in request.headers and not response_cache.in_flight(flight):
+                # Answer a current client copy with 304 before running compute
+                current_version = await run_db(db, version)
+                etag = make_etag(key, current_version)
+                if current_version is not None and etag_matches(request, etag):
+                    raise _not_modified(etag)
+            value, etag = await response_cache.load(
+                flight, lambda: _load(db, key, tags, version, compute, generation, current_version)
+            )
+        except SQLAlchemyError:
+            if state is not FALLBACK:
+                raise
+            # The database is unavailable: serve the last good result
+            response_cache.served_stale_on_error()
+            value, etag = cached
+        if etag_matches(request, etag):
+            raise _not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control()
+    return value
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Bulk course catalog importer for RateMyClass.
+
+Streams a CSV or JSONL registrar export into the course table. Existing
+(school_id, course_number) keys are fetched once per school, new courses
+are written with multi-row inserts and existing ones are optionally
+updated, one transaction per chunk.
+
+Columns / keys: course_name, course_number, major, delivery_mode,
+dialogues_requirement (optional) and school_name (optional, overrides
+--school for that row). Numbers in JSONL are taken as text, and course
+numbers are matched case-insensitively ("cs 170" is "CS 170"), as MySQL's
+default collation compares them.
+
+Usage:
+    python import_courses.py catalog.csv --school "Truman State University"
+    python import_courses.py catalog.jsonl --school "Truman State University" --update
+    python import_courses.py catalog.csv --school "Truman State University" --dry-run
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+from database import SessionLocal, School, Course, CourseStats
+from course_stats import refresh_rankings
+
+REQUIRED_FIELDS = ("course_name", "course_number", "major", "delivery_mode")
+COURSE_FIELDS = REQUIRED_FIELDS + ("dialogues_requirement",)
+ROW_FIELDS = COURSE_FIELDS + ("school_name",)
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class CourseImporter:
+    """Buffers course rows and writes them in chunked multi-row statements"""
+
+    def __init__(self, db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE, update_existing: bool = False,
+                 dry_run: bool = False, progress=None):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.update_existing = update_existing
+        self.dry_run = dry_run
+        self.progress = progress
+        self.started_at = time.monotonic()
+        self.rows = 0
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []
+        self._schools = {}   # school_name -> school_id (None for a school a dry run would create)
+        self._keys = {}      # school_id -> {case-folded course_number: course_id}
+        self._inserts = []
+        self._updates = []
+
+    def _school_id(self, school_name: str):
+        if school_name not in self._schools:
+            school = self.db.query(School).filter(School.school_name == school_name).first()
+            if school is None and not self.dry_run:
+                school = School(school_name=school_name)
+                self.db.add(school)
+                self.db.commit()
+            self._schools[school_name] = school.school_id if school else None
+        return self._schools[school_name]
+
+    def _existing_keys(self, school_id) -> dict:
+        if school_id not in self._keys:
+            self._keys[school_id] = {} if school_id is None else {
+                course_number.casefold(): course_id
+                for course_number, course_id in self.db.query(Course.course_number, Course.course_id).filter(Course.school_id == school_id)
+            }
+        return self._keys[school_id]
+
+    def add(self, line_number: int, row: dict, default_school: str = None):
+        """Queue one source row; writes a chunk whenever enough rows are buffered"""
+        self.rows += 1
+        if not isinstance(row, dict):
+            self.errors.append((line_number, "not a JSON object"))
+            return
+        invalid = [field for field in ROW_FIELDS if isinstance(row.get(field), (dict, list, bool))]
+        if invalid:
+            self.errors.append((line_number, f"{', '.join(invalid)} must be text or a number"))
+            return
+        # JSONL may give course numbers as numbers; they are stored and matched as text
+        row = {field: (None if row.get(field) is None else str(row[field]).strip()) for field in ROW_FIELDS}
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        school_name = row.get("school_name") or default_school
+        if not school_name:
+            missing.append("school_name")
+        if missing:
+            self.errors.append((line_number, f"missing {', '.join(missing)}"))
+            return
+
+        school_id = self._school_id(school_name)
+        keys = self._existing_keys(school_id)
+        values = {field: row.get(field) or None for field in COURSE_FIELDS}
+        key = values["course_number"].casefold()
+
+        if key in keys:
+            if not self.update_existing:
+                self.skipped += 1
+                return
+            course_id = keys[key]
+            if course_id is None:
+                # Duplicate of a row that is still waiting to be inserted
+                self.skipped += 1
+                return
+            # Bind names must differ from column names in an executemany UPDATE
+            self._updates.append(dict({f"b_{field}": value for field, value in values.items()}, b_course_id=course_id))
+            self.updated += 1
+        else:
+            # Reserve the key so duplicates later in the file are not inserted twice
+            keys[key] = None
+            self._inserts.append(dict(values, school_id=school_id))
+            self.added += 1
+
+        if len(self._inserts) + len(self._updates) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows in one transaction"""
+        inserts, updates = self._inserts, self._updates
+        self._inserts, self._updates = [], []
+        if not self.dry_run and (inserts or updates):
+            now = datetime.utcnow()
+            changed_ids = []
+            if inserts:
+                self.db.execute(insert(Course), [dict(row, created_at=now, updated_at=now) for row in inserts])
+                changed_ids.extend(self._create_stats(inserts))
+            if updates:
+                course_table = Course.__table__
+                self.db.execute(
+                    update(course_table).where(course_table.c.course_id == bindparam("b_course_id")).values(
+                        **{field: bindparam(f"b_{field}") for field in COURSE_FIELDS}, updated_at=now
+                    ),
+                    updates
+                )
+                changed_ids.extend(row["b_course_id"] for row in updates)
+            # Copy the new school/major into the ranking columns
+            refresh_rankings(self.db, changed_ids)
+            self.db.commit()
+        if self.progress:
+            self.progress(self)
+
+    def _create_stats(self, inserts):
+        """Record ids of newly inserted courses and give each an empty course_stats row; returns the ids"""
+        new_ids = []
+        by_school = {}
+        for row in inserts:
+            by_school.setdefault(row["school_id"], []).append(row["course_number"])
+        for school_id, numbers in by_school.items():
+            rows = self.db.query(Course.course_number, Course.course_id).filter(
+                Course.school_id == school_id,
+                Course.course_number.in_(numbers)
+            )
+            for course_number, course_id in rows:
+                self._keys[school_id][course_number.casefold()] = course_id
+                new_ids.append(course_id)
+        self.db.execute(insert(CourseStats), [{"course_id": course_id} for course_id in new_ids])
+        return new_ids
+
+    def finish(self):
+        self.flush()
+        if self.dry_run:
+            self.db.rollback()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def read_rows(source, file_format: str):
+    """Yield (line number, row dict) from a CSV or JSONL stream"""
+    if file_format == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(source, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, None
+
+
+def print_progress(importer: CourseImporter):
+    print(
+        f"  … {importer.rows:,} rows  "
+        f"({importer.added:,} new, {importer.updated:,} updated, {importer.skipped:,} skipped)  "
+        f"{importer.rows_per_second:,.0f} rows/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a course catalog from CSV or JSONL")
+    parser.add_argument("path", help="CSV or JSONL file, or - for stdin")
+    parser.add_argument("--school", help="School name for rows without a school_name column")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from the file extension)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per transaction")
+    parser.add_argument("--update", action="store_true", help="Update courses that already exist")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and count without writing")
+    args = parser.parse_args()
+
+    file_format = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    source = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+
+    db = SessionLocal()
+    importer = CourseImporter(
+        db,
+        chunk_size=args.chunk_size,
+        update_existing=args.update,
+        dry_run=args.dry_run,
+        progress=print_progress
+    )
+    try:
+        print(f"Importing courses from {args.path}{' (dry run)' if args.dry_run else ''}...")
+        for line_number, row in read_rows(source, file_format):
+            importer.add(line_number, row, default_school=args.school)
+        importer.finish()
+
+        for line_number, message in importer.errors:
+            print(f"✗ Line {line_number}: {message}")
+        print("=" * 60)
+        print(f"  ✓ New: {importer.added:,} courses")
+        print(f"  ✓ Updated: {importer.updated:,} courses")
+        print(f"  ⊘ Skipped: {importer.skipped:,} courses (already exist)")
+        print(f"  ✗ Invalid: {len(importer.errors):,} rows")
+        print(f"  {importer.rows:,} rows in {importer.elapsed:.2f}s ({importer.rows_per_second:,.0f} rows/s)")
+        print("=" * 60)
+    except Exception as e:
+        db.rollback()
+        print(f"\n✗ Error: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+        if source is not sys.stdin:
+            source.close()
+
+
+if __name__ == "__main__":
+    main()
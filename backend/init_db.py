@@ -5,6 +5,7 @@ Creates the database and tables if they don't exist
 """
 
 from database import init_db, engine, Base
+from migrations import run_migrations
 import sys
 
 def main():
@@ -12,6 +13,7 @@ def main():
     try:
         # Create all tables
         Base.metadata.create_all(bind=engine)
+        run_migrations()
         print("✓ Database tables created successfully!")
         print("\nYou can now start the backend server with:")
         print("  uvicorn main:app --reload")
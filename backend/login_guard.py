@@ -0,0 +1,123 @@
+"""
+Protection for POST /auth/login.
+
+bcrypt is deliberately slow, so password checks run on a dedicated
+executor (PASSWORD_EXECUTOR=thread or process, PASSWORD_WORKERS workers)
+instead of the threadpool that serves catalog reads. At most
+PASSWORD_QUEUE_LIMIT checks may be running or waiting; further attempts
+get an immediate 503 instead of queueing.
+
+Before any work is done, attempts are throttled with token buckets per
+username (LOGIN_USER_RATE_PER_MINUTE / LOGIN_USER_BURST) and per client
+IP (LOGIN_IP_RATE_PER_MINUTE / LOGIN_IP_BURST); an empty bucket gives a
+429 with Retry-After. A rate of 0 disables that bucket. Buckets live in
+memory per worker.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from fastapi import HTTPException, status
+
+PASSWORD_EXECUTOR = os.getenv("PASSWORD_EXECUTOR", "thread").lower()
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+LOGIN_USER_RATE_PER_MINUTE = float(os.getenv("LOGIN_USER_RATE_PER_MINUTE", "5"))
+LOGIN_USER_BURST = int(os.getenv("LOGIN_USER_BURST", "5"))
+LOGIN_IP_RATE_PER_MINUTE = float(os.getenv("LOGIN_IP_RATE_PER_MINUTE", "30"))
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", "20"))
+MAX_TRACKED_KEYS = 10000
+
+
+def _checkpw(plain_password: str, hashed_password: str) -> bool:
+    # Top-level so it can be sent to a process pool
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary string, oldest keys dropped first"""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = MAX_TRACKED_KEYS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()   # key -> (tokens, last refill time)
+
+    def acquire(self, key: str) -> float:
+        """Take one token; returns 0 on success or seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+user_limiter = RateLimiter(LOGIN_USER_RATE_PER_MINUTE, LOGIN_USER_BURST)
+ip_limiter = RateLimiter(LOGIN_IP_RATE_PER_MINUTE, LOGIN_IP_BURST)
+
+_executor = None
+_pending = 0
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if PASSWORD_EXECUTOR == "process":
+            # Imported here: multiprocessing is only needed in process mode
+            from concurrent.futures import ProcessPoolExecutor
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password")
+    return _executor
+
+
+def throttle_login(username: str, client_ip: str):
+    """Raise 429 if this username or client IP is out of login attempts"""
+    wait = max(ip_limiter.acquire(client_ip), user_limiter.acquire(username.lower()))
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password executor, or raise 503 if it is full"""
+    global _pending
+    # Only touched from the event loop, so no lock is needed
+    if _pending >= PASSWORD_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, try again shortly",
+            headers={"Retry-After": "1"}
+        )
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _checkpw, plain_password, hashed_password)
+    finally:
+        _pending -= 1
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -1,26 +1,61 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, exc, func, or_
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
-from database import get_db, init_db, School, Course, Rating, Book, Professor, SessionLocal, User, UserRole
-from schemas import CourseCreate, CourseWithRatings, CourseResponse, RatingResponse, SchoolResponse, CourseListItem, CourseDetail, RatingCreate
-from auth import get_password_hash, verify_password, create_access_token, get_current_admin, ACCESS_TOKEN_EXPIRE_MINUTES
-from datetime import timedelta
+from database import get_request_db, run_db, School, Course, CourseStats, Rating, Book, SessionLocal, User
+from schemas import CourseCreate, CourseWithRatings, CourseResponse, RatingResponse, SchoolResponse, CourseListItem, CourseDetail, CourseSuggestion, RankedCourse, RatingCreate, RatingQueued, BulkRatingError, BulkRatingResult
+from auth import create_access_token, get_current_admin, get_current_user, get_user_by_username, revoke_tokens, ACCESS_TOKEN_EXPIRE_MINUTES
+from course_stats import record_rating
+from rating_queue import rating_queue
+from ratings import BULK_RATINGS_CHUNK_SIZE, insert_rating_chunk, iter_bulk_items, submitted_textbook
+from reference_data import reference_data
+from replicas import get_request_read_db, mark_primary_reads, replica_router
+from textbooks import resolve_textbook, textbook_cache
+from startup import StartupTimer, prepare_database, startup_timings
+from sql_metrics import METRICS_ENABLED, SQLMetricsMiddleware, metric_text, pool_status, prometheus_text
+from search import init_search, index_course, search_courses, wait_for_search
+from suggest import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, course_suggestions, wait_for_suggestions
+from cache import cache_key, response_cache
+from http_cache import conditional_get, course_list_version, course_version, school_courses_version, schools_version
+from export import MEDIA_TYPES, stream_courses, stream_ratings
+from login_guard import check_password, throttle_login, shutdown as shutdown_login_guard
+from serialization import dumps, json_response
+from pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, decode_cursor_datetime, encode_cursor, page_size, set_next_cursor
+from datetime import datetime, timedelta
 from pydantic import BaseModel
 import os
 
 app = FastAPI()
 
+DEFAULT_TOP_COURSES = 10
+MAX_TOP_COURSES = 100
+
 # CORS middleware to allow frontend-backend communication
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[os.getenv("FRONTEND_URL")],  # In production, specify your frontend URL
+    allow_origins=[os.getenv("FRONTEND_URL", "http://localhost:8080")],  # In production, specify your frontend URL
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Attribute SQL queries, DB time and pool wait to each endpoint (GET /metrics)
+app.add_middleware(SQLMetricsMiddleware)
+
+
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, e: exc.TimeoutError):
+    """No connection freed up within DB_POOL_TIMEOUT: 503 so clients and load balancers retry"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "The database is busy, try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 
 # Request/Response schemas for auth
 class LoginRequest(BaseModel):
@@ -40,36 +75,35 @@ class TokenData(BaseModel):
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup"""
-    init_db()
-    
-    # Ensure Truman State University exists
+    """Prepare the database (once across workers) and warm the in-process caches"""
+    timer = StartupTimer()
+    # Not caught: a worker must not serve requests against a half-migrated schema
+    prepare_database(timer)
     db = SessionLocal()
     try:
-        truman = db.query(School).filter(
-            func.lower(School.school_name).like('%truman%')
-        ).first()
-        if not truman:
-            truman = School(school_name="Truman State University")
-            db.add(truman)
-            db.commit()
-        
-        # Create default admin user if it doesn't exist
-        admin = db.query(User).filter(User.username == "courseadmin").first()
-        if not admin:
-            admin = User(
-                username="courseadmin",
-                password_hash=get_password_hash("password"),
-                role=UserRole.ADMIN
-            )
-            db.add(admin)
-            db.commit()
-            print("✓ Default admin user created (username: courseadmin, password: password)")
+        with timer.phase("reference"):
+            reference_data.load(db)
     except Exception as e:
         db.rollback()
-        print(f"Warning: Could not initialize database: {e}")
+        print(f"Warning: Could not load reference data: {e}")
     finally:
         db.close()
+    
+    # Started whether or not the database was ready: the builds retry until it is
+    with timer.phase("search"):
+        init_search()
+        course_suggestions.start()
+    
+    replica_router.start()
+    rating_queue.start()
+    timer.finish()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await rating_queue.stop()
+    shutdown_login_guard()
+    replica_router.stop()
 
 
 @app.get("/")
@@ -77,26 +111,86 @@ def read_root():
     return {"message": "RateMyClass API is running!"}
 
 
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Response cache hit/miss/eviction counters"""
+    return response_cache.stats()
+
+
+@app.get("/ratings/queue/stats")
+def get_rating_queue_stats():
+    """Write-behind rating queue depth and flush counters"""
+    return rating_queue.stats()
+
+
+@app.get("/db/pool/stats")
+def get_pool_stats(current_user: User = Depends(get_current_admin)):
+    """Connection pool usage and checkout wait, per engine (admin only)"""
+    return pool_status()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Per-endpoint request and SQL metrics in the Prometheus text format (only with METRICS_ENABLED)"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    text = prometheus_text()
+    cache_stats = response_cache.stats()
+    for name in ("hits", "misses", "coalesced", "stale_served", "stale_if_error", "refresh_errors"):
+        text += metric_text(f"rmc_response_cache_{name}_total", f"Response cache {name.replace('_', ' ')}", cache_stats[name], "counter")
+    text += metric_text("rmc_rating_queue_depth", "Ratings queued but not yet committed", rating_queue.stats()["queue_depth"])
+    text += metric_text("rmc_startup_phase_milliseconds", "Duration of each phase of the last worker startup", [
+        ({"phase": phase}, round(ms, 3)) for phase, ms in startup_timings.items()
+    ])
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/schools", response_model=List[SchoolResponse])
-def get_schools(db: Session = Depends(get_db)):
+async def get_schools(request: Request, response: Response, db: Session = Depends(get_request_read_db)):
     """Get all schools"""
-    schools = db.query(School).all()
-    return schools
+    schools = await conditional_get(
+        request,
+        response,
+        db,
+        cache_key("schools"),
+        ["schools"],
+        schools_version,
+        lambda session: dumps([
+            {"school_id": school_id, "school_name": school_name}
+            for school_id, school_name in session.query(School.school_id, School.school_name)
+        ])
+    )
+    return json_response(schools, response)
 
 
 @app.get("/schools/{school_id}/courses", response_model=List[CourseListItem])
-def get_courses_by_school(school_id: int, db: Session = Depends(get_db)):
+async def get_courses_by_school(school_id: int, request: Request, response: Response, db: Session = Depends(get_request_read_db)):
     """Get all courses for a specific school"""
-    courses = db.query(Course).filter(Course.school_id == school_id).all()
-    return courses
+    courses = await conditional_get(
+        request,
+        response,
+        db,
+        cache_key("school_courses", school_id=school_id),
+        [f"school:{school_id}"],
+        lambda session: school_courses_version(session, school_id),
+        lambda session: dumps([
+            {"course_id": course_id, "course_name": course_name, "course_number": course_number, "major": major}
+            for course_id, course_name, course_number, major in session.query(
+                Course.course_id, Course.course_name, Course.course_number, Course.major
+            ).filter(Course.school_id == school_id)
+        ])
+    )
+    return json_response(courses, response)
 
 
 @app.post("/auth/login", response_model=LoginResponse)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, request: Request, db: Session = Depends(get_request_db)):
     """Admin login endpoint"""
-    user = db.query(User).filter(User.username == login_data.username).first()
+    throttle_login(login_data.username, request.client.host if request.client else "unknown")
+    user = await run_db(db, get_user_by_username, login_data.username)
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    # bcrypt runs on its own bounded executor, away from the request threadpool
+    if not user or not await check_password(login_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -104,7 +198,7 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "role": user.role.value},
+        data={"sub": user.username, "role": user.role.value, "ver": user.token_version},
         expires_delta=access_token_expires
     )
     
@@ -115,76 +209,148 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     )
 
 
-@app.post("/ratings", response_model=RatingResponse)
-def create_rating(rating_data: RatingCreate, db: Session = Depends(get_db)):
-    """Create a rating for an existing course (no authentication required)"""
+@app.post("/auth/logout")
+async def logout(current_user: User = Depends(get_current_user), db: Session = Depends(get_request_db)):
+    """Revoke every token issued to the current user"""
+    await run_db(db, revoke_tokens, current_user.username)
+    return {"message": "Logged out"}
+
+
+def _forget_reference_data():
+    """Drop cached ids after an insert hit an id that no longer exists"""
+    reference_data.clear()
+    textbook_cache.clear()
+
+
+def _create_rating(db: Session, rating_data: RatingCreate, retried: bool = False) -> RatingResponse:
+    """Insert a rating and fold it into the course's stats"""
     try:
-        # Verify course exists
-        course = db.query(Course).filter(Course.course_id == rating_data.course_id).first()
-        if not course:
+        # Verify course exists (usually answered from the reference cache)
+        if not reference_data.course_exists(db, rating_data.course_id):
             raise HTTPException(status_code=404, detail="Course not found")
         
-        # Handle textbook (optional)
-        book_id = None
-        if rating_data.textbook and rating_data.textbook != 'n/a':
-            book = db.query(Book).filter(
-                (Book.isbn == rating_data.textbook) | (Book.title == rating_data.textbook)
-            ).first()
-            if not book:
-                # Try to determine if it's ISBN or title
-                if rating_data.textbook.replace("-", "").replace(" ", "").isdigit():
-                    book = Book(isbn=rating_data.textbook)
-                else:
-                    book = Book(title=rating_data.textbook)
-                db.add(book)
-                db.flush()
-            book_id = book.book_id
+        # A resubmission returns the rating created the first time
+        if rating_data.submission_id:
+            existing = db.query(Rating).filter(Rating.submission_id == rating_data.submission_id).first()
+            if existing:
+                return RatingResponse.model_validate(existing)
         
-        # Create a default professor if none exists
-        professor = db.query(Professor).filter(
-            Professor.first_name == "Unknown",
-            Professor.last_name == "Professor"
-        ).first()
-        if not professor:
-            professor = Professor(first_name="Unknown", last_name="Professor")
-            db.add(professor)
-            db.flush()
+        # Handle textbook (optional)
+        textbook = submitted_textbook(rating_data.textbook)
+        book_id = resolve_textbook(db, textbook) if textbook else None
         
         # Create rating
         rating = Rating(
             course_id=rating_data.course_id,
-            professor_id=professor.professor_id,
+            professor_id=reference_data.unknown_professor_id(db),
             book_id=book_id,
             rating=rating_data.rating,
-            review=rating_data.review
+            review=rating_data.review,
+            submission_id=rating_data.submission_id
         )
         db.add(rating)
+        db.flush()
+        record_rating(db, rating_data.course_id, rating_data.rating, rating.created_at)
         db.commit()
         db.refresh(rating)
         
-        return rating
+        return RatingResponse.model_validate(rating)
     except HTTPException:
         raise
+    except IntegrityError as e:
+        db.rollback()
+        if not retried:
+            # A cached course, professor or book id may have been deleted; retry uncached
+            _forget_reference_data()
+            return _create_rating(db, rating_data, retried=True)
+        raise HTTPException(status_code=500, detail=f"Error creating rating: {str(e)}")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating rating: {str(e)}")
 
 
-@app.post("/courses", response_model=CourseResponse)
-def create_course(course_data: CourseCreate, db: Session = Depends(get_db), current_admin: User = Depends(get_current_admin)):
-    """Create a new course (optionally with rating)"""
+@app.post("/ratings", response_model=RatingResponse, responses={202: {"model": RatingQueued}})
+async def create_rating(rating_data: RatingCreate, request: Request, response: Response, db: Session = Depends(get_request_db)):
+    """Create a rating for an existing course (no authentication required)
+    
+    In write-behind mode the rating is journaled and 202 Accepted returned
+    with its submission_id; it shows up in reads after the next flush.
+    """
+    if rating_queue.enabled:
+        if not await run_db(db, reference_data.course_exists, rating_data.course_id):
+            raise HTTPException(status_code=404, detail="Course not found")
+        submission_id = await rating_queue.submit(rating_data)
+        mark_primary_reads(request, response)
+        body = dumps({"submission_id": submission_id, "course_id": rating_data.course_id, "status": "queued"})
+        return json_response(body, response, status_code=status.HTTP_202_ACCEPTED)
+    
+    rating = await run_db(db, _create_rating, rating_data)
+    response_cache.invalidate(f"course:{rating_data.course_id}", "courses")
+    mark_primary_reads(request, response)
+    return rating
+
+
+@app.post("/ratings/bulk", response_model=BulkRatingResult)
+async def create_ratings_bulk(request: Request, response: Response, db: Session = Depends(get_request_db), current_admin: User = Depends(get_current_admin)):
+    """
+    Import many ratings at once (admin only).
+    
+    The body is a JSON array of rating objects, or an NDJSON stream
+    (Content-Type: application/x-ndjson) with one rating object per line.
+    Invalid items are reported by their position without aborting the batch.
+    """
+    received = 0
+    inserted = 0
+    errors = []
+    
+    async def flush(chunk):
+        nonlocal inserted
+        chunk_inserted, chunk_errors, course_ids = await run_db(db, insert_rating_chunk, chunk)
+        inserted += chunk_inserted
+        errors.extend(chunk_errors)
+        if course_ids:
+            response_cache.invalidate("courses", *(f"course:{course_id}" for course_id in course_ids))
+    
+    chunk = []
+    async for index, item in iter_bulk_items(request):
+        received += 1
+        if isinstance(item, str):
+            errors.append((index, item))
+            continue
+        chunk.append((index, item))
+        if len(chunk) >= BULK_RATINGS_CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    
+    if inserted:
+        mark_primary_reads(request, response)
+    errors.sort()
+    return BulkRatingResult(
+        received=received,
+        inserted=inserted,
+        failed=len(errors),
+        errors=[BulkRatingError(index=index, detail=detail) for index, detail in errors]
+    )
+
+
+def _create_course(db: Session, course_data: CourseCreate, retried: bool = False):
+    """Create (or reuse) a course and its school; returns (course, school_created)"""
     try:
         # Get or create school
-        school = db.query(School).filter(School.school_name == course_data.school_name).first()
-        if not school:
+        school_id = reference_data.school_id(db, course_data.school_name)
+        new_school = school_id is None
+        if new_school:
             school = School(school_name=course_data.school_name)
             db.add(school)
             db.flush()
+            school_id = school.school_id
         
         # Check if course already exists
         existing_course = db.query(Course).filter(
             Course.course_number == course_data.course_number,
-            Course.school_id == school.school_id
+            Course.school_id == school_id
         ).first()
         
         if existing_course:
@@ -195,186 +361,461 @@ def create_course(course_data: CourseCreate, db: Session = Depends(get_db), curr
                 course_name=course_data.course_name,
                 course_number=course_data.course_number,
                 major=course_data.major,
-                school_id=school.school_id,
+                school_id=school_id,
                 dialogues_requirement=course_data.dialogues_requirement,
                 delivery_mode=course_data.delivery_mode
             )
             db.add(course)
             db.flush()
+            db.add(CourseStats(course_id=course.course_id, school_id=course.school_id, major=course.major))
         
         # Only create rating if rating and review are provided
         if course_data.rating and course_data.review:
             # Handle textbook (optional)
-            book_id = None
-            if course_data.textbook:
-                book = db.query(Book).filter(
-                    (Book.isbn == course_data.textbook) | (Book.title == course_data.textbook)
-                ).first()
-                if not book:
-                    # Try to determine if it's ISBN or title
-                    if course_data.textbook.replace("-", "").replace(" ", "").isdigit():
-                        book = Book(isbn=course_data.textbook)
-                    else:
-                        book = Book(title=course_data.textbook)
-                    db.add(book)
-                    db.flush()
-                book_id = book.book_id
-            
-            # Create a default professor if none exists
-            professor = db.query(Professor).filter(
-                Professor.first_name == "Unknown",
-                Professor.last_name == "Professor"
-            ).first()
-            if not professor:
-                professor = Professor(first_name="Unknown", last_name="Professor")
-                db.add(professor)
-                db.flush()
+            book_id = resolve_textbook(db, course_data.textbook) if course_data.textbook else None
             
             # Create rating
             rating = Rating(
                 course_id=course.course_id,
-                professor_id=professor.professor_id,
+                professor_id=reference_data.unknown_professor_id(db),
                 book_id=book_id,
                 rating=course_data.rating,
                 review=course_data.review
             )
             db.add(rating)
+            db.flush()
+            record_rating(db, course.course_id, course_data.rating, rating.created_at)
         
         db.commit()
         db.refresh(course)
+        index_course(course)
+        course_suggestions.add_course(course)
+        reference_data.remember_school(course_data.school_name, school_id)
+        reference_data.remember_courses([course.course_id])
         
-        return course
+        return CourseResponse.model_validate(course), new_school
+    except IntegrityError as e:
+        db.rollback()
+        if not retried:
+            # A cached school or professor id may have been deleted; retry uncached
+            _forget_reference_data()
+            return _create_course(db, course_data, retried=True)
+        raise HTTPException(status_code=500, detail=f"Error creating course: {str(e)}")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating course: {str(e)}")
 
 
-@app.get("/courses", response_model=List[CourseWithRatings])
-def get_courses(
-    search: Optional[str] = None,
-    major: Optional[str] = None,
-    delivery_mode: Optional[str] = None,
-    school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
-):
-    """Get all courses with their average ratings"""
+@app.post("/courses", response_model=CourseResponse)
+async def create_course(course_data: CourseCreate, request: Request, response: Response, db: Session = Depends(get_request_db), current_admin: User = Depends(get_current_admin)):
+    """Create a new course (optionally with rating)"""
+    course, new_school = await run_db(db, _create_course, course_data)
+    mark_primary_reads(request, response)
+    response_cache.invalidate(f"school:{course.school_id}", f"course:{course.course_id}", "courses")
+    if new_school:
+        response_cache.invalidate("schools")
+    return course
+
+
+def _course_query(db: Session, ranked: bool = False):
+    """Course columns with school name and precomputed rating stats (no aggregation)
+
+    ranked inner-joins course_stats so the planner can walk a ranking index.
+    """
     query = db.query(
-        Course,
+        Course.course_id,
+        Course.course_name,
+        Course.course_number,
+        Course.major,
         School.school_name,
-        func.avg(Rating.rating).label('avg_rating'),
-        func.count(Rating.rating_id).label('rating_count')
-    ).join(School).outerjoin(Rating).group_by(Course.course_id, School.school_name)
+        Course.dialogues_requirement,
+        Course.delivery_mode,
+        CourseStats.rating_sum,
+        CourseStats.rating_count,
+        CourseStats.avg_rating,
+        CourseStats.bayesian_score,
+        Course.created_at
+    ).select_from(Course).join(School)
+    return query.join(CourseStats) if ranked else query.outerjoin(CourseStats)
+
+
+def _course_with_ratings(row) -> dict:
+    """A _course_query row in CourseWithRatings wire format"""
+    return {
+        "course_id": row.course_id,
+        "course_name": row.course_name,
+        "course_number": row.course_number,
+        "major": row.major,
+        "school_name": row.school_name,
+        "dialogues_requirement": row.dialogues_requirement,
+        "delivery_mode": row.delivery_mode,
+        "average_rating": row.rating_sum / row.rating_count if row.rating_count else None,
+        "rating_count": row.rating_count or 0,
+        "created_at": row.created_at,
+    }
+
+
+# sort name -> ranking column; sorted lists are descending, ties broken by course id.
+# Unrated courses (NULL rankings, or no course_stats row at all) come last.
+COURSE_SORTS = {
+    "avg_rating": CourseStats.avg_rating,
+    "rating_count": CourseStats.rating_count,
+    "bayesian": CourseStats.bayesian_score,
+    # Course ids increase with created_at
+    "newest": Course.course_id,
+}
+
+# Search matches are fetched this many ids per IN list, however many there are
+SEARCH_ID_CHUNK_SIZE = 500
+
+
+def _sort_position(sort: str):
+    """Row -> key that orders rows as _sorted_courses does, when sorted in reverse"""
+    key = COURSE_SORTS[sort].key
+
+    def position(row):
+        value = getattr(row, key)
+        return (value is not None, value if value is not None else 0, row.course_id)
+    return position
+
+
+def _chunks(ids: list):
+    return [ids[start:start + SEARCH_ID_CHUNK_SIZE] for start in range(0, len(ids), SEARCH_ID_CHUNK_SIZE)]
+
+
+def _sorted_courses(db: Session, conditions, sort: str, limit, cursor):
+    """Keyset-paginate courses on (sort column, course_id), descending
+
+    Ranked courses come from a walk of a course_stats ranking index (an inner
+    join); once they run out, unranked courses follow in course id order
+    through an outer join, so courses without a course_stats row are listed too.
+    """
+    column = COURSE_SORTS[sort]
+    value, after_id = None, None
+    if cursor:
+        position = decode_cursor(cursor, sort=str, value=(int, float, type(None)), course_id=int)
+        if position["sort"] != sort:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        value, after_id = position["value"], position["course_id"]
+
+    if column is Course.course_id:
+        query = _course_query(db).filter(*conditions)
+        if after_id is not None:
+            query = query.filter(Course.course_id < after_id)
+        query = query.order_by(Course.course_id.desc())
+        return (query.limit(limit + 1) if limit is not None else query).all()
+
+    results = []
+    if after_id is None or value is not None:
+        query = _course_query(db, ranked=True).filter(*conditions).filter(column.isnot(None))
+        if after_id is not None:
+            query = query.filter(or_(column < value, and_(column == value, CourseStats.course_id < after_id)))
+        query = query.order_by(column.desc(), CourseStats.course_id.desc())
+        results = (query.limit(limit + 1) if limit is not None else query).all()
+        after_id = None
+    if limit is None or len(results) <= limit:
+        query = _course_query(db).filter(*conditions).filter(column.is_(None))
+        if after_id is not None:
+            query = query.filter(Course.course_id < after_id)
+        query = query.order_by(Course.course_id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1 - len(results))
+        results += query.all()
+    return results
+
+
+def _list_courses(db: Session, search, major, delivery_mode, school_id, sort, limit, cursor):
+    """One page of courses with ratings as encoded JSON, plus the cursor for the next page"""
+    after_id = None
+    if cursor and not sort:
+        position = decode_cursor(cursor, course_id=int)
+        if "sort" in position:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after_id = position["course_id"]
     
     # Apply filters
+    conditions = []
+    ranked_ids = None
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (func.lower(Course.course_name).like(func.lower(search_term))) |
-            (func.lower(Course.course_number).like(func.lower(search_term))) |
-            (func.lower(Course.major).like(func.lower(search_term))) |
-            (func.lower(Course.dialogues_requirement).like(func.lower(search_term))) |
-            (func.lower(Course.delivery_mode).like(func.lower(search_term)))
-        )
+        # The search backend applies the filters too, so every match is paged through
+        ranked_ids = [
+            course_id for course_id, _ in search_courses(db, search, school_id, major, delivery_mode)
+        ]
+        if not sort:
+            if after_id is not None:
+                ranked_ids = ranked_ids[ranked_ids.index(after_id) + 1:] if after_id in ranked_ids else []
+            if limit is not None:
+                ranked_ids = ranked_ids[:limit + 1]
+        if not ranked_ids:
+            return dumps([]), None
     
     if major:
-        query = query.filter(func.lower(Course.major).like(func.lower(f"%{major}%")))
+        conditions.append(func.lower(Course.major).like(func.lower(f"%{major}%")))
     
     if delivery_mode:
-        query = query.filter(Course.delivery_mode == delivery_mode)
+        conditions.append(Course.delivery_mode == delivery_mode)
     
     if school_id:
-        query = query.filter(Course.school_id == school_id)
+        conditions.append(Course.school_id == school_id)
     
-    results = query.all()
+    if sort and ranked_ids:
+        # Each chunk yields its own first page; the page across all of them is the best of those
+        results = []
+        for chunk in _chunks(ranked_ids):
+            results += _sorted_courses(db, conditions + [Course.course_id.in_(chunk)], sort, limit, cursor)
+        results.sort(key=_sort_position(sort), reverse=True)
+        if limit is not None:
+            results = results[:limit + 1]
+    elif sort:
+        results = _sorted_courses(db, conditions, sort, limit, cursor)
+    elif ranked_ids:
+        # Only this page's courses are fetched; put them back in relevance order
+        rank = {course_id: position for position, course_id in enumerate(ranked_ids)}
+        results = []
+        for chunk in _chunks(ranked_ids):
+            results += _course_query(db).filter(*conditions, Course.course_id.in_(chunk)).all()
+        results.sort(key=lambda row: rank[row.course_id])
+    else:
+        # Keyset pagination on the primary key
+        query = _course_query(db).filter(*conditions)
+        if after_id is not None:
+            query = query.filter(Course.course_id > after_id)
+        query = query.order_by(Course.course_id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        results = query.all()
     
-    courses_with_ratings = []
-    for course, school_name, avg_rating, rating_count in results:
-        courses_with_ratings.append(CourseWithRatings(
-            course_id=course.course_id,
-            course_name=course.course_name,
-            course_number=course.course_number,
-            major=course.major,
-            school_name=school_name,
-            dialogues_requirement=course.dialogues_requirement,
-            delivery_mode=course.delivery_mode,
-            average_rating=float(avg_rating) if avg_rating else None,
-            rating_count=rating_count or 0,
-            created_at=course.created_at
-        ))
+    next_cursor = None
+    if limit is not None and len(results) > limit:
+        results = results[:limit]
+        if sort:
+            last = results[-1]
+            next_cursor = encode_cursor({"sort": sort, "value": getattr(last, COURSE_SORTS[sort].key), "course_id": last.course_id})
+        else:
+            next_cursor = encode_cursor({"course_id": results[-1].course_id})
     
-    return courses_with_ratings
+    return dumps([_course_with_ratings(row) for row in results]), next_cursor
 
 
-@app.get("/courses/{course_id}", response_model=CourseWithRatings)
-def get_course(course_id: int, db: Session = Depends(get_db)):
-    """Get a specific course by ID"""
-    result = db.query(
-        Course,
-        School.school_name,
-        func.avg(Rating.rating).label('avg_rating'),
-        func.count(Rating.rating_id).label('rating_count')
-    ).join(School).outerjoin(Rating).filter(
-        Course.course_id == course_id
-    ).group_by(Course.course_id, School.school_name).first()
+@app.get("/courses", response_model=List[CourseWithRatings])
+async def get_courses(
+    request: Request,
+    response: Response,
+    search: Optional[str] = None,
+    major: Optional[str] = None,
+    delivery_mode: Optional[str] = None,
+    school_id: Optional[int] = None,
+    sort: Optional[str] = Query(None, pattern="^(avg_rating|rating_count|newest|bayesian)$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_request_read_db)
+):
+    """Get all courses with their average ratings (paginated when limit or cursor is given)
+
+    sort orders by a precomputed ranking, highest first; without it courses
+    come in id order, or by relevance when searching.
+    """
+    limit = page_size(limit, cursor)
+    # search and major are matched case-insensitively and search terms are
+    # tokenized, so they share cache entries across case (and search, spacing)
+    key = cache_key(
+        "courses",
+        search=" ".join(search.lower().split()) if search else None,
+        major=major.lower() if major else None,
+        delivery_mode=delivery_mode or None,
+        school_id=school_id or None,
+        sort=sort,
+        limit=limit,
+        cursor=cursor
+    )
+    if search:
+        await wait_for_search()
+    courses, next_cursor = await conditional_get(
+        request,
+        response,
+        db,
+        key,
+        ["courses"],
+        course_list_version,
+        lambda session: _list_courses(session, search, major, delivery_mode, school_id, sort, limit, cursor)
+    )
+    set_next_cursor(response, next_cursor)
+    return json_response(courses, response)
+
+
+def _top_courses(db: Session, school_id, major, limit) -> bytes:
+    """Highest Bayesian scores first: a range scan of a course_stats ranking index"""
+    query = _course_query(db, ranked=True).filter(CourseStats.bayesian_score.isnot(None))
+    if school_id:
+        query = query.filter(CourseStats.school_id == school_id)
+    if major:
+        query = query.filter(CourseStats.major == major)
+    rows = query.order_by(CourseStats.bayesian_score.desc(), CourseStats.course_id.desc()).limit(limit).all()
+    return dumps([dict(_course_with_ratings(row), bayesian_score=row.bayesian_score) for row in rows])
+
+
+# Registered before /courses/{course_id} so "top" is not parsed as an id
+@app.get("/courses/top", response_model=List[RankedCourse])
+async def get_top_courses(
+    request: Request,
+    response: Response,
+    school_id: Optional[int] = None,
+    major: Optional[str] = None,
+    limit: int = Query(DEFAULT_TOP_COURSES, ge=1, le=MAX_TOP_COURSES),
+    db: Session = Depends(get_request_read_db)
+):
+    """Top-rated courses by Bayesian average, optionally within a school and/or exact major"""
+    courses = await conditional_get(
+        request,
+        response,
+        db,
+        cache_key("courses_top", school_id=school_id or None, major=major or None, limit=limit),
+        ["courses"],
+        course_list_version,
+        lambda session: _top_courses(session, school_id, major, limit)
+    )
+    return json_response(courses, response)
+
+
+# Registered before /courses/{course_id} so "suggest" is not parsed as an id
+@app.get("/courses/suggest", response_model=List[CourseSuggestion])
+async def suggest_courses(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    school_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_SUGGESTIONS, ge=1, le=MAX_SUGGESTIONS),
+):
+    """Courses whose number or name starts with q, for typeahead; answered from memory"""
+    await wait_for_suggestions()
+    return json_response(dumps(course_suggestions.suggest(q, school_id, limit)), response)
+
+
+def _get_course(db: Session, course_id: int) -> bytes:
+    result = _course_query(db).filter(Course.course_id == course_id).first()
     
     if not result:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    course, school_name, avg_rating, rating_count = result
-    
-    return CourseWithRatings(
-        course_id=course.course_id,
-        course_name=course.course_name,
-        course_number=course.course_number,
-        major=course.major,
-        school_name=school_name,
-        dialogues_requirement=course.dialogues_requirement,
-        delivery_mode=course.delivery_mode,
-        average_rating=float(avg_rating) if avg_rating else None,
-        rating_count=rating_count or 0,
-        created_at=course.created_at
+    return dumps(_course_with_ratings(result))
+
+
+@app.get("/courses/{course_id}", response_model=CourseWithRatings)
+async def get_course(course_id: int, request: Request, response: Response, db: Session = Depends(get_request_read_db)):
+    """Get a specific course by ID"""
+    course = await conditional_get(
+        request,
+        response,
+        db,
+        cache_key("course", course_id=course_id),
+        [f"course:{course_id}"],
+        lambda session: course_version(session, course_id),
+        lambda session: _get_course(session, course_id)
     )
+    return json_response(course, response)
 
 
-@app.get("/courses/{course_id}/detail", response_model=CourseDetail)
-def get_course_detail(course_id: int, db: Session = Depends(get_db)):
-    """Get a specific course with all its ratings"""
-    # Get course info with average rating
-    result = db.query(
-        Course,
-        School.school_name,
-        func.avg(Rating.rating).label('avg_rating'),
-        func.count(Rating.rating_id).label('rating_count')
-    ).join(School).outerjoin(Rating).filter(
-        Course.course_id == course_id
-    ).group_by(Course.course_id, School.school_name).first()
+def _course_detail(db: Session, course_id: int, limit, cursor):
+    """A course with one page of its ratings as encoded JSON, plus the cursor for the next page"""
+    # Get course info with precomputed rating stats
+    result = _course_query(db).filter(Course.course_id == course_id).first()
     
     if not result:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    course, school_name, avg_rating, rating_count = result
+    # Get ratings for this course with book information, keyset-paginated on (created_at, rating_id)
+    ratings_query = db.query(
+        Rating.rating_id,
+        Rating.course_id,
+        Rating.rating,
+        Rating.review,
+        Rating.created_at,
+        Book.title,
+        Book.isbn
+    ).outerjoin(Book, Rating.book_id == Book.book_id).filter(Rating.course_id == course_id)
+    if cursor:
+        position = decode_cursor(cursor, created_at=str, rating_id=int)
+        created_at = decode_cursor_datetime(position["created_at"])
+        ratings_query = ratings_query.filter(or_(
+            Rating.created_at < created_at,
+            and_(Rating.created_at == created_at, Rating.rating_id < position["rating_id"])
+        ))
+    ratings_query = ratings_query.order_by(Rating.created_at.desc(), Rating.rating_id.desc())
+    if limit is not None:
+        ratings_query = ratings_query.limit(limit + 1)
+    ratings = ratings_query.all()
     
-    # Get all ratings for this course with book information
-    ratings = db.query(Rating).options(joinedload(Rating.book)).filter(Rating.course_id == course_id).order_by(Rating.created_at.desc()).all()
+    next_cursor = None
+    if limit is not None and len(ratings) > limit:
+        ratings = ratings[:limit]
+        next_cursor = encode_cursor({"created_at": ratings[-1].created_at, "rating_id": ratings[-1].rating_id})
     
-    return CourseDetail(
-        course_id=course.course_id,
-        course_name=course.course_name,
-        course_number=course.course_number,
-        major=course.major,
-        school_name=school_name,
-        dialogues_requirement=course.dialogues_requirement,
-        delivery_mode=course.delivery_mode,
-        average_rating=float(avg_rating) if avg_rating else None,
-        rating_count=rating_count or 0,
-        created_at=course.created_at,
-        ratings=[RatingResponse(
-            rating_id=r.rating_id,
-            course_id=r.course_id,
-            rating=r.rating,
-            review=r.review,
-            created_at=r.created_at,
-            book_title=r.book.title if r.book else None,
-            book_isbn=r.book.isbn if r.book else None
-        ) for r in ratings]
-    )
\ No newline at end of file
+    # Same field order as CourseDetail / RatingResponse
+    detail = _course_with_ratings(result)
+    detail["ratings"] = [{
+        "rating_id": r.rating_id,
+        "course_id": r.course_id,
+        "rating": r.rating,
+        "review": r.review,
+        "created_at": r.created_at,
+        "book_title": r.title,
+        "book_isbn": r.isbn,
+    } for r in ratings]
+    return dumps(detail), next_cursor
+
+
+@app.get("/courses/{course_id}/detail", response_model=CourseDetail)
+async def get_course_detail(
+    course_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_request_read_db)
+):
+    """Get a specific course with its ratings, newest first (paginated when limit or cursor is given)"""
+    limit = page_size(limit, cursor)
+    detail, next_cursor = await conditional_get(
+        request,
+        response,
+        db,
+        cache_key("course_detail", course_id=course_id, limit=limit, cursor=cursor),
+        [f"course:{course_id}"],
+        lambda session: course_version(session, course_id),
+        lambda session: _course_detail(session, course_id, limit, cursor)
+    )
+    set_next_cursor(response, next_cursor)
+    return json_response(detail, response)
+
+
+def _export_response(stream, export_format: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'}
+    )
+
+
+@app.get("/export/courses")
+def export_courses(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    school_id: Optional[int] = None,
+    updated_since: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream every course with its rating stats as NDJSON or CSV (admin only)"""
+    stream = stream_courses(format, school_id=school_id, updated_since=updated_since, updated_before=updated_before)
+    return _export_response(stream, format, "courses")
+
+
+@app.get("/export/ratings")
+def export_ratings(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    school_id: Optional[int] = None,
+    updated_since: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream every rating as NDJSON or CSV (admin only)"""
+    stream = stream_ratings(format, school_id=school_id, updated_since=updated_since, updated_before=updated_before)
+    return _export_response(stream, format, "ratings")
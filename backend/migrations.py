@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for existing RateMyClass databases.
+
+create_all only creates missing tables, so new columns and indexes on
+existing tables are added here. Applied versions are recorded in the
+schema_version table. Every migration is idempotent, so on a fresh
+database (where create_all already built everything) they only record
+their version. The API applies pending migrations on startup.
+
+To change the schema, update the model in database.py and append a
+migration with the next version number; never edit an applied one.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py status     # list applied and pending migrations
+"""
+
+import sys
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, insert, inspect, select, text, update
+from database import SessionLocal, engine, init_db, Course, CourseStats, Rating, User
+from course_stats import rebuild_course_stats
+from search import ensure_fulltext_index
+from textbooks import backfill_books, ensure_title_hash_column
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _add_columns(model, *names):
+    """ALTER TABLE ... ADD COLUMN for model columns the table does not have yet"""
+    def migrate(bind):
+        table = model.__table__
+        existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+        with bind.begin() as conn:
+            for name in names:
+                if name not in existing:
+                    column = table.c[name]
+                    ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(dialect=bind.dialect)}"
+                    # Existing rows take the server default, so NOT NULL columns need one
+                    if column.server_default is not None:
+                        ddl += f" DEFAULT {column.server_default.arg}"
+                        if not column.nullable:
+                            ddl += " NOT NULL"
+                    conn.execute(text(ddl))
+    return migrate
+
+
+_add_ranking_columns = _add_columns(CourseStats, "school_id", "major", "avg_rating", "bayesian_score")
+
+
+def _rebuild_course_stats(bind):
+    # rebuild writes every current model column, including ones added by later migrations
+    _add_ranking_columns(bind)
+    db = SessionLocal(bind=bind)
+    try:
+        rebuild_course_stats(db)
+    finally:
+        db.close()
+
+
+def _backfill_books(bind):
+    # Existing books are only found again by resolve_textbooks once their keys are canonical
+    db = SessionLocal(bind=bind)
+    try:
+        backfill_books(db)
+    finally:
+        db.close()
+
+
+def _add_title_hashes(bind):
+    ensure_title_hash_column(bind)
+    _backfill_books(bind)
+
+
+def _create_indexes(*indexes):
+    def migrate(bind):
+        for index in indexes:
+            index.create(bind=bind, checkfirst=True)
+    return migrate
+
+
+def _model_index(model, name):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+def _merge_duplicate_courses(bind) -> int:
+    """
+    Merge courses sharing a (school_id, course_number) into the oldest one.
+
+    Grouped by the database's own comparison, so exactly the rows the unique
+    index would reject are merged. Ratings move to the kept course; the
+    duplicates and their course_stats rows are deleted. Returns the number
+    of courses merged away.
+    """
+    course, rating, stats = Course.__table__, Rating.__table__, CourseStats.__table__
+    merged = 0
+    with bind.begin() as conn:
+        duplicates = conn.execute(
+            select(course.c.school_id, course.c.course_number, func.min(course.c.course_id))
+            .group_by(course.c.school_id, course.c.course_number)
+            .having(func.count() > 1)
+        ).all()
+        for school_id, course_number, kept_id in duplicates:
+            merged_ids = conn.execute(
+                select(course.c.course_id).where(
+                    course.c.school_id == school_id,
+                    course.c.course_number == course_number,
+                    course.c.course_id != kept_id,
+                )
+            ).scalars().all()
+            conn.execute(update(rating).where(rating.c.course_id.in_(merged_ids)).values(course_id=kept_id))
+            conn.execute(delete(stats).where(stats.c.course_id.in_(merged_ids)))
+            conn.execute(delete(course).where(course.c.course_id.in_(merged_ids)))
+            # Picked up by incremental exports
+            conn.execute(update(course).where(course.c.course_id == kept_id).values(updated_at=datetime.utcnow()))
+            merged += len(merged_ids)
+    return merged
+
+
+def _unique_course_numbers(bind):
+    # Existing duplicates would make the index fail and block every later migration
+    merged = _merge_duplicate_courses(bind)
+    if merged:
+        print(f"✓ Merged {merged} courses that repeated a course number in the same school")
+        _rebuild_course_stats(bind)
+    _model_index(Course, "uq_course_school_number").create(bind=bind, checkfirst=True)
+
+
+def _add_course_rankings(bind):
+    _add_ranking_columns(bind)
+    _create_indexes(*CourseStats.__table__.indexes)(bind)
+    _rebuild_course_stats(bind)
+
+
+def _add_submission_ids(bind):
+    _add_columns(Rating, "submission_id")(bind)
+    _model_index(Rating, "uq_rating_submission_id").create(bind=bind, checkfirst=True)
+
+
+# (version, description, migrate(engine)), in order
+MIGRATIONS = [
+    (1, "Add books.title_hash", _add_title_hashes),
+    (2, "Populate course_stats from ratings", _rebuild_course_stats),
+    (3, "Index course filters, rating order and updated_at", _create_indexes(
+        _model_index(Course, "ix_course_major"),
+        _model_index(Course, "ix_course_delivery_mode"),
+        _model_index(Course, "ix_course_updated_at"),
+        _model_index(Rating, "ix_rating_course_created"),
+        _model_index(Rating, "ix_rating_updated_at"),
+    )),
+    (4, "Unique course number per school", _unique_course_numbers),
+    (5, "Add course rankings to course_stats", _add_course_rankings),
+    (6, "Add rating.submission_id", _add_submission_ids),
+    # Version 1 only added the column until it backfilled too; finish databases it already ran on
+    (7, "Canonicalize book ISBNs and title hashes", _backfill_books),
+    (8, "Add user.token_version", _add_columns(User, "token_version")),
+    # MySQL only; the other backends search with the in-process index
+    (9, "Add the course search FULLTEXT index", ensure_fulltext_index),
+]
+
+
+def applied_versions(bind=engine) -> set:
+    schema_version.create(bind=bind, checkfirst=True)
+    with bind.connect() as conn:
+        return {version for (version,) in conn.execute(select(schema_version.c.version))}
+
+
+def pending_migrations(bind=engine) -> list:
+    applied = applied_versions(bind)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def run_migrations(bind=engine) -> list:
+    """Apply pending migrations in order; returns the versions applied"""
+    applied = []
+    for version, description, migrate in pending_migrations(bind):
+        migrate(bind)
+        with bind.begin() as conn:
+            conn.execute(insert(schema_version).values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+        print(f"✓ Applied migration {version}: {description}")
+    return applied
+
+
+def main():
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and sys.argv[1] != "status"):
+        print("Usage: python migrations.py [status]")
+        sys.exit(2)
+
+    try:
+        init_db()
+        if len(sys.argv) == 2:
+            pending = {version for version, _, _ in pending_migrations()}
+            for version, description, _ in MIGRATIONS:
+                print(f"  {'pending' if version in pending else 'applied'}  {version}: {description}")
+            return
+        if not run_migrations():
+            print("✓ Database schema is up to date")
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Opaque keyset cursors for paginated endpoints.
+
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64url-wrapped so clients treat it as an opaque token. Paginated
+endpoints return the cursor for the next page in the X-Next-Cursor header
+(absent on the last page).
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: dict) -> str:
+    """Encode a sort key as an opaque cursor"""
+    payload = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in values.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _has_type(value, expected) -> bool:
+    # bool is an int subclass, but no cursor key holds a boolean
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, **types) -> dict:
+    """
+    Decode a cursor, requiring each given key with a value of its type
+    (a type or tuple of types, as for isinstance), e.g.
+    decode_cursor(cursor, course_id=int). Raises 400 on a malformed cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, dict) or any(
+            key not in values or not _has_type(values[key], expected) for key, expected in types.items()
+        ):
+            raise ValueError("missing or mistyped cursor keys")
+        return values
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_cursor_datetime(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_size(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    """Effective page size; None keeps the legacy unpaginated response"""
+    if limit is None and cursor is not None:
+        return DEFAULT_PAGE_SIZE
+    return limit
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Query budget check for the API's hot paths.
+
+Calls each endpoint through the real app and counts the SQL statements it
+runs (see sql_metrics.py). A scenario fails if it runs more than its
+budget, so an N+1 query added to the course detail page or the write
+paths fails CI. Budgets are set to what the endpoints run today; lower
+them when an endpoint gets cheaper. Exits non-zero on failure.
+tests/test_query_budget.py runs the same scenarios under pytest against a
+freshly seeded scratch database.
+
+Run it against a scratch database seeded with benchmarks/seed.py: the
+write scenarios add ratings and a course. The response cache and read
+replicas are disabled so every request reaches the database.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python query_budget.py
+    python query_budget.py --verbose    # print every statement
+"""
+
+import os
+import sys
+import uuid
+
+# Every request must reach the primary database through the sync engine
+os.environ["DB_ASYNC"] = "false"
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+
+from fastapi.testclient import TestClient
+from database import engine
+from sql_metrics import QueryBudgetExceeded, assert_query_budget
+from startup import DEFAULT_ADMIN_PASSWORD, DEFAULT_ADMIN_USERNAME, DEFAULT_SCHOOL
+import main
+
+BULK_RATINGS = 50
+
+# (name, method, path, JSON body, admin only, max queries)
+SCENARIOS = [
+    ("list schools", "GET", "/schools", None, False, 2),
+    ("school courses", "GET", "/schools/{school_id}/courses", None, False, 2),
+    ("course list", "GET", "/courses?limit=50", None, False, 4),
+    ("top courses", "GET", "/courses/top", None, False, 4),
+    ("course", "GET", "/courses/{course_id}", None, False, 2),
+    # Version check, course and one page of ratings, however many ratings are shown
+    ("course detail", "GET", "/courses/{course_id}/detail?limit=50", None, False, 3),
+    ("create rating", "POST", "/ratings", {"course_id": "{course_id}", "rating": 4, "review": "Budget check", "textbook": "Budget Check Book"}, False, 9),
+    ("create rating with submission id", "POST", "/ratings", {"course_id": "{course_id}", "rating": 4, "review": "Budget check", "submission_id": "{submission_id}"}, False, 9),
+    ("replayed submission", "POST", "/ratings", {"course_id": "{course_id}", "rating": 4, "review": "Budget check", "submission_id": "{submission_id}"}, False, 3),
+    # The same number of statements for 1 rating or a whole chunk
+    (f"bulk ratings ({BULK_RATINGS})", "POST", "/ratings/bulk", "{bulk_ratings}", True, 13),
+    ("create course", "POST", "/courses", {"course_name": "Budget Check", "course_number": "{course_number}", "major": "Testing", "school_name": DEFAULT_SCHOOL, "delivery_mode": "Online", "rating": 5, "textbook": "Budget Check Book"}, True, 5),
+]
+
+
+def fill(value, ids):
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}") and not isinstance(ids.get(value[1:-1], ""), str):
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def sample_ids(client) -> dict:
+    school_id = client.get("/schools").json()[0]["school_id"]
+    course_ids = [course["course_id"] for course in client.get(f"/schools/{school_id}/courses").json()[:5]]
+    return {
+        "school_id": school_id,
+        "course_id": course_ids[0],
+        "submission_id": uuid.uuid4().hex,
+        "course_number": f"BUDGET {uuid.uuid4().hex[:8]}",
+        "bulk_ratings": [
+            {"course_id": course_ids[i % len(course_ids)], "rating": i % 5 + 1, "review": "Budget check", "textbook": f"Budget Book {i % 3}"}
+            for i in range(BULK_RATINGS)
+        ],
+    }
+
+
+def login_admin(client) -> dict:
+    """Authorization headers for the default admin"""
+    token = client.post("/auth/login", json={"username": DEFAULT_ADMIN_USERNAME, "password": DEFAULT_ADMIN_PASSWORD}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def run_scenario(client, scenario, ids: dict, admin_headers: dict):
+    """Send one scenario's request; (response, stats), or QueryBudgetExceeded if it ran too many queries"""
+    name, method, path, body, admin, budget = scenario
+    return assert_query_budget(
+        client, method, fill(path, ids), budget,
+        json=fill(body, ids), headers=admin_headers if admin else None
+    )
+
+
+def main_check():
+    verbose = "--verbose" in sys.argv[1:]
+    engine.echo = False
+
+    failures = 0
+    with TestClient(main.app) as client:
+        admin_headers = login_admin(client)
+        ids = sample_ids(client)
+        for scenario in SCENARIOS:
+            name, budget = scenario[0], scenario[-1]
+            try:
+                response, stats = run_scenario(client, scenario, ids, admin_headers)
+            except QueryBudgetExceeded as e:
+                failures += 1
+                print(f"✗ {name}: {e}")
+                continue
+            if response.status_code >= 400:
+                failures += 1
+                print(f"✗ {name}: HTTP {response.status_code}")
+                continue
+            print(f"✓ {name} ({stats.queries} of {budget} queries, {stats.db_seconds * 1000:.1f} ms in the database)")
+            if verbose:
+                for statement in stats.statements:
+                    print(f"    {' '.join(statement.split())[:200]}")
+
+    print("=" * 60)
+    if failures:
+        print(f"✗ {failures} of {len(SCENARIOS)} scenarios are over their query budget")
+        sys.exit(1)
+    print(f"✓ All {len(SCENARIOS)} scenarios are within their query budgets")
+
+
+if __name__ == "__main__":
+    main_check()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Query plan check for the API's hot paths.
+
+Calls each endpoint through the real app, records every SELECT/UPDATE/
+DELETE it sends to the database and runs EXPLAIN on it (EXPLAIN QUERY
+PLAN on SQLite). A scenario fails if any of its statements scans a whole
+table, other than the tables it is expected to scan. Exits non-zero on
+failure. tests/test_query_plans.py runs the same scenarios under pytest
+against a freshly seeded scratch database.
+
+Run it against a scratch database seeded with benchmarks/seed.py: the
+write scenarios add a rating. The response cache and read replicas are
+disabled so every request reaches the database.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db python query_plans.py
+    python query_plans.py --verbose    # print every statement and its plan
+"""
+
+import os
+import re
+import sys
+
+# Every request must reach the primary database through the sync engine
+os.environ["DB_ASYNC"] = "false"
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from database import Base, engine
+from pagination import encode_cursor
+import main
+
+TABLES = set(Base.metadata.tables)
+HOT_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+# (name, method, path, JSON body, tables the scenario may scan in full)
+SCENARIOS = [
+    ("list schools", "GET", "/schools", None, {"school"}),
+    ("school courses", "GET", "/schools/{school_id}/courses", None, set()),
+    # Walks the primary key and stops after the page
+    ("course list first page", "GET", "/courses?limit=50", None, {"course"}),
+    ("course list next page", "GET", "/courses?limit=50&cursor={course_cursor}", None, set()),
+    ("course search", "GET", "/courses?search=intro&limit=50", None, set()),
+    ("courses by school", "GET", "/courses?school_id={school_id}&limit=50", None, set()),
+    ("courses by delivery mode", "GET", "/courses?delivery_mode=Online&limit=50", None, set()),
+    # Substring match on major cannot use an index
+    ("courses by major", "GET", "/courses?major=science&limit=50", None, {"course"}),
+    # Sorted lists walk a course_stats ranking index (newest: its primary key)
+    ("courses by bayesian score", "GET", "/courses?sort=bayesian&limit=50", None, {"course_stats"}),
+    ("courses by rating count", "GET", "/courses?sort=rating_count&limit=50", None, {"course_stats"}),
+    ("top courses", "GET", "/courses/top", None, set()),
+    ("top courses by school", "GET", "/courses/top?school_id={school_id}", None, set()),
+    ("course", "GET", "/courses/{course_id}", None, set()),
+    ("course detail", "GET", "/courses/{course_id}/detail?limit=20", None, set()),
+    ("course detail next page", "GET", "/courses/{course_id}/detail?limit=20&cursor={rating_cursor}", None, set()),
+    ("create rating", "POST", "/ratings", {"course_id": "{course_id}", "rating": 4, "review": "Plan check", "textbook": "Plan Check Book"}, set()),
+]
+
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements = []
+        self.enabled = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and not executemany and statement.lstrip().upper().startswith(HOT_STATEMENTS):
+            self.statements.append((statement, parameters))
+
+
+def explain(statement: str, parameters):
+    """(plan lines, tables scanned in full) for one statement"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            lines = [row[-1] for row in rows]
+            scanned = {match.group(1) for line in lines for match in [re.match(r"SCAN (\w+)", line)] if match}
+        else:
+            result = conn.exec_driver_sql("EXPLAIN " + statement, parameters)
+            rows = [dict(row._mapping) for row in result]
+            lines = [f"{row.get('table')}: type={row.get('type')} key={row.get('key')}" for row in rows]
+            scanned = {row.get("table") for row in rows if row.get("type") in ("ALL", "index")}
+    return lines, {table for table in scanned if table in TABLES}
+
+
+def fill(value, ids):
+    if isinstance(value, str):
+        filled = value.format(**ids)
+        return int(filled) if value.startswith("{") and filled.isdigit() else filled
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def sample_ids(client) -> dict:
+    school_id = client.get("/schools").json()[0]["school_id"]
+    course_id = client.get(f"/schools/{school_id}/courses").json()[0]["course_id"]
+    detail = client.get(f"/courses/{course_id}/detail").json()
+    first_rating = detail["ratings"][0] if detail["ratings"] else {"created_at": "2000-01-01T00:00:00", "rating_id": 0}
+    return {
+        "school_id": school_id,
+        "course_id": course_id,
+        "course_cursor": encode_cursor({"course_id": course_id}),
+        "rating_cursor": encode_cursor({"created_at": first_rating["created_at"], "rating_id": first_rating["rating_id"]}),
+    }
+
+
+def record_statements() -> StatementRecorder:
+    recorder = StatementRecorder()
+    event.listen(engine, "before_cursor_execute", recorder)
+    return recorder
+
+
+def run_scenario(client, recorder: StatementRecorder, scenario, ids: dict, verbose: bool = False):
+    """Send one scenario's request; (response, statements run, full table scans it should not do)"""
+    name, method, path, body, allowed = scenario
+    recorder.statements = []
+    recorder.enabled = True
+    try:
+        response = client.request(method, fill(path, ids), json=fill(body, ids))
+    finally:
+        recorder.enabled = False
+
+    problems = []
+    for statement, parameters in recorder.statements:
+        lines, scanned = explain(statement, parameters)
+        if verbose:
+            print(f"    {' '.join(statement.split())}")
+            for line in lines:
+                print(f"      {line}")
+        for table in sorted(scanned - allowed):
+            problems.append(f"full scan of {table} in: {' '.join(statement.split())[:200]}")
+    return response, len(recorder.statements), problems
+
+
+def main_check():
+    verbose = "--verbose" in sys.argv[1:]
+    recorder = record_statements()
+    engine.echo = False
+
+    failures = 0
+    with TestClient(main.app) as client:
+        ids = sample_ids(client)
+        for scenario in SCENARIOS:
+            name = scenario[0]
+            response, statements, problems = run_scenario(client, recorder, scenario, ids, verbose)
+            if response.status_code >= 400:
+                print(f"✗ {name}: HTTP {response.status_code}")
+                failures += 1
+            elif problems:
+                failures += 1
+                print(f"✗ {name}")
+                for problem in problems:
+                    print(f"    {problem}")
+            else:
+                print(f"✓ {name} ({statements} statements)")
+
+    print("=" * 60)
+    if failures:
+        print(f"✗ {failures} of {len(SCENARIOS)} scenarios use full table scans")
+        sys.exit(1)
+    print(f"✓ All {len(SCENARIOS)} scenarios use indexes")
+
+
+if __name__ == "__main__":
+    main_check()
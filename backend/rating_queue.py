@@ -0,0 +1,271 @@
+"""
+Write-behind queue for POST /ratings.
+
+With RATING_WRITE_BEHIND=true a validated rating is appended to a local
+journal file (fsynced unless RATING_JOURNAL_FSYNC=false) and acknowledged
+with 202 Accepted. A background task commits queued ratings in grouped
+transactions through insert_rating_chunk every RATING_FLUSH_INTERVAL_MS,
+or sooner once RATING_FLUSH_MAX_ITEMS are waiting. Queued ratings become
+visible to reads when their flush commits.
+
+Each worker appends to its own journal in RATING_JOURNAL_DIR and holds an
+exclusive lock on it. Every flush seals the journal, starts a new one and
+deletes the sealed file once all of its ratings are committed; if the
+database is unavailable, even for a single rating, the sealed file is kept
+and retried. On startup a worker adopts journals no running worker holds
+a lock on (left by a crash) and flushes them. Each entry carries a
+submission_id that is stored on the rating row, so entries that committed
+just before a crash are skipped when they are replayed. Journals rely on
+POSIX file locks.
+"""
+
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from starlette.concurrency import run_in_threadpool
+from cache import response_cache
+from database import SessionLocal
+from ratings import DUPLICATE_SUBMISSION, existing_submissions, insert_rating_chunk
+from schemas import RatingCreate
+
+RATING_WRITE_BEHIND = os.getenv("RATING_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+RATING_JOURNAL_DIR = os.getenv("RATING_JOURNAL_DIR", "rating_journal")
+RATING_JOURNAL_FSYNC = os.getenv("RATING_JOURNAL_FSYNC", "true").lower() in ("1", "true", "yes")
+RATING_FLUSH_INTERVAL_MS = int(os.getenv("RATING_FLUSH_INTERVAL_MS", "200"))
+RATING_FLUSH_MAX_ITEMS = int(os.getenv("RATING_FLUSH_MAX_ITEMS", "500"))
+
+
+def read_journal(path: str) -> list:
+    """Entries of a journal file; a torn last line from a crash is skipped"""
+    entries = []
+    with open(path, "rb") as journal:
+        for line in journal:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def _lock(fd: int) -> bool:
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _commit_entries(entries: list):
+    """
+    Insert journal entries not yet in the database; returns (inserted, duplicates, failed, course ids).
+
+    Only entries that can never be inserted (e.g. their course is gone) are
+    dropped as failed. A database error that may pass (TRANSIENT_ERRORS)
+    raises, so the journal is kept and retried.
+    """
+    inserted = duplicates = failed = 0
+    course_ids = set()
+    # A resubmitted rating may appear more than once in a journal
+    unique = list({entry["submission_id"]: entry for entry in entries}.values())
+    duplicates += len(entries) - len(unique)
+    db = SessionLocal()
+    try:
+        for start in range(0, len(unique), RATING_FLUSH_MAX_ITEMS):
+            batch = unique[start:start + RATING_FLUSH_MAX_ITEMS]
+            committed = existing_submissions(db, (entry["submission_id"] for entry in batch))
+            duplicates += len(committed)
+            chunk = [
+                (entry["submission_id"], RatingCreate.model_validate(entry))
+                for entry in batch if entry["submission_id"] not in committed
+            ]
+            if not chunk:
+                continue
+            chunk_inserted, errors, chunk_course_ids = insert_rating_chunk(db, chunk, raise_transient=True)
+            inserted += chunk_inserted
+            course_ids |= chunk_course_ids
+            for submission_id, detail in errors:
+                if detail == DUPLICATE_SUBMISSION:
+                    duplicates += 1
+                else:
+                    failed += 1
+                    print(f"Warning: dropped queued rating {submission_id}: {detail}")
+    finally:
+        db.close()
+    return inserted, duplicates, failed, course_ids
+
+
+class RatingQueue:
+    def __init__(self, directory: str, enabled: bool = RATING_WRITE_BEHIND):
+        self.directory = directory
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._journal = None
+        self._journal_path = None
+        self._journal_entries = 0
+        # (path, fd) of sealed journals waiting to be committed, oldest first
+        self._sealed = []
+        self._wakeup = None
+        self._task = None
+        self.depth = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def _new_path(self, suffix: str) -> str:
+        return os.path.join(self.directory, f"ratings-{uuid.uuid4().hex}{suffix}")
+
+    def _open_journal(self):
+        # Lock under a name other workers ignore, then publish it as a journal
+        tmp_path = self._new_path(".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        path = tmp_path[:-len(".tmp")] + ".journal"
+        os.rename(tmp_path, path)
+        self._journal_path, self._journal, self._journal_entries = path, fd, 0
+
+    def _adopt_orphans(self):
+        """Take over journals whose worker exited before flushing them"""
+        paths = glob.glob(os.path.join(self.directory, "ratings-*.journal"))
+        paths += glob.glob(os.path.join(self.directory, "ratings-*.sealed"))
+        for path in sorted(paths, key=os.path.getmtime):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            if not _lock(fd) or not os.path.exists(path):
+                # Held by a running worker, or adopted and flushed by another one
+                os.close(fd)
+                continue
+            sealed = self._new_path(".sealed")
+            os.rename(path, sealed)
+            self._sealed.append((sealed, fd))
+            self.depth += len(read_journal(sealed))
+
+    def append(self, entry: dict):
+        """Durably append one entry to the active journal"""
+        line = json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            os.write(self._journal, line)
+            if RATING_JOURNAL_FSYNC:
+                os.fsync(self._journal)
+            self._journal_entries += 1
+            self.depth += 1
+            return self._journal_entries
+
+    async def submit(self, rating_data: RatingCreate) -> str:
+        """Queue a validated rating; returns its submission_id"""
+        submission_id = rating_data.submission_id or uuid.uuid4().hex
+        entry = dict(rating_data.model_dump(mode="json"), submission_id=submission_id)
+        if await run_in_threadpool(self.append, entry) >= RATING_FLUSH_MAX_ITEMS:
+            self._wakeup.set()
+        return submission_id
+
+    def _seal(self):
+        with self._lock:
+            if self._journal_entries:
+                sealed = self._new_path(".sealed")
+                os.rename(self._journal_path, sealed)
+                self._sealed.append((sealed, self._journal))
+                self._open_journal()
+
+    def _flush_sealed(self):
+        """Commit sealed journals oldest first; a failure leaves the rest for the next flush"""
+        with self._flush_lock:
+            self._seal()
+            while True:
+                with self._lock:
+                    if not self._sealed:
+                        return
+                    path, fd = self._sealed[0]
+                entries = read_journal(path)
+                started = time.perf_counter()
+                inserted, duplicates, failed, course_ids = _commit_entries(entries)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                # Delete before unlocking so no other worker adopts a committed journal
+                os.unlink(path)
+                os.close(fd)
+                with self._lock:
+                    self._sealed.pop(0)
+                    self.depth -= len(entries)
+                    self.flushes += 1
+                    self.flushed += inserted
+                    self.duplicates += duplicates
+                    self.failed += failed
+                    self.last_flush_ms = elapsed_ms
+                    self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                    self._total_flush_ms += elapsed_ms
+                if course_ids:
+                    response_cache.invalidate("courses", *(f"course:{course_id}" for course_id in course_ids))
+
+    async def flush(self):
+        try:
+            await run_in_threadpool(self._flush_sealed)
+        except Exception as e:
+            self.flush_errors += 1
+            print(f"Warning: Could not flush queued ratings, will retry: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), RATING_FLUSH_INTERVAL_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._adopt_orphans()
+        self._open_journal()
+        self._wakeup = asyncio.Event()
+        if self._sealed:
+            self._wakeup.set()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and commit what is queued; anything left is replayed on restart"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        await self.flush()
+        with self._lock:
+            if not self._journal_entries:
+                os.unlink(self._journal_path)
+            os.close(self._journal)
+            self._journal = None
+            for _, fd in self._sealed:
+                os.close(fd)
+            self._sealed = []
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "queue_depth": self.depth,
+                "sealed_journals": len(self._sealed),
+                "flushes": self.flushes,
+                "flushed": self.flushed,
+                "duplicates": self.duplicates,
+                "failed": self.failed,
+                "flush_errors": self.flush_errors,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "mean_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            }
+
+
+rating_queue = RatingQueue(RATING_JOURNAL_DIR)
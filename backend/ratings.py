@@ -0,0 +1,194 @@
+"""
+Rating write helpers shared by POST /ratings, POST /courses and
+POST /ratings/bulk.
+
+Bulk ingestion works in chunks of BULK_RATINGS_CHUNK_SIZE items: course ids
+are checked against the reference cache (one query for any unknown ids),
+textbooks are resolved in one set-based pass, ratings are inserted with a
+single executemany and the chunk commits in its own transaction. If the multi-row insert fails, the chunk is retried item by
+item so one bad row is reported instead of failing its neighbours. Items
+whose submission_id already has a rating are reported as duplicates.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import List, Tuple
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import exc, insert
+from sqlalchemy.orm import Session
+from database import Rating
+from schemas import RatingCreate
+from course_stats import record_ratings
+from reference_data import reference_data
+from textbooks import resolve_textbook, resolve_textbooks, textbook_cache
+
+BULK_RATINGS_CHUNK_SIZE = int(os.getenv("BULK_RATINGS_CHUNK_SIZE", "500"))
+
+DUPLICATE_SUBMISSION = "Duplicate submission_id"
+
+# Lost connections, lock timeouts, deadlocks and pool timeouts: the rating
+# itself is fine and the same insert can succeed later
+TRANSIENT_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.TimeoutError)
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+
+def submitted_textbook(textbook):
+    """The textbook string to resolve, or None when no textbook was given"""
+    if textbook and textbook != 'n/a':
+        return textbook
+    return None
+
+
+def _validation_detail(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+def _parse_item(item):
+    """RatingCreate for one decoded bulk item, or an error message"""
+    try:
+        return RatingCreate.model_validate(item)
+    except ValidationError as e:
+        return _validation_detail(e)
+
+
+def _parse_line(line: bytes):
+    """RatingCreate for one NDJSON line, or an error message"""
+    try:
+        return RatingCreate.model_validate_json(line)
+    except ValidationError as e:
+        return _validation_detail(e)
+
+
+async def iter_bulk_items(request: Request):
+    """
+    Yield (index, RatingCreate or error message) from a bulk request body.
+
+    NDJSON bodies are parsed line by line as they stream in; anything else
+    must be a JSON array.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        index = 0
+        buffer = b""
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, _parse_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, _parse_line(buffer)
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for index, item in enumerate(items):
+        yield index, _parse_item(item)
+
+
+def existing_submissions(db: Session, submission_ids) -> set:
+    """The given submission ids that already have a rating"""
+    submission_ids = [submission_id for submission_id in submission_ids if submission_id]
+    if not submission_ids:
+        return set()
+    return {
+        submission_id for (submission_id,) in
+        db.query(Rating.submission_id).filter(Rating.submission_id.in_(submission_ids))
+    }
+
+
+def _insert_one(db: Session, rating_data: RatingCreate, professor_id: int, created_at: datetime):
+    """Insert a single rating and its stats inside a savepoint"""
+    with db.begin_nested():
+        textbook = submitted_textbook(rating_data.textbook)
+        db.execute(insert(Rating), [{
+            "course_id": rating_data.course_id,
+            "professor_id": professor_id,
+            "book_id": resolve_textbook(db, textbook) if textbook else None,
+            "rating": rating_data.rating,
+            "review": rating_data.review,
+            "submission_id": rating_data.submission_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }])
+        record_ratings(db, [(rating_data.course_id, rating_data.rating, created_at)])
+
+
+def insert_rating_chunk(db: Session, chunk: List[Tuple[int, RatingCreate]], raise_transient: bool = False):
+    """
+    Insert one chunk of (index, RatingCreate) items and commit.
+
+    Returns (inserted count, [(index, error message)], affected course ids).
+    With raise_transient, an item failing with one of TRANSIENT_ERRORS rolls
+    back the uncommitted items and raises instead of being reported.
+    """
+    errors = []
+    course_ids = {rating_data.course_id for _, rating_data in chunk}
+    existing = reference_data.existing_course_ids(db, course_ids)
+    submitted = existing_submissions(db, (rating_data.submission_id for _, rating_data in chunk))
+    valid = []
+    for index, rating_data in chunk:
+        if rating_data.course_id not in existing:
+            errors.append((index, "Course not found"))
+        elif rating_data.submission_id and rating_data.submission_id in submitted:
+            errors.append((index, DUPLICATE_SUBMISSION))
+        else:
+            if rating_data.submission_id:
+                submitted.add(rating_data.submission_id)
+            valid.append((index, rating_data))
+    if not valid:
+        return 0, errors, set()
+
+    created_at = datetime.utcnow()
+    try:
+        professor_id = reference_data.unknown_professor_id(db)
+        book_ids = resolve_textbooks(db, (submitted_textbook(r.textbook) for _, r in valid))
+        db.execute(insert(Rating), [
+            {
+                "course_id": rating_data.course_id,
+                "professor_id": professor_id,
+                "book_id": book_ids.get(submitted_textbook(rating_data.textbook)),
+                "rating": rating_data.rating,
+                "review": rating_data.review,
+                "submission_id": rating_data.submission_id,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+            for _, rating_data in valid
+        ])
+        record_ratings(db, [(rating_data.course_id, rating_data.rating, created_at) for _, rating_data in valid])
+        db.commit()
+        return len(valid), errors, {rating_data.course_id for _, rating_data in valid}
+    except Exception:
+        db.rollback()
+        # Cached ids may be stale; look everything up again for the retry
+        reference_data.clear()
+        textbook_cache.clear()
+
+    # Retry item by item to isolate the rows that failed
+    inserted = 0
+    affected = set()
+    professor_id = reference_data.unknown_professor_id(db)
+    for index, rating_data in valid:
+        try:
+            _insert_one(db, rating_data, professor_id, created_at)
+            inserted += 1
+            affected.add(rating_data.course_id)
+        except Exception as e:
+            if raise_transient and isinstance(e, TRANSIENT_ERRORS):
+                db.rollback()
+                raise
+            errors.append((index, f"Error creating rating: {str(e)}"))
+    db.commit()
+    return inserted, errors, affected
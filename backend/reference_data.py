@@ -0,0 +1,93 @@
+"""
+In-memory cache of reference entities used by the write endpoints.
+
+create_rating, create_course and POST /ratings/bulk look up the same few
+things on every call: the school by name, the "Unknown Professor"
+placeholder and whether a course id exists. This cache is loaded at
+startup and extended as those endpoints commit new rows, so a rating
+insert normally needs no lookups at all.
+
+Only committed ids are cached. Misses fall back to the database, which
+also picks up rows created by other workers. If an insert still fails
+with an IntegrityError (for example a cached id was deleted), the write
+endpoints call clear() and retry once against the database.
+"""
+
+import threading
+from typing import Iterable, Optional, Set
+from sqlalchemy.orm import Session
+from database import Course, Professor, School
+
+UNKNOWN_PROFESSOR = {"first_name": "Unknown", "last_name": "Professor"}
+
+
+class ReferenceData:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._school_ids = {}
+        self._course_ids = set()
+        self._unknown_professor_id = None
+
+    def load(self, db: Session):
+        """Populate from the database, creating the placeholder professor if needed"""
+        professor_id = self.unknown_professor_id(db)
+        db.commit()
+        school_ids = dict(db.query(School.school_name, School.school_id))
+        course_ids = {course_id for (course_id,) in db.query(Course.course_id)}
+        with self._lock:
+            self._unknown_professor_id = professor_id
+            self._school_ids = school_ids
+            self._course_ids = course_ids
+
+    def clear(self):
+        with self._lock:
+            self._school_ids = {}
+            self._course_ids = set()
+            self._unknown_professor_id = None
+
+    def unknown_professor_id(self, db: Session) -> int:
+        """Id of the placeholder professor used for ratings, creating it if needed"""
+        if self._unknown_professor_id is not None:
+            return self._unknown_professor_id
+        professor = db.query(Professor).filter_by(**UNKNOWN_PROFESSOR).first()
+        if professor:
+            self._unknown_professor_id = professor.professor_id
+            return professor.professor_id
+        # Created in the caller's transaction, so not cached until seen committed
+        professor = Professor(**UNKNOWN_PROFESSOR)
+        db.add(professor)
+        db.flush()
+        return professor.professor_id
+
+    def school_id(self, db: Session, school_name: str) -> Optional[int]:
+        """Id of the school with this exact name, or None"""
+        school_id = self._school_ids.get(school_name)
+        if school_id is None:
+            school_id = db.query(School.school_id).filter(School.school_name == school_name).scalar()
+            if school_id is not None:
+                self.remember_school(school_name, school_id)
+        return school_id
+
+    def remember_school(self, school_name: str, school_id: int):
+        with self._lock:
+            self._school_ids[school_name] = school_id
+
+    def course_exists(self, db: Session, course_id: int) -> bool:
+        return course_id in self.existing_course_ids(db, [course_id])
+
+    def existing_course_ids(self, db: Session, course_ids: Iterable[int]) -> Set[int]:
+        """The subset of course_ids that exist, querying only for uncached ids"""
+        course_ids = set(course_ids)
+        unknown = course_ids - self._course_ids
+        if unknown:
+            found = {course_id for (course_id,) in db.query(Course.course_id).filter(Course.course_id.in_(unknown))}
+            self.remember_courses(found)
+            unknown -= found
+        return course_ids - unknown
+
+    def remember_courses(self, course_ids: Iterable[int]):
+        with self._lock:
+            self._course_ids.update(course_ids)
+
+
+reference_data = ReferenceData()
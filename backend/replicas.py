@@ -0,0 +1,178 @@
+"""
+Read-replica routing for the catalog read endpoints.
+
+DATABASE_REPLICA_URLS is a comma-separated list of read replicas (for
+async mode ASYNC_DATABASE_REPLICA_URLS, derived the same way as
+ASYNC_DATABASE_URL when unset). When it is empty every request uses the
+primary and nothing here changes behaviour.
+
+Read endpoints depend on get_read_db, which hands out a session on the
+next healthy replica (round-robin). A background task runs SELECT 1
+against every replica each REPLICA_HEALTH_CHECK_SECONDS; a replica that
+fails a check or a request is skipped until a check succeeds again, and
+with no healthy replica reads fall back to the primary.
+
+Writes always use the primary. After a write, mark_primary_reads sets a
+cookie so the same client reads from the primary for
+READ_YOUR_WRITES_SECONDS, long enough for replicas to catch up. The
+cookie is SameSite=Lax (and Secure over HTTPS), so a client calling the
+API from another site never sends it back and may read from a replica
+that has not caught up with its own write.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from typing import List, Optional
+from fastapi import Request, Response
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from database import DB_ASYNC, SessionLocal, _async_url, close_session, engine, pool_options
+from sql_metrics import instrument
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+ASYNC_DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("ASYNC_DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+] or [_async_url(url) for url in DATABASE_REPLICA_URLS]
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Holds the time until which the client should read from the primary
+READ_PRIMARY_COOKIE = "rmc_read_primary_until"
+
+
+class Replica:
+    def __init__(self, url: str, number: int):
+        self.url = url
+        # Numbered in DATABASE_REPLICA_URLS order, so pool stats and metrics never show hosts
+        self.name = f"replica {number}"
+        self.healthy = True
+        if DB_ASYNC:
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+            self.engine = create_async_engine(url, echo=engine.echo, **pool_options(url))
+            self.session_factory = async_sessionmaker(self.engine, autoflush=False, info={"replica": True})
+            instrument(self.engine.sync_engine, self.name)
+        else:
+            self.engine = create_engine(url, echo=engine.echo, **pool_options(url))
+            self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, info={"replica": True})
+            instrument(self.engine, self.name)
+
+    def _check_sync(self):
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    async def check(self):
+        try:
+            if DB_ASYNC:
+                async with self.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            else:
+                await run_in_threadpool(self._check_sync)
+            self.healthy = True
+        except Exception as e:
+            if self.healthy:
+                print(f"Warning: read replica {self.engine.url!r} is unavailable: {e}")
+            self.healthy = False
+
+
+class ReplicaRouter:
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url, number) for number, url in enumerate(urls, 1)]
+        self._counter = itertools.count()
+        self._task = None
+
+    def choose(self) -> Optional[Replica]:
+        """Next healthy replica in round-robin order, or None to use the primary"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def check_all(self):
+        await asyncio.gather(*(replica.check() for replica in self.replicas))
+
+    async def _run_health_checks(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(REPLICA_HEALTH_CHECK_SECONDS)
+
+    def start(self):
+        if self.replicas and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run_health_checks())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> list:
+        return [{"url": repr(replica.engine.url), "healthy": replica.healthy} for replica in self.replicas]
+
+
+replica_router = ReplicaRouter(ASYNC_DATABASE_REPLICA_URLS if DB_ASYNC else DATABASE_REPLICA_URLS)
+
+
+def is_replica_session(db) -> bool:
+    return bool(db.info.get("replica"))
+
+
+def reads_from_primary(request: Request) -> bool:
+    """True while the client is inside its read-your-writes window"""
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def mark_primary_reads(request: Request, response: Response):
+    """Route this client's reads to the primary for READ_YOUR_WRITES_SECONDS"""
+    if replica_router.replicas and READ_YOUR_WRITES_SECONDS > 0:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(time.time() + READ_YOUR_WRITES_SECONDS),
+            max_age=int(READ_YOUR_WRITES_SECONDS) or 1,
+            httponly=True,
+            # Behind a TLS-terminating proxy the scheme comes from X-Forwarded-Proto (uvicorn --proxy-headers)
+            secure=request.url.scheme == "https",
+            # Not sent on cross-site requests: such clients lose read-your-writes
+            samesite="lax"
+        )
+
+
+def _read_replica(request: Request) -> Optional[Replica]:
+    if not replica_router.replicas or reads_from_primary(request):
+        return None
+    return replica_router.choose()
+
+
+async def get_read_db(request: Request):
+    """Session for a read-only endpoint: a healthy replica, else the primary"""
+    replica = _read_replica(request)
+    db = replica.session_factory() if replica else SessionLocal()
+    try:
+        yield db
+    except DBAPIError:
+        if replica:
+            replica.healthy = False
+        raise
+    finally:
+        await close_session(db)
+
+
+async def get_async_read_db(request: Request):
+    from database import AsyncSessionLocal
+    replica = _read_replica(request)
+    async with (replica.session_factory() if replica else AsyncSessionLocal()) as db:
+        try:
+            yield db
+        except DBAPIError:
+            if replica:
+                replica.healthy = False
+            raise
+
+
+# Read-only session dependency for API endpoints, matching get_request_db
+get_request_read_db = get_async_read_db if DB_ASYNC else get_read_db
@@ -21,6 +21,8 @@ class RatingCreate(BaseModel):
     rating: int = Field(..., ge=1, le=5)
     review: str
     textbook: Optional[str] = None
+    # Resubmitting with the same id returns or skips the existing rating
+    submission_id: Optional[str] = Field(None, min_length=1, max_length=64)
 
 
 # Response Schemas
@@ -59,6 +61,12 @@ class RatingResponse(BaseModel):
         from_attributes = True
 
 
+class RatingQueued(BaseModel):
+    submission_id: str
+    course_id: int
+    status: str
+
+
 class CourseDetail(BaseModel):
     course_id: int
     course_name: str
@@ -92,6 +100,17 @@ class CourseWithRatings(BaseModel):
         from_attributes = True
 
 
+class RankedCourse(CourseWithRatings):
+    bayesian_score: float
+
+
+class CourseSuggestion(BaseModel):
+    course_id: int
+    course_number: str
+    course_name: str
+    school_id: int
+
+
 class CourseListItem(BaseModel):
     course_id: int
     course_name: str
@@ -101,3 +120,15 @@ class CourseListItem(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class BulkRatingError(BaseModel):
+    index: int
+    detail: str
+
+
+class BulkRatingResult(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[BulkRatingError]
@@ -0,0 +1,287 @@
+"""
+Course search for RateMyClass.
+
+Two backends sit behind the `search` parameter of GET /courses:
+
+- "fulltext": a MySQL FULLTEXT index over the searchable course columns,
+  queried with MATCH ... AGAINST in boolean mode. MySQL keeps it in sync.
+  Short course prefixes such as "CS" need innodb_ft_min_token_size=2.
+- "memory": an in-process inverted index used for SQLite and test setups.
+  It is built in a background thread when the worker starts, retried until
+  the database is reachable, updated by create_course and caught up with
+  courses added by other workers every SEARCH_INDEX_REFRESH_SECONDS.
+  Searches wait up to SEARCH_WAIT_SECONDS for the first build and get a
+  503 if it has not finished or has failed; other requests do not wait
+  (see background_index.py).
+
+The FULLTEXT index is created by a migration (see migrations.py).
+
+SEARCH_BACKEND=auto (the default) picks fulltext on MySQL and memory elsewhere.
+Both backends tokenize on letters/digits and match every query token as a
+prefix. The memory backend ranks matches on course number and name above
+other fields (FIELD_WEIGHTS); the fulltext backend orders by MySQL's
+relevance over all the columns together, which weighs them equally (a
+MATCH on a single column would need a FULLTEXT index of its own).
+The school, major and delivery mode filters of GET /courses are applied by
+the backend too, and every match is returned so callers can page through
+all of them.
+"""
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from background_index import BackgroundIndex
+from database import engine, Course
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_INDEX_REFRESH_SECONDS = float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "30"))
+SEARCH_WAIT_SECONDS = float(os.getenv("SEARCH_WAIT_SECONDS", "10"))
+
+FULLTEXT_INDEX_NAME = "ft_course_search"
+
+# Relevance weight of a token match in each searchable column (memory backend)
+FIELD_WEIGHTS = {
+    "course_number": 3.0,
+    "course_name": 2.0,
+    "major": 1.0,
+    "dialogues_requirement": 1.0,
+    "delivery_mode": 0.5,
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(value: str) -> List[str]:
+    """Lowercase letter/digit runs, e.g. 'CS 170' -> ['cs', '170']"""
+    return TOKEN_PATTERN.findall(value.lower()) if value else []
+
+
+def _course_tokens(course) -> Dict[str, float]:
+    """Best field weight for every token of a course"""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        tokens = tokenize(getattr(course, field))
+        if field == "course_number" and len(tokens) > 1:
+            # Let "cs170" match "CS 170"
+            tokens.append("".join(tokens))
+        for token in tokens:
+            weights[token] = max(weight, weights.get(token, 0.0))
+    return weights
+
+
+def _course_filters(course) -> Tuple[int, str, str]:
+    return course.school_id, (course.major or "").lower(), course.delivery_mode
+
+
+def _matches_filters(course_filters, school_id, major, delivery_mode) -> bool:
+    """The GET /courses filters: exact school and delivery mode, major by substring"""
+    course_school_id, course_major, course_delivery_mode = course_filters
+    return (
+        (not school_id or course_school_id == school_id)
+        and (not major or major in course_major)
+        and (not delivery_mode or course_delivery_mode == delivery_mode)
+    )
+
+
+class CourseSearchIndex(BackgroundIndex):
+    """In-process inverted index with prefix matching over course columns"""
+
+    def __init__(self):
+        super().__init__("search", SEARCH_WAIT_SECONDS)
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)  # token -> {course_id: weight}
+        self._course_tokens = {}            # course_id -> tokens, for re-indexing
+        self._course_filters = {}           # course_id -> (school_id, lowercase major, delivery_mode)
+        self._sorted_tokens = []            # sorted vocabulary for prefix lookups
+        self._max_course_id = 0
+        self._synced_at = 0.0
+
+    def add_course(self, course):
+        """Index (or re-index) a single course"""
+        with self._lock:
+            self._remove(course.course_id)
+            weights = _course_tokens(course)
+            for token, weight in weights.items():
+                postings = self._postings[token]
+                if not postings:
+                    insort(self._sorted_tokens, token)
+                postings[course.course_id] = weight
+            self._course_tokens[course.course_id] = list(weights)
+            self._course_filters[course.course_id] = _course_filters(course)
+            self._max_course_id = max(self._max_course_id, course.course_id)
+
+    def remove_course(self, course_id: int):
+        with self._lock:
+            self._remove(course_id)
+
+    def _remove(self, course_id: int):
+        self._course_filters.pop(course_id, None)
+        for token in self._course_tokens.pop(course_id, []):
+            postings = self._postings[token]
+            postings.pop(course_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._sorted_tokens[bisect_left(self._sorted_tokens, token)]
+
+    def build(self, db: Session):
+        """Replace the index contents with every course in the database"""
+        # Built off to the side and swapped in: no per-course locking or sorted inserts
+        postings = defaultdict(dict)
+        course_tokens = {}
+        course_filters = {}
+        max_course_id = 0
+        for course in self._courses(db, Course.course_id > 0):
+            weights = _course_tokens(course)
+            for token, weight in weights.items():
+                postings[token][course.course_id] = weight
+            course_tokens[course.course_id] = list(weights)
+            course_filters[course.course_id] = _course_filters(course)
+            max_course_id = max(max_course_id, course.course_id)
+        with self._lock:
+            self._postings = postings
+            self._course_tokens = course_tokens
+            self._course_filters = course_filters
+            self._sorted_tokens = sorted(postings)
+            self._max_course_id = max_course_id
+        # Pick up courses created while the index was being built
+        self.catch_up(db)
+
+    def catch_up(self, db: Session):
+        """Index courses created since the last sync (e.g. by another worker)"""
+        for course in self._courses(db, Course.course_id > self._max_course_id):
+            self.add_course(course)
+        self._synced_at = time.monotonic()
+
+    def _courses(self, db: Session, condition):
+        columns = [Course.course_id, Course.school_id] + [getattr(Course, field) for field in FIELD_WEIGHTS]
+        return db.query(*columns).filter(condition).yield_per(1000)
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._synced_at > SEARCH_INDEX_REFRESH_SECONDS
+
+    def search(
+        self, term: str, school_id: Optional[int] = None, major: Optional[str] = None,
+        delivery_mode: Optional[str] = None
+    ) -> List[Tuple[int, float]]:
+        """Ranked (course_id, score) pairs for courses matching every query token and filter"""
+        query_tokens = tokenize(term)
+        if not query_tokens:
+            return []
+
+        scores = None
+        with self._lock:
+            for query_token in set(query_tokens):
+                token_scores = {}
+                start = bisect_left(self._sorted_tokens, query_token)
+                for token in self._sorted_tokens[start:]:
+                    if not token.startswith(query_token):
+                        break
+                    # Whole-token matches outrank prefix matches
+                    boost = 1.0 if token == query_token else 0.5
+                    for course_id, weight in self._postings[token].items():
+                        token_scores[course_id] = max(weight * boost, token_scores.get(course_id, 0.0))
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        course_id: score + token_scores[course_id]
+                        for course_id, score in scores.items()
+                        if course_id in token_scores
+                    }
+                if not scores:
+                    return []
+
+            if school_id or major or delivery_mode:
+                major = major.lower() if major else None
+                filters = self._course_filters
+                scores = {
+                    course_id: score for course_id, score in scores.items()
+                    if _matches_filters(filters[course_id], school_id, major, delivery_mode)
+                }
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+course_index = CourseSearchIndex()
+
+
+def _use_fulltext() -> bool:
+    if SEARCH_BACKEND == "auto":
+        return engine.dialect.name == "mysql"
+    return SEARCH_BACKEND == "fulltext"
+
+
+def ensure_fulltext_index(bind=engine):
+    """Create the MySQL FULLTEXT index over the searchable columns if it is missing"""
+    if bind.dialect.name != "mysql":
+        return
+    existing = {index["name"] for index in inspect(bind).get_indexes(Course.__tablename__)}
+    if FULLTEXT_INDEX_NAME in existing:
+        return
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"ALTER TABLE course ADD FULLTEXT INDEX {FULLTEXT_INDEX_NAME} "
+            f"({', '.join(FIELD_WEIGHTS)})"
+        ))
+
+
+def init_search():
+    """Start building the in-process index if it is the search backend (called on startup)"""
+    if not _use_fulltext():
+        course_index.start()
+
+
+async def wait_for_search():
+    """Wait, off the event loop, until the in-process index has been built; 503 if it is not ready"""
+    if not _use_fulltext():
+        await course_index.wait_ready()
+
+
+def index_course(course):
+    """Keep the in-process index in sync after a course write"""
+    if not _use_fulltext():
+        course_index.add_course(course)
+
+
+def search_courses(
+    db: Session, term: str, school_id: Optional[int] = None, major: Optional[str] = None,
+    delivery_mode: Optional[str] = None
+) -> List[Tuple[int, float]]:
+    """Ranked (course_id, score) pairs for every course matching a free-text search term and the filters"""
+    if not _use_fulltext():
+        course_index.require_ready()
+        if course_index.is_stale():
+            course_index.catch_up(db)
+        return course_index.search(term, school_id, major, delivery_mode)
+
+    tokens = tokenize(term)
+    if not tokens:
+        return []
+    # Every token is required and matched as a prefix
+    boolean_query = " ".join(f"+{token}*" for token in tokens)
+    match = f"MATCH({', '.join(FIELD_WEIGHTS)}) AGAINST (:q IN BOOLEAN MODE)"
+    conditions = [match]
+    params = {"q": boolean_query}
+    if school_id:
+        conditions.append("school_id = :school_id")
+        params["school_id"] = school_id
+    if major:
+        conditions.append("LOWER(major) LIKE LOWER(:major)")
+        params["major"] = f"%{major}%"
+    if delivery_mode:
+        conditions.append("delivery_mode = :delivery_mode")
+        params["delivery_mode"] = delivery_mode
+    rows = db.execute(
+        text(
+            f"SELECT course_id, {match} AS score FROM course WHERE {' AND '.join(conditions)} "
+            "ORDER BY score DESC, course_id"
+        ),
+        params
+    )
+    return [(row.course_id, float(row.score)) for row in rows]
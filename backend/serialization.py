@@ -0,0 +1,44 @@
+"""
+Fast JSON path for the catalog read endpoints.
+
+Read endpoints select plain columns, map each row straight to a dict in
+the response schema's field order and encode the result once with orjson
+(falling back to the standard json module when it is not installed). The
+encoded bytes are what the response cache stores, and they are returned
+as-is, so FastAPI neither builds nor re-validates a Pydantic object per
+row. The response_model declarations in main.py still describe the
+payload for OpenAPI.
+"""
+
+import json
+from datetime import datetime
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Encode a value of dicts, lists, scalars and datetimes as compact JSON"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(body: bytes, response: Response, status_code: int = 200) -> Response:
+    """Response for pre-encoded JSON, keeping headers already set on the injected response"""
+    headers = {
+        name: value for name, value in response.headers.items()
+        if name not in ("content-length", "content-type")
+    }
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE, headers=headers)
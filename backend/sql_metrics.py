@@ -0,0 +1,335 @@
+"""
+Per-request SQL instrumentation.
+
+instrument(engine) hooks SQLAlchemy engine events so every statement run
+while a request is handled is attributed to it: query count, time spent
+executing, rows reported by the driver (affected rows; on MySQL also the
+rows a SELECT returned) and time spent checking a connection out of the
+pool. SQLMetricsMiddleware folds each request's numbers into per-endpoint
+totals, keyed by method and route template (so every /courses/{course_id}
+request is one endpoint), and GET /metrics renders them in the Prometheus
+text format when METRICS_ENABLED is set (it is off by default, as the
+endpoint has no auth of its own: expose it only to the scraper's network).
+Request sessions only check out a connection on their first
+query, so rmc_db_requests_total counts the requests that touched the
+database at all.
+
+pool_status() reports each instrumented pool (primary, async primary and
+read replicas): connections checked out, idle and in overflow, checkouts
+waiting, timeouts, invalidated connections and checkout wait.
+
+For CI, capture_requests() records the stats of every request finished
+while it is active and assert_query_budget() fails when a request runs
+more queries than allowed; query_budget.py (and tests/test_query_budget.py)
+checks the hot endpoints.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+class QueryStats:
+    """Database work done by one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+        self.checkouts = 0
+        self.statements = []
+
+    @property
+    def touched_db(self) -> bool:
+        return self.checkouts > 0
+
+
+_current = contextvars.ContextVar("sql_metrics_request", default=None)
+
+class PoolStats:
+    """Checkouts from one engine's pool, in or out of a request"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.waiting = 0
+        self.timeouts = 0
+        self.invalidated = 0
+
+    def status(self) -> dict:
+        pool = self.engine.pool
+        with self.lock:
+            status = {
+                "pool": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "waiting": self.waiting,
+                "timeouts": self.timeouts,
+                "invalidated": self.invalidated,
+                "checkout_wait_seconds": round(self.wait_seconds, 6),
+                "mean_checkout_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_checkout_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+        # Only QueuePool (every database except in-memory SQLite) is sized
+        if isinstance(pool, QueuePool):
+            status.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        return status
+
+
+# engine name -> PoolStats
+pools = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+        stats.rows += max(cursor.rowcount, 0)
+        stats.statements.append(statement)
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument(engine, name: str):
+    """Attribute a sync engine's statements and checkouts to the current request"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    pool_stats = pools[name] = PoolStats(engine)
+
+    def invalidated(dbapi_connection, connection_record, exception):
+        with pool_stats.lock:
+            pool_stats.invalidated += 1
+
+    event.listen(engine.pool, "invalidate", invalidated)
+
+    # The pool has no event before a checkout, so time the engine's entry point
+    # into it (this includes opening a new connection when the pool grows)
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        with pool_stats.lock:
+            pool_stats.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = raw_connection(*args, **kwargs)
+        except exc.TimeoutError:
+            with pool_stats.lock:
+                pool_stats.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with pool_stats.lock:
+                pool_stats.waiting -= 1
+        with pool_stats.lock:
+            pool_stats.checkouts += 1
+            pool_stats.wait_seconds += waited
+            pool_stats.max_wait_seconds = max(pool_stats.max_wait_seconds, waited)
+        stats = _current.get()
+        if stats is not None:
+            stats.checkouts += 1
+            stats.pool_wait_seconds += waited
+        return connection
+
+    engine.raw_connection = timed_raw_connection
+
+
+def pool_status() -> dict:
+    """Current size, use and checkout wait of every instrumented pool"""
+    return {name: pool_stats.status() for name, pool_stats in pools.items()}
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.pool_wait_seconds = 0.0
+        self.checkouts = 0
+        self.db_requests = 0
+
+    def add(self, stats: QueryStats, seconds: float):
+        self.requests += 1
+        self.seconds += seconds
+        self.queries += stats.queries
+        self.max_queries = max(self.max_queries, stats.queries)
+        self.db_seconds += stats.db_seconds
+        self.rows += stats.rows
+        self.pool_wait_seconds += stats.pool_wait_seconds
+        self.checkouts += stats.checkouts
+        if stats.touched_db:
+            self.db_requests += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._listeners = []
+
+    def record(self, method: str, endpoint: str, stats: QueryStats, seconds: float):
+        with self._lock:
+            metrics = self._endpoints.get((method, endpoint))
+            if metrics is None:
+                metrics = self._endpoints[(method, endpoint)] = EndpointMetrics()
+            metrics.add(stats, seconds)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(method, endpoint, stats)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: vars(metrics).copy() for key, metrics in sorted(self._endpoints.items())}
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+registry = MetricsRegistry()
+
+
+class SQLMetricsMiddleware:
+    """ASGI middleware; wraps the whole response, so streamed bodies are included"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            registry.record(scope["method"], endpoint, stats, time.perf_counter() - started)
+
+
+# (metric name, help, EndpointMetrics attribute, type)
+ENDPOINT_METRICS = [
+    ("rmc_http_requests_total", "Requests handled", "requests", "counter"),
+    ("rmc_http_request_seconds_total", "Time spent handling requests", "seconds", "counter"),
+    ("rmc_db_requests_total", "Requests that checked out a database connection", "db_requests", "counter"),
+    ("rmc_db_checkouts_total", "Connections checked out of the pool while handling requests", "checkouts", "counter"),
+    ("rmc_db_queries_total", "SQL statements executed", "queries", "counter"),
+    ("rmc_db_queries_per_request_max", "Most SQL statements run by a single request", "max_queries", "gauge"),
+    ("rmc_db_query_seconds_total", "Time spent executing SQL statements", "db_seconds", "counter"),
+    ("rmc_db_rows_total", "Rows reported by the database driver", "rows", "counter"),
+    ("rmc_db_checkout_wait_seconds_total", "Time spent checking connections out of the pool while handling requests", "pool_wait_seconds", "counter"),
+]
+
+
+# (PoolStats.status() key, metric name, help, type)
+POOL_METRICS = [
+    ("checked_out", "rmc_db_pool_checked_out", "Connections currently checked out", "gauge"),
+    ("idle", "rmc_db_pool_idle", "Idle connections in the pool", "gauge"),
+    ("overflow", "rmc_db_pool_overflow", "Connections open beyond the pool size", "gauge"),
+    ("waiting", "rmc_db_pool_waiting", "Checkouts in progress, waiting for a free or new connection", "gauge"),
+    ("checkouts", "rmc_db_pool_checkouts_total", "Connections checked out of the pool", "counter"),
+    ("checkout_wait_seconds", "rmc_db_pool_checkout_wait_seconds_total", "Time spent checking connections out", "counter"),
+    ("timeouts", "rmc_db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT", "counter"),
+    ("invalidated", "rmc_db_pool_invalidated_total", "Connections discarded as disconnected or stale", "counter"),
+    ("max_checkout_wait_ms", "rmc_db_pool_max_checkout_wait_milliseconds", "Longest checkout wait", "gauge"),
+]
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metric_text(name: str, help_text: str, samples, metric_type: str = "gauge") -> str:
+    """One metric in the Prometheus text format; samples is a value or a list of ({label: value}, value)"""
+    if not isinstance(samples, list):
+        samples = [({}, samples)]
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_label(str(label))}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def prometheus_text() -> str:
+    """Per-endpoint request and SQL metrics, plus the state of each connection pool"""
+    endpoints = registry.snapshot()
+    text = "".join(
+        metric_text(name, help_text, [
+            ({"method": method, "endpoint": endpoint}, values[attribute])
+            for (method, endpoint), values in endpoints.items()
+        ], metric_type)
+        for name, help_text, attribute, metric_type in ENDPOINT_METRICS
+    )
+    statuses = pool_status()
+    for key, name, help_text, metric_type in POOL_METRICS:
+        text += metric_text(name, help_text, [
+            ({"pool": pool}, status[key]) for pool, status in statuses.items() if key in status
+        ], metric_type)
+    return text
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def capture_requests():
+    """Collect (method, endpoint, QueryStats) for every request finished inside the block"""
+    captured = []
+
+    def listener(method, endpoint, stats):
+        captured.append((method, endpoint, stats))
+
+    with registry._lock:
+        registry._listeners.append(listener)
+    try:
+        yield captured
+    finally:
+        with registry._lock:
+            registry._listeners.remove(listener)
+
+
+def assert_query_budget(client, method: str, path: str, max_queries: int, **kwargs):
+    """Send a request through a test client; raise QueryBudgetExceeded if it ran more than max_queries"""
+    with capture_requests() as captured:
+        response = client.request(method, path, **kwargs)
+    stats = captured[-1][2]
+    if stats.queries > max_queries:
+        statements = "\n".join(f"  {' '.join(statement.split())[:200]}" for statement in stats.statements)
+        raise QueryBudgetExceeded(
+            f"{method} {path} ran {stats.queries} queries, budget is {max_queries}:\n{statements}"
+        )
+    return response, stats
@@ -0,0 +1,152 @@
+"""
+Worker startup for the RateMyClass API.
+
+Every worker used to run create_all, the migrations and the default-data
+seeding on boot, racing the other workers. Now a worker first checks, with
+a few indexed queries, whether the schema is at the latest migration and
+the default rows exist. Only when something is missing does it take a
+database advisory lock (GET_LOCK on MySQL, a lock file next to the
+database on SQLite) and do the work, re-checking under the lock, so one
+worker prepares the database while the others wait and then skip it.
+
+Each phase is timed; startup_timings holds the last boot's phases in
+milliseconds and the summary is printed when the worker is ready.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from database import SessionLocal, engine, init_db, Professor, School, User, UserRole
+from migrations import MIGRATIONS, run_migrations, schema_version
+from reference_data import UNKNOWN_PROFESSOR
+
+STARTUP_LOCK_NAME = "ratemyclass_startup"
+STARTUP_LOCK_TIMEOUT = int(os.getenv("STARTUP_LOCK_TIMEOUT", "60"))
+
+DEFAULT_SCHOOL = "Truman State University"
+DEFAULT_ADMIN_USERNAME = "courseadmin"
+DEFAULT_ADMIN_PASSWORD = "password"
+
+# phase name -> milliseconds, from the most recent startup
+startup_timings = {}
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        # Reserve the slot so enclosing phases are listed before nested ones
+        self.phases.setdefault(name, 0.0)
+        try:
+            yield
+        finally:
+            self.phases[name] = (time.perf_counter() - started) * 1000
+
+    def finish(self):
+        total = (time.perf_counter() - self.started) * 1000
+        startup_timings.clear()
+        startup_timings.update(self.phases, total=total)
+        phases = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.phases.items())
+        print(f"✓ Worker ready in {total:.0f} ms ({phases})")
+
+
+@contextmanager
+def advisory_lock(name: str = STARTUP_LOCK_NAME, timeout: int = STARTUP_LOCK_TIMEOUT):
+    """Hold a lock shared by every worker using this database"""
+    if engine.dialect.name == "mysql":
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": timeout}).scalar() != 1:
+                raise RuntimeError(f"Timed out after {timeout}s waiting for the {name} lock")
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+    elif engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        import fcntl
+        with open(f"{engine.url.database}.{name}.lock", "a") as lock_file:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Timed out after {timeout}s waiting for the {name} lock")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def schema_is_current() -> bool:
+    """True when every migration has been applied (which implies create_all ran)"""
+    try:
+        with engine.connect() as conn:
+            latest = conn.execute(select(func.max(schema_version.c.version))).scalar()
+    except DBAPIError:
+        # No schema_version table yet
+        return False
+    return latest == MIGRATIONS[-1][0]
+
+
+def defaults_exist(db: Session) -> bool:
+    """True when the default school, admin user and placeholder professor exist"""
+    return (
+        db.query(School.school_id).filter(School.school_name == DEFAULT_SCHOOL).first() is not None
+        and db.query(User.user_id).filter(User.username == DEFAULT_ADMIN_USERNAME).first() is not None
+        and db.query(Professor.professor_id).filter_by(**UNKNOWN_PROFESSOR).first() is not None
+    )
+
+
+def seed_defaults(db: Session):
+    """Create whichever default rows are missing"""
+    if not db.query(School.school_id).filter(School.school_name == DEFAULT_SCHOOL).first():
+        db.add(School(school_name=DEFAULT_SCHOOL))
+    if not db.query(User.user_id).filter(User.username == DEFAULT_ADMIN_USERNAME).first():
+        # bcrypt is slow by design, so only hash when the admin is actually created
+        from auth import get_password_hash
+        db.add(User(
+            username=DEFAULT_ADMIN_USERNAME,
+            password_hash=get_password_hash(DEFAULT_ADMIN_PASSWORD),
+            role=UserRole.ADMIN
+        ))
+        print(f"✓ Default admin user created (username: {DEFAULT_ADMIN_USERNAME}, password: {DEFAULT_ADMIN_PASSWORD})")
+    if not db.query(Professor.professor_id).filter_by(**UNKNOWN_PROFESSOR).first():
+        db.add(Professor(**UNKNOWN_PROFESSOR))
+    db.commit()
+
+
+def prepare_database(timer: StartupTimer):
+    """Create tables, apply migrations and seed defaults, once across all workers"""
+    with timer.phase("check"):
+        db = SessionLocal()
+        try:
+            ready = schema_is_current() and defaults_exist(db)
+        finally:
+            db.close()
+    if ready:
+        return
+
+    # "prepare" includes any time spent waiting for another worker to finish
+    with timer.phase("prepare"), advisory_lock():
+        with timer.phase("schema"):
+            if not schema_is_current():
+                init_db()
+                # A failed migration aborts startup rather than serving an older schema
+                run_migrations()
+        with timer.phase("seed"):
+            db = SessionLocal()
+            try:
+                seed_defaults(db)
+            finally:
+                db.close()
@@ -0,0 +1,189 @@
+"""
+Course suggestions for the search box (GET /courses/suggest).
+
+An in-process prefix index over course numbers and names, answered
+without touching the database. A query matches, best first:
+
+1. the course number ("cs1" or "cs 1" matches "CS 170"),
+2. the start of the course name ("intro comp" matches "Intro Computer Science"),
+3. the start of a later word of the name ("comp" matches the same course).
+
+Each tier is a sorted list of (key, course_id), so a lookup is a binary
+search plus a scan that stops after `limit` courses. Every tier is kept
+for all courses and per school, for the school_id filter.
+
+The index is built in a background thread when the worker starts, retried
+until the database is reachable, updated by create_course and caught up
+with courses added by other workers or the importer every
+SUGGEST_INDEX_REFRESH_SECONDS. Renamed courses are picked up when the
+worker restarts. Suggestions wait up to SUGGEST_WAIT_SECONDS for the first
+build and get a 503 if it has not finished or has failed (see
+background_index.py).
+"""
+
+import os
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from background_index import BackgroundIndex
+from database import Course
+from search import tokenize
+
+SUGGEST_INDEX_REFRESH_SECONDS = float(os.getenv("SUGGEST_INDEX_REFRESH_SECONDS", "30"))
+SUGGEST_WAIT_SECONDS = float(os.getenv("SUGGEST_WAIT_SECONDS", "10"))
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+NUMBER, NAME, WORD = range(3)
+
+
+def _normalize(value: str) -> str:
+    """'Intro  to C.S.' -> 'intro to c s'"""
+    return " ".join(tokenize(value))
+
+
+def _suggestion(course) -> Dict:
+    return {
+        "course_id": course.course_id,
+        "course_number": course.course_number,
+        "course_name": course.course_name,
+        "school_id": course.school_id,
+    }
+
+
+def _keys(course_number: str, course_name: str):
+    """(tier, key) pairs a course is found under"""
+    number = _normalize(course_number)
+    yield NUMBER, number
+    if " " in number:
+        yield NUMBER, number.replace(" ", "")
+    words = tokenize(course_name)
+    for start in range(len(words)):
+        yield (NAME if start == 0 else WORD), " ".join(words[start:])
+
+
+class PrefixTiers:
+    """Sorted (key, course_id) lists, one per match tier"""
+
+    def __init__(self):
+        self.tiers = [[] for _ in (NUMBER, NAME, WORD)]
+
+    def add(self, course_id: int, keys):
+        for tier, key in keys:
+            insort(self.tiers[tier], (key, course_id))
+
+    def remove(self, course_id: int, keys):
+        for tier, key in keys:
+            entries = self.tiers[tier]
+            position = bisect_left(entries, (key, course_id))
+            if position < len(entries) and entries[position] == (key, course_id):
+                del entries[position]
+
+    def sort(self):
+        for entries in self.tiers:
+            entries.sort()
+
+    def match(self, query: str, limit: int) -> List[int]:
+        """Course ids matching query, best tier first, then alphabetically"""
+        found = []
+        seen = set()
+        compact = query.replace(" ", "")
+        for tier, entries in enumerate(self.tiers):
+            for prefix in ((query, compact) if tier == NUMBER and compact != query else (query,)):
+                # Index instead of slicing: a slice would copy the rest of the list
+                for position in range(bisect_left(entries, (prefix,)), len(entries)):
+                    key, course_id = entries[position]
+                    if not key.startswith(prefix):
+                        break
+                    if course_id not in seen:
+                        seen.add(course_id)
+                        found.append(course_id)
+                        if len(found) == limit:
+                            return found
+        return found
+
+
+class CourseSuggestIndex(BackgroundIndex):
+    def __init__(self):
+        super().__init__("course suggestion", SUGGEST_WAIT_SECONDS, SUGGEST_INDEX_REFRESH_SECONDS)
+        self._lock = threading.Lock()
+        self._courses = {}                          # course_id -> suggestion dict
+        self._all = PrefixTiers()
+        self._schools = defaultdict(PrefixTiers)    # school_id -> tiers
+        self._max_course_id = 0
+
+    def add_course(self, course):
+        """Index (or re-index) a single course"""
+        with self._lock:
+            self._remove(course.course_id)
+            self._add(course)
+
+    def _add(self, course):
+        keys = list(_keys(course.course_number, course.course_name))
+        self._courses[course.course_id] = _suggestion(course)
+        self._all.add(course.course_id, keys)
+        self._schools[course.school_id].add(course.course_id, keys)
+        self._max_course_id = max(self._max_course_id, course.course_id)
+
+    def _remove(self, course_id: int):
+        suggestion = self._courses.pop(course_id, None)
+        if suggestion is not None:
+            keys = list(_keys(suggestion["course_number"], suggestion["course_name"]))
+            self._all.remove(course_id, keys)
+            self._schools[suggestion["school_id"]].remove(course_id, keys)
+
+    def build(self, db: Session):
+        """Replace the index contents with every course in the database"""
+        # Built off to the side with appends and one sort per list, then swapped in
+        courses = {}
+        all_tiers = PrefixTiers()
+        schools = defaultdict(PrefixTiers)
+        max_course_id = 0
+        for course in self._query(db, Course.course_id > 0):
+            keys = list(_keys(course.course_number, course.course_name))
+            courses[course.course_id] = _suggestion(course)
+            for tiers in (all_tiers, schools[course.school_id]):
+                for tier, key in keys:
+                    tiers.tiers[tier].append((key, course.course_id))
+            max_course_id = max(max_course_id, course.course_id)
+        all_tiers.sort()
+        for tiers in schools.values():
+            tiers.sort()
+        with self._lock:
+            self._courses = courses
+            self._all = all_tiers
+            self._schools = schools
+            self._max_course_id = max_course_id
+        self.catch_up(db)
+
+    def catch_up(self, db: Session):
+        """Index courses created since the last sync (e.g. by another worker)"""
+        for course in self._query(db, Course.course_id > self._max_course_id):
+            self.add_course(course)
+
+    def _query(self, db: Session, condition):
+        return db.query(
+            Course.course_id, Course.course_number, Course.course_name, Course.school_id
+        ).filter(condition).yield_per(1000)
+
+    def suggest(self, query: str, school_id: Optional[int] = None, limit: int = DEFAULT_SUGGESTIONS) -> List[Dict]:
+        """Up to limit courses whose number or name starts with query"""
+        query = _normalize(query)
+        if not query:
+            return []
+        with self._lock:
+            tiers = self._all if school_id is None else self._schools.get(school_id)
+            if tiers is None:
+                return []
+            return [self._courses[course_id] for course_id in tiers.match(query, limit)]
+
+
+course_suggestions = CourseSuggestIndex()
+
+
+async def wait_for_suggestions():
+    """Wait, off the event loop, until the index has been built; 503 if it is not ready"""
+    await course_suggestions.wait_ready()
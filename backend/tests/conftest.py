@@ -0,0 +1,67 @@
+"""
+Shared fixtures for the backend tests.
+
+The app reads its configuration when it is imported, so the environment is
+set here first: a scratch SQLite database in a temporary directory, no
+response cache, no read replicas and synchronous sessions, so every
+request reaches the primary database. The connection pool is small with a
+short timeout so tests/test_pool.py can exhaust it quickly.
+
+Run from backend/:
+    python -m pytest
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="ratemyclass-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'test.db')}"
+os.environ["DB_ASYNC"] = "false"
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["RATING_WRITE_BEHIND"] = "false"
+os.environ["SQL_ECHO"] = "false"
+os.environ["DB_POOL_SIZE"] = "3"
+os.environ["DB_MAX_OVERFLOW"] = "0"
+os.environ["DB_POOL_TIMEOUT"] = "2"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """A started app over a database seeded with benchmarks/seed.py"""
+    from fastapi.testclient import TestClient
+    from benchmarks.seed import seed
+    from database import Base, engine
+    import main
+
+    Base.metadata.create_all(bind=engine)
+    seed(schools=3, courses=600, books=200, ratings=6000, random_seed=42)
+    try:
+        with TestClient(main.app) as client:
+            yield client
+    finally:
+        engine.dispose()
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    """Authorization headers for the default admin"""
+    from startup import DEFAULT_ADMIN_PASSWORD, DEFAULT_ADMIN_USERNAME
+    response = client.post("/auth/login", json={"username": DEFAULT_ADMIN_USERNAME, "password": DEFAULT_ADMIN_PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def cached(client, monkeypatch):
+    """The response cache, enabled and empty for one test"""
+    from cache import response_cache
+    monkeypatch.setattr(response_cache, "enabled", True)
+    response_cache.clear()
+    yield response_cache
+    response_cache.clear()
@@ -0,0 +1,85 @@
+"""Token versions revoke issued tokens in both auth modes (see auth.py)"""
+
+import uuid
+import pytest
+from sqlalchemy import update
+import auth
+import login_guard
+from auth import get_password_hash, token_store
+from database import SessionLocal, User, UserRole
+
+PASSWORD = "revocation-test-password"
+
+
+@pytest.fixture(autouse=True)
+def unthrottled(monkeypatch):
+    monkeypatch.setattr(login_guard, "user_limiter", login_guard.RateLimiter(0, 0))
+    monkeypatch.setattr(login_guard, "ip_limiter", login_guard.RateLimiter(0, 0))
+
+
+@pytest.fixture(params=["database", "stateless"])
+def auth_mode(request, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_MODE", request.param)
+    return request.param
+
+
+@pytest.fixture
+def username(client):
+    """A fresh admin, so revoking its tokens leaves the shared admin session alone"""
+    name = f"revoke-{uuid.uuid4().hex[:12]}"
+    db = SessionLocal()
+    try:
+        db.add(User(username=name, password_hash=get_password_hash(PASSWORD), role=UserRole.ADMIN))
+        db.commit()
+    finally:
+        db.close()
+    return name
+
+
+def login(client, username):
+    response = client.post("/auth/login", json={"username": username, "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_logout_revokes_every_issued_token(client, auth_mode, username):
+    first, second = login(client, username), login(client, username)
+    assert client.get("/db/pool/stats", headers=first).status_code == 200
+
+    assert client.post("/auth/logout", headers=second).status_code == 200
+    assert client.get("/db/pool/stats", headers=first).status_code == 401
+    assert client.post("/auth/logout", headers=second).status_code == 401
+
+    # Tokens issued after the logout carry the new version
+    assert client.get("/db/pool/stats", headers=login(client, username)).status_code == 200
+
+
+def test_revocation_by_another_worker(client, auth_mode, username, monkeypatch):
+    headers = login(client, username)
+    assert client.get("/db/pool/stats", headers=headers).status_code == 200
+
+    # Another worker's logout only changes the database row
+    db = SessionLocal()
+    try:
+        db.execute(update(User).where(User.username == username).values(token_version=User.token_version + 1))
+        db.commit()
+    finally:
+        db.close()
+
+    if auth_mode == "stateless":
+        # The cached version is trusted until it is AUTH_TOKEN_VERSION_TTL_SECONDS old
+        assert client.get("/db/pool/stats", headers=headers).status_code == 200
+        monkeypatch.setattr(token_store, "version_ttl", 0)
+    assert client.get("/db/pool/stats", headers=headers).status_code == 401
+
+
+def test_deleted_user_is_rejected(client, auth_mode, username, monkeypatch):
+    headers = login(client, username)
+    monkeypatch.setattr(token_store, "version_ttl", 0)
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == username).delete()
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/db/pool/stats", headers=headers).status_code == 401
@@ -0,0 +1,74 @@
+"""In-process indexes answer 503 until their first build (see background_index.py)"""
+
+import threading
+import pytest
+import background_index
+from background_index import BackgroundIndex
+from search import course_index
+from suggest import course_suggestions
+
+
+@pytest.fixture(params=[course_suggestions, course_index], ids=["suggest", "search"])
+def not_ready(client, request, monkeypatch):
+    """An index whose first build has not finished"""
+    index = request.param
+    # Let the startup build finish first, or it would set the replacement event
+    assert index.ready.wait(30)
+    monkeypatch.setattr(index, "ready", threading.Event())
+    monkeypatch.setattr(index, "wait_seconds", 0.05)
+    return index
+
+
+def get(client, index):
+    if index is course_suggestions:
+        return client.get("/courses/suggest", params={"q": "cs"})
+    return client.get("/courses", params={"search": "intro", "limit": 5})
+
+
+def test_503_while_building(client, not_ready):
+    response = get(client, not_ready)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(background_index.BUILD_RETRY_SECONDS)
+    assert not_ready.name in response.json()["detail"]
+
+
+def test_503_without_waiting_after_a_failed_build(client, not_ready, monkeypatch):
+    monkeypatch.setattr(not_ready, "wait_seconds", 60)
+    monkeypatch.setattr(not_ready, "build_error", RuntimeError("database is unreachable"))
+    assert get(client, not_ready).status_code == 503
+
+
+def test_ready_index_answers(client):
+    assert get(client, course_suggestions).status_code == 200
+    assert get(client, course_index).status_code == 200
+    # Other catalog reads never wait for an index
+    assert client.get("/courses", params={"limit": 5}).status_code == 200
+
+
+class FlakyIndex(BackgroundIndex):
+    """Fails its first build, then refreshes once"""
+
+    def __init__(self):
+        super().__init__("flaky", wait_seconds=5, refresh_seconds=0)
+        self.builds = 0
+        self.caught_up = threading.Event()
+
+    def build(self, db):
+        self.builds += 1
+        if self.builds == 1:
+            raise RuntimeError("database is unreachable")
+
+    def catch_up(self, db):
+        self.refresh_seconds = None
+        self.caught_up.set()
+
+
+def test_build_is_retried_until_it_succeeds(client, monkeypatch):
+    monkeypatch.setattr(background_index, "BUILD_RETRY_SECONDS", 0)
+    index = FlakyIndex()
+    index.start()
+    index.start()
+    assert index.ready.wait(5)
+    assert index.wait_until_ready()
+    assert (index.builds, index.build_error) == (2, None)
+    assert index.caught_up.wait(5)
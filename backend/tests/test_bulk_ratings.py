@@ -0,0 +1,71 @@
+"""POST /ratings/bulk (see ratings.py)"""
+
+import json
+import uuid
+import pytest
+import main
+
+COURSE_ID = 5
+
+
+def rating(**values):
+    return dict({"course_id": COURSE_ID, "rating": 5, "review": "Bulk test"}, **values)
+
+
+def rating_count(client, course_id=COURSE_ID):
+    return client.get(f"/courses/{course_id}").json()["rating_count"]
+
+
+def test_reports_bad_items_by_index(client, admin_headers):
+    submission_id = uuid.uuid4().hex
+    before = rating_count(client)
+    response = client.post("/ratings/bulk", headers=admin_headers, json=[
+        rating(submission_id=submission_id),
+        rating(rating=9),
+        rating(course_id=999999),
+        rating(submission_id=submission_id),
+        "not an object",
+        rating(textbook="Bulk Ingestion, 2nd Edition"),
+    ])
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["received"], result["inserted"], result["failed"]) == (6, 2, 4)
+    errors = {error["index"]: error["detail"] for error in result["errors"]}
+    assert sorted(errors) == [1, 2, 3, 4]
+    assert errors[2] == "Course not found"
+    assert errors[3] == "Duplicate submission_id"
+    assert rating_count(client) == before + 2
+
+
+def test_resubmitted_batch_is_not_inserted_twice(client, admin_headers):
+    batch = [rating(submission_id=uuid.uuid4().hex) for _ in range(3)]
+    assert client.post("/ratings/bulk", headers=admin_headers, json=batch).json()["inserted"] == 3
+    before = rating_count(client)
+
+    result = client.post("/ratings/bulk", headers=admin_headers, json=batch).json()
+    assert (result["inserted"], result["failed"]) == (0, 3)
+    assert rating_count(client) == before
+
+
+def test_ndjson_stream_in_chunks(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(main, "BULK_RATINGS_CHUNK_SIZE", 2)
+    before = rating_count(client)
+    lines = [json.dumps(rating(rating=value % 5 + 1)) for value in range(5)] + ["{not json"]
+    response = client.post(
+        "/ratings/bulk",
+        headers=dict(admin_headers, **{"Content-Type": "application/x-ndjson"}),
+        content="\n".join(lines) + "\n\n",
+    )
+    result = response.json()
+    assert (result["received"], result["inserted"], result["failed"]) == (6, 5, 1)
+    assert result["errors"][0]["index"] == 5
+    assert rating_count(client) == before + 5
+
+
+def test_body_must_be_a_list(client, admin_headers):
+    response = client.post("/ratings/bulk", headers=admin_headers, json=rating())
+    assert response.status_code == 400
+
+
+def test_admin_only(client):
+    assert client.post("/ratings/bulk", json=[rating()]).status_code == 401
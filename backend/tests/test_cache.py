@@ -0,0 +1,148 @@
+"""The response cache: keys, single-flight loads and stale entries (see cache.py)"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import cache as cache_module
+from cache import FALLBACK, FRESH, MISSING, STALE, ResponseCache
+
+def test_filters_are_not_normalized_into_other_results(client, cached):
+    online = client.get("/courses", params={"delivery_mode": "Online", "limit": 5}).json()
+    assert online
+    # Matched exactly by the query, so the padded value must not share the entry above
+    assert client.get("/courses", params={"delivery_mode": "Online  ", "limit": 5}).json() == []
+
+
+def test_search_terms_share_entries_across_case_and_spacing(client, cached):
+    first = client.get("/courses", params={"search": "intro", "limit": 5}).json()
+    hits = cached.hits
+    assert client.get("/courses", params={"search": "  INTRO ", "limit": 5}).json() == first
+    assert cached.hits == hits + 1
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_loads_share_one_execution():
+    cache = ResponseCache(max_entries=8, ttl_seconds=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["rows"]
+
+    async def main():
+        return await asyncio.gather(*(cache.load("key", compute) for _ in range(5)))
+
+    assert run(main()) == [["rows"]] * 5
+    assert (calls, cache.coalesced, cache.stats()["in_flight"]) == (1, 4, 0)
+    # The flight ends with its load
+    run(cache.load("key", compute))
+    assert calls == 2
+
+
+def test_waiters_share_the_loads_exception():
+    cache = ResponseCache(max_entries=8, ttl_seconds=60)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database is down")
+
+    async def main():
+        return await asyncio.gather(*(cache.load("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [str(result) for result in run(main())] == ["database is down"] * 3
+    assert cache.coalesced == 0
+
+
+def test_waiter_takes_over_a_cancelled_load():
+    cache = ResponseCache(max_entries=8, ttl_seconds=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        first = asyncio.ensure_future(cache.load("key", compute))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(cache.load("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert run(main()) == 2
+
+
+def test_stale_entry_is_served_while_it_refreshes(monkeypatch):
+    cache = ResponseCache(max_entries=8, ttl_seconds=10, stale_seconds=10, stale_if_error_seconds=100)
+    now = [1000.0]
+    # Only the cache's clock: the event loop keeps the real one
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache.set("key", "old", ["courses"], cache.generation)
+
+    now[0] += 15
+    assert cache.lookup("key") == (STALE, "old")
+
+    loads = 0
+
+    async def refresh():
+        async def load():
+            nonlocal loads
+            loads += 1
+            await asyncio.sleep(0.01)
+            cache.set("key", "new", ["courses"], cache.generation)
+            return "new"
+        # Requests that find the entry stale share one background load
+        cache.refresh("key", load)
+        cache.refresh("key", load)
+        await asyncio.gather(*cache._refreshes)
+
+    run(refresh())
+    assert cache.lookup("key") == (FRESH, "new")
+    assert loads == 1
+
+    # Past the stale window, or invalidated, the entry is only a fallback for database errors
+    now[0] += 25
+    assert cache.lookup("key") == (FALLBACK, "new")
+    cache.set("key", "newer", ["courses"], cache.generation)
+    cache.invalidate("courses")
+    assert cache.lookup("key") == (FALLBACK, "newer")
+    now[0] += 200
+    assert cache.lookup("key") == (None, MISSING)
+
+
+def test_write_during_a_load_is_not_cached_over():
+    cache = ResponseCache(max_entries=8, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate("courses")
+    cache.set("key", "before the write", ["courses"], generation)
+    assert cache.lookup("key") == (None, MISSING)
+
+
+def test_concurrent_misses_are_coalesced_through_the_endpoint(client, cached, monkeypatch):
+    import main
+    calls = 0
+    list_courses = main._list_courses
+
+    def counting_list_courses(*args):
+        nonlocal calls
+        calls += 1
+        time.sleep(0.05)
+        return list_courses(*args)
+
+    monkeypatch.setattr(main, "_list_courses", counting_list_courses)
+    coalesced, hits = cached.coalesced, cached.hits
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(lambda _: client.get("/courses", params={"limit": 3}), range(4)))
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    # Each request ran the query, joined the one in flight or, arriving after it, hit the cache
+    assert calls + (cached.coalesced - coalesced) + (cached.hits - hits) == 4
+    assert calls < 4
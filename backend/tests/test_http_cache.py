@@ -0,0 +1,65 @@
+"""ETags and conditional GET on the catalog read endpoints (see http_cache.py)"""
+
+import pytest
+
+COURSE_ID = 3
+
+
+@pytest.fixture(params=[False, True], ids=["uncached", "cached"])
+def response_cache(request):
+    """Each test runs against the database directly and through the response cache"""
+    return request.getfixturevalue("cached") if request.param else None
+
+
+def post_rating(client, course_id=COURSE_ID):
+    response = client.post("/ratings", json={"course_id": course_id, "rating": 4, "review": "Conditional GET test"})
+    assert response.status_code == 200
+
+
+def test_current_copy_gets_304(client, response_cache):
+    first = client.get(f"/courses/{COURSE_ID}")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get(f"/courses/{COURSE_ID}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+    assert client.get(f"/courses/{COURSE_ID}", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+
+def test_rating_changes_course_and_list_etags(client, response_cache):
+    course = client.get(f"/courses/{COURSE_ID}")
+    courses = client.get("/courses", params={"limit": 5})
+
+    post_rating(client)
+
+    updated = client.get(f"/courses/{COURSE_ID}", headers={"If-None-Match": course.headers["ETag"]})
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] != course.headers["ETag"]
+    assert updated.json()["rating_count"] == course.json()["rating_count"] + 1
+
+    # A rating on any course can move it in the list
+    listed = client.get("/courses", params={"limit": 5}, headers={"If-None-Match": courses.headers["ETag"]})
+    assert listed.status_code == 200
+    assert listed.headers["ETag"] != courses.headers["ETag"]
+
+
+def test_new_course_changes_school_etags(client, admin_headers, response_cache):
+    school_id = client.get("/schools").json()[0]["school_id"]
+    courses = client.get(f"/schools/{school_id}/courses")
+    school_name = client.get(f"/courses/{courses.json()[0]['course_id']}").json()["school_name"]
+
+    created = client.post("/courses", headers=admin_headers, json={
+        "course_name": "Caching", "course_number": f"ETAG {len(courses.json())}", "major": "Computer Science",
+        "school_name": school_name, "delivery_mode": "Online"
+    })
+    assert created.status_code == 200
+
+    updated = client.get(f"/schools/{school_id}/courses", headers={"If-None-Match": courses.headers["ETag"]})
+    assert updated.status_code == 200
+    assert created.json()["course_id"] in [course["course_id"] for course in updated.json()]
+
+
+def test_unknown_course_is_404_with_any_etag(client, response_cache):
+    assert client.get("/courses/999999", headers={"If-None-Match": "*"}).status_code == 404
@@ -0,0 +1,56 @@
+"""Course catalog import (see import_courses.py)"""
+
+import pytest
+from database import Course, SessionLocal
+from import_courses import CourseImporter
+
+SCHOOL = "Import Test University"
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def run_import(db, rows, **options):
+    importer = CourseImporter(db, chunk_size=2, **options)
+    for line_number, row in enumerate(rows, start=1):
+        importer.add(line_number, row, default_school=SCHOOL)
+    importer.finish()
+    return importer
+
+
+def course_numbers(db):
+    return sorted(
+        number for (number,) in db.query(Course.course_number).join(Course.school).filter_by(school_name=SCHOOL)
+    )
+
+
+def row(course_number, **values):
+    return dict({"course_name": "Imported", "course_number": course_number, "major": "Math", "delivery_mode": "Online"}, **values)
+
+
+def test_numeric_and_case_variant_keys_match(db):
+    importer = run_import(db, [row("170"), row("MATH 200"), row("Math 201")])
+    assert (importer.added, importer.errors) == (3, [])
+
+    # 170 as a JSON number is the existing "170"; case variants are the same course,
+    # in the database and within the file
+    importer = run_import(db, [row(170), row("math 200"), row("STAT 300"), row("stat 300"), row(171)])
+    assert (importer.added, importer.skipped, importer.errors) == (2, 3, [])
+    assert course_numbers(db) == ["170", "171", "MATH 200", "Math 201", "STAT 300"]
+
+
+def test_update_matches_case_variants(db):
+    run_import(db, [row("PHYS 100")])
+    importer = run_import(db, [row("phys 100", course_name="Physics I")], update_existing=True)
+    assert (importer.added, importer.updated) == (0, 1)
+    assert db.query(Course.course_name).filter_by(course_number="phys 100").scalar() == "Physics I"
+
+
+def test_structured_values_are_rejected(db):
+    importer = run_import(db, [row(["CS", 170]), row(True)])
+    assert importer.added == 0
+    assert [line for line, _ in importer.errors] == [1, 2]
@@ -0,0 +1,51 @@
+"""Login throttling and the bounded password executor (see login_guard.py)"""
+
+import pytest
+import login_guard
+from login_guard import RateLimiter
+from startup import DEFAULT_ADMIN_PASSWORD, DEFAULT_ADMIN_USERNAME
+
+
+def login(client, username, password="wrong password"):
+    return client.post("/auth/login", json={"username": username, "password": password})
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    """Fresh buckets: two attempts per username and five per client IP, refilled at one a second"""
+    monkeypatch.setattr(login_guard, "user_limiter", RateLimiter(60, 2))
+    monkeypatch.setattr(login_guard, "ip_limiter", RateLimiter(60, 5))
+
+
+def test_username_is_throttled(client, limiters, monkeypatch):
+    monkeypatch.setattr(login_guard, "ip_limiter", RateLimiter(0, 0))
+    assert [login(client, "Throttled").status_code for _ in range(2)] == [401, 401]
+    # Usernames are compared case-insensitively
+    throttled = login(client, "throttled")
+    assert throttled.status_code == 429
+    assert throttled.headers["Retry-After"] == "1"
+
+    # Checked before the password: the right one is refused too
+    assert login(client, DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD).status_code == 200
+    assert login(client, DEFAULT_ADMIN_USERNAME).status_code == 401
+    assert login(client, DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD).status_code == 429
+
+
+def test_client_ip_is_throttled(client, limiters):
+    statuses = [login(client, f"user-{attempt}").status_code for attempt in range(6)]
+    assert statuses == [401] * 5 + [429]
+
+
+def test_bucket_refills():
+    limiter = RateLimiter(60, 1)
+    assert limiter.acquire("key") == 0
+    wait = limiter.acquire("key")
+    assert 0 < wait <= 1
+    assert RateLimiter(0, 0).acquire("key") == 0
+
+
+def test_full_password_queue_is_refused(client, limiters, monkeypatch):
+    monkeypatch.setattr(login_guard, "PASSWORD_QUEUE_LIMIT", 0)
+    response = login(client, DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,16 @@
+"""GET /metrics is opt-in (see sql_metrics.py)"""
+
+import main
+
+
+def test_metrics_disabled_by_default(client):
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_when_enabled(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_ENABLED", True)
+    client.get("/schools")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'rmc_db_pool_checkouts_total{pool="primary"}' in response.text
+    assert 'endpoint="/schools"' in response.text
@@ -0,0 +1,106 @@
+"""Upgrading a database created before the migrations (see migrations.py)"""
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+import startup
+from database import Base
+from migrations import MIGRATIONS, applied_versions, run_migrations
+
+# Indexes, columns and tables the original schema did not have
+ADDED_INDEXES = [
+    "uq_course_school_number", "ix_course_major", "ix_course_delivery_mode", "ix_course_updated_at",
+    "ix_rating_course_created", "ix_rating_updated_at", "uq_rating_submission_id", "ix_books_title_hash",
+]
+ADDED_COLUMNS = [("user", "token_version"), ("books", "title_hash"), ("rating", "submission_id")]
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    """A SQLite database with the schema as it was before any migration, and a few rows"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for index in ADDED_INDEXES:
+            conn.execute(text(f"DROP INDEX {index}"))
+        for table, column in ADDED_COLUMNS:
+            conn.execute(text(f'ALTER TABLE "{table}" DROP COLUMN {column}'))
+        conn.execute(text("DROP TABLE course_stats"))
+        conn.execute(text("INSERT INTO school (school_id, school_name) VALUES (1, 'Baseline University')"))
+        conn.execute(text("INSERT INTO professor (professor_id, first_name, last_name) VALUES (1, 'Ada', 'Lovelace')"))
+        conn.execute(text(
+            "INSERT INTO user (user_id, username, password_hash, role) VALUES (1, 'student', 'x', 'USER')"
+        ))
+        conn.execute(text("INSERT INTO books (book_id, title, isbn) VALUES (1, 'Intro Book', '978-0-13-110362-7')"))
+    yield engine
+    engine.dispose()
+
+
+def add_course(engine, course_id, course_number, ratings=()):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO course (course_id, course_name, course_number, major, school_id, delivery_mode, created_at, updated_at) "
+            "VALUES (:course_id, 'Intro', :course_number, 'Computer Science', 1, 'Online', '2024-01-01 00:00:00', '2024-01-01 00:00:00')"
+        ), {"course_id": course_id, "course_number": course_number})
+        for rating in ratings:
+            conn.execute(text(
+                "INSERT INTO rating (course_id, professor_id, book_id, rating, review, created_at, updated_at) "
+                "VALUES (:course_id, 1, 1, :rating, 'Fine', '2024-02-01 00:00:00', '2024-02-01 00:00:00')"
+            ), {"course_id": course_id, "rating": rating})
+
+
+def upgrade(engine):
+    """What a worker does on startup against an out-of-date schema"""
+    Base.metadata.create_all(bind=engine)
+    return run_migrations(bind=engine)
+
+
+def test_upgrade_baseline_schema(baseline_engine):
+    add_course(baseline_engine, 1, "CS 170", ratings=[4, 5])
+    add_course(baseline_engine, 2, "CS 180", ratings=[3])
+
+    assert upgrade(baseline_engine) == [version for version, _, _ in MIGRATIONS]
+    assert applied_versions(baseline_engine) == {version for version, _, _ in MIGRATIONS}
+
+    inspector = inspect(baseline_engine)
+    for table, column in ADDED_COLUMNS:
+        assert column in {c["name"] for c in inspector.get_columns(table)}
+    indexes = {index["name"] for table in ("course", "rating", "books") for index in inspector.get_indexes(table)}
+    assert set(ADDED_INDEXES) <= indexes
+    with baseline_engine.connect() as conn:
+        assert conn.execute(text("SELECT token_version FROM user")).scalar() == 0
+        stats = conn.execute(text("SELECT course_id, rating_count, rating_sum FROM course_stats ORDER BY course_id")).all()
+        assert [tuple(row) for row in stats] == [(1, 2, 9), (2, 1, 3)]
+        assert conn.execute(text("SELECT title_hash FROM books")).scalar() is not None
+
+    # Nothing left to apply on the next start
+    assert upgrade(baseline_engine) == []
+
+
+def test_failed_migration_aborts_startup(client, monkeypatch):
+    def broken_migration():
+        raise RuntimeError("migration 4 failed")
+
+    monkeypatch.setattr(startup, "schema_is_current", lambda: False)
+    monkeypatch.setattr(startup, "run_migrations", broken_migration)
+    with pytest.raises(RuntimeError, match="migration 4 failed"):
+        startup.prepare_database(startup.StartupTimer())
+
+
+def test_upgrade_merges_duplicate_course_numbers(baseline_engine):
+    add_course(baseline_engine, 1, "CS 170", ratings=[4, 5])
+    add_course(baseline_engine, 2, "CS 170", ratings=[1])
+    add_course(baseline_engine, 3, "CS 180", ratings=[3])
+    add_course(baseline_engine, 4, "CS 170")
+
+    # Every migration applies, including the ones after the unique index
+    assert upgrade(baseline_engine) == [version for version, _, _ in MIGRATIONS]
+
+    with baseline_engine.connect() as conn:
+        courses = conn.execute(text("SELECT course_id, course_number FROM course ORDER BY course_id")).all()
+        assert [tuple(row) for row in courses] == [(1, "CS 170"), (3, "CS 180")]
+        ratings = conn.execute(text("SELECT course_id, COUNT(*) FROM rating GROUP BY course_id ORDER BY course_id")).all()
+        assert [tuple(row) for row in ratings] == [(1, 3), (3, 1)]
+        stats = conn.execute(text("SELECT course_id, rating_count, rating_sum FROM course_stats ORDER BY course_id")).all()
+        assert [tuple(row) for row in stats] == [(1, 3, 10), (3, 1, 3)]
+        assert conn.execute(text("SELECT token_version FROM user")).scalar() == 0
+    assert "uq_course_school_number" in {index["name"] for index in inspect(baseline_engine).get_indexes("course")}
@@ -0,0 +1,80 @@
+"""Keyset cursors: pages follow each other and malformed cursors are rejected (see pagination.py)"""
+
+import pytest
+import main
+from pagination import NEXT_CURSOR_HEADER, encode_cursor
+
+
+def test_course_pages_follow_each_other(client):
+    seen = []
+    response = client.get("/courses", params={"limit": 50})
+    for _ in range(3):
+        page = [course["course_id"] for course in response.json()]
+        assert page and page == sorted(page)
+        seen += page
+        response = client.get("/courses", params={"limit": 50, "cursor": response.headers[NEXT_CURSOR_HEADER]})
+    assert len(seen) == len(set(seen)) == 150
+
+
+@pytest.mark.parametrize("position", [
+    {"course_id": [1]},
+    {"course_id": "x"},
+    {"course_id": True},
+    {"course_id": None},
+    {"after": 1},
+])
+def test_invalid_course_cursor(client, position):
+    response = client.get("/courses", params={"limit": 10, "cursor": encode_cursor(position)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("position", [
+    {"created_at": "2024-01-01T00:00:00", "rating_id": {"id": 1}},
+    {"created_at": "2024-01-01T00:00:00", "rating_id": "1"},
+    {"created_at": 1700000000, "rating_id": 1},
+    {"created_at": "yesterday", "rating_id": 1},
+])
+def test_invalid_rating_cursor(client, position):
+    course_id = client.get("/courses", params={"limit": 1}).json()[0]["course_id"]
+    response = client.get(f"/courses/{course_id}/detail", params={"limit": 10, "cursor": encode_cursor(position)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_garbled_cursor(client):
+    assert client.get("/courses", params={"cursor": "not a cursor!"}).status_code == 400
+
+
+@pytest.mark.parametrize("position", [
+    {"sort": "bayesian", "value": {"score": 1}, "course_id": 5},
+    {"sort": "bayesian", "value": "4.5", "course_id": 5},
+    {"sort": "bayesian", "value": 4.5, "course_id": "5"},
+    {"sort": "avg_rating", "value": 4.5, "course_id": 5},
+])
+def test_invalid_sort_cursor(client, position):
+    response = client.get("/courses", params={"sort": "bayesian", "limit": 10, "cursor": encode_cursor(position)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def sorted_search_pages(client, sort):
+    ids = []
+    params = {"search": "intro", "sort": sort, "limit": 20}
+    while True:
+        response = client.get("/courses", params=params)
+        assert response.status_code == 200, response.text
+        ids += [course["course_id"] for course in response.json()]
+        if NEXT_CURSOR_HEADER not in response.headers:
+            return ids
+        params["cursor"] = response.headers[NEXT_CURSOR_HEADER]
+
+
+@pytest.mark.parametrize("sort", ["bayesian", "rating_count", "newest"])
+def test_sorted_search_in_chunks(client, monkeypatch, sort):
+    unpaged = [course["course_id"] for course in client.get("/courses", params={"search": "intro", "sort": sort}).json()]
+    assert len(unpaged) > 20
+    # Search matches are fetched a few ids at a time; the order must not change
+    monkeypatch.setattr(main, "SEARCH_ID_CHUNK_SIZE", 7)
+    assert [course["course_id"] for course in client.get("/courses", params={"search": "intro", "sort": sort}).json()] == unpaged
+    assert sorted_search_pages(client, sort) == unpaged
@@ -0,0 +1,51 @@
+"""Requests fail fast with a 503 when the connection pool is exhausted"""
+
+import time
+from database import DB_POOL_TIMEOUT, engine
+from search import course_index
+from sql_metrics import pool_status
+from suggest import course_suggestions
+
+
+def test_exhausted_pool_returns_503(client):
+    # The background index builds hold connections until they finish
+    assert course_index.ready.wait(30) and course_suggestions.ready.wait(30)
+    course_id = client.get("/courses?limit=1").json()[0]["course_id"]
+    timeouts = pool_status()["primary"]["timeouts"]
+
+    # Check out every pooled connection directly, bypassing the app
+    held = [engine.pool.connect() for _ in range(engine.pool.size())]
+    try:
+        started = time.monotonic()
+        response = client.get(f"/courses/{course_id}")
+        waited = time.monotonic() - started
+    finally:
+        for connection in held:
+            connection.close()
+
+    assert response.status_code == 503, response.text
+    assert response.headers["Retry-After"] == "1"
+    assert DB_POOL_TIMEOUT <= waited < DB_POOL_TIMEOUT + 5
+    assert pool_status()["primary"]["timeouts"] > timeouts
+    # Connections returned to the pool serve requests again
+    assert client.get(f"/courses/{course_id}").status_code == 200
+
+
+def test_pool_stats_are_admin_only(client, admin_headers):
+    assert client.get("/db/pool/stats").status_code == 401
+    response = client.get("/db/pool/stats", headers=admin_headers)
+    assert response.status_code == 200
+    assert "primary" in response.json()
+
+
+def test_replicas_are_named_without_hosts():
+    from replicas import Replica
+    from sql_metrics import pools
+
+    replica = Replica("sqlite:////replica-host.internal/ratemyclass.db", 2)
+    try:
+        assert replica.name == "replica 2"
+        assert "replica-host" not in repr(pools.keys())
+    finally:
+        pools.pop(replica.name, None)
+        replica.engine.dispose()
@@ -0,0 +1,21 @@
+"""The hot paths stay within their SQL statement budgets (see query_budget.py)"""
+
+import query_budget
+from sql_metrics import QueryBudgetExceeded
+
+
+def test_scenarios_within_budget(client):
+    # One test, in order: the replayed submission repeats the one created before it
+    admin_headers = query_budget.login_admin(client)
+    ids = query_budget.sample_ids(client)
+    failures = []
+    for scenario in query_budget.SCENARIOS:
+        name = scenario[0]
+        try:
+            response, stats = query_budget.run_scenario(client, scenario, ids, admin_headers)
+        except QueryBudgetExceeded as e:
+            failures.append(f"{name}: {e}")
+            continue
+        if response.status_code >= 400:
+            failures.append(f"{name}: HTTP {response.status_code} {response.text}")
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,18 @@
+"""The hot paths' statements use indexes (see query_plans.py)"""
+
+import pytest
+import query_plans
+
+
+@pytest.fixture(scope="module")
+def plan_check(client):
+    return query_plans.record_statements(), query_plans.sample_ids(client)
+
+
+@pytest.mark.parametrize("scenario", query_plans.SCENARIOS, ids=lambda scenario: scenario[0])
+def test_scenario_uses_indexes(client, plan_check, scenario):
+    recorder, ids = plan_check
+    response, statements, problems = query_plans.run_scenario(client, recorder, scenario, ids)
+    assert response.status_code < 400, response.text
+    assert statements > 0
+    assert not problems, "\n".join(problems)
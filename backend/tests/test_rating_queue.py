@@ -0,0 +1,121 @@
+"""Write-behind rating journals: flushing, crash replay and deduplication (see rating_queue.py)"""
+
+import asyncio
+import glob
+import json
+import os
+import uuid
+import pytest
+from sqlalchemy.exc import OperationalError
+import main
+import rating_queue as rating_queue_module
+from rating_queue import RatingQueue
+
+COURSE_ID = 7
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path)
+
+
+@pytest.fixture
+def queues(journal_dir):
+    """Make queues over journal_dir with their journals open, as start() leaves them, minus the flusher task"""
+    made = []
+
+    def make():
+        queue = RatingQueue(journal_dir, enabled=True)
+        queue._adopt_orphans()
+        queue._open_journal()
+        queue._wakeup = asyncio.Event()
+        made.append(queue)
+        return queue
+
+    yield make
+    for queue in made:
+        for fd in [queue._journal] + [fd for _, fd in queue._sealed]:
+            if fd is not None:
+                os.close(fd)
+
+
+def entry(**values):
+    return dict({"course_id": COURSE_ID, "rating": 3, "review": "Queued", "textbook": None, "submission_id": uuid.uuid4().hex}, **values)
+
+
+def write_journal(journal_dir, lines):
+    path = os.path.join(journal_dir, f"ratings-{uuid.uuid4().hex}.journal")
+    with open(path, "w") as journal:
+        journal.write("".join(lines))
+    return path
+
+
+def rating_count(client):
+    return client.get(f"/courses/{COURSE_ID}").json()["rating_count"]
+
+
+def journals(journal_dir):
+    return glob.glob(os.path.join(journal_dir, "ratings-*"))
+
+
+def test_queued_rating_is_visible_after_flush(client, queues, monkeypatch):
+    queue = queues()
+    monkeypatch.setattr(main, "rating_queue", queue)
+    before = rating_count(client)
+
+    response = client.post("/ratings", json={"course_id": COURSE_ID, "rating": 5, "review": "Write-behind"})
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    assert client.post("/ratings", json={"course_id": 999999, "rating": 5, "review": "No course"}).status_code == 404
+    assert queue.stats()["queue_depth"] == 1
+    assert rating_count(client) == before
+
+    queue._flush_sealed()
+    assert rating_count(client) == before + 1
+    assert (queue.stats()["queue_depth"], queue.stats()["flushed"]) == (0, 1)
+
+
+def test_orphaned_journal_is_replayed_once(client, journal_dir, queues):
+    committed, repeated = entry(), entry()
+    # committed reached the database just before the crash; repeated was submitted twice
+    assert client.post("/ratings", json=committed).status_code == 200
+    before = rating_count(client)
+    lines = [json.dumps(item) + "\n" for item in (committed, repeated, repeated, entry(course_id=999999))]
+    write_journal(journal_dir, lines + ['{"course_id": 7, "rat'])
+
+    queue = queues()
+    assert queue.stats()["sealed_journals"] == 1
+    queue._flush_sealed()
+    stats = queue.stats()
+    assert (stats["flushed"], stats["duplicates"], stats["failed"]) == (1, 2, 1)
+    assert rating_count(client) == before + 1
+
+    # Only the new, empty active journal is left
+    assert len(journals(journal_dir)) == 1
+
+
+def test_journal_held_by_a_running_worker_is_not_adopted(client, journal_dir, queues):
+    running = queues()
+    running.append(entry())
+    assert queues().stats()["sealed_journals"] == 0
+    assert running.stats()["queue_depth"] == 1
+
+
+def test_transient_error_keeps_the_journal(client, journal_dir, queues, monkeypatch):
+    before = rating_count(client)
+    queue = queues()
+    queue.append(entry())
+
+    def unavailable(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("database is unavailable"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(rating_queue_module, "insert_rating_chunk", unavailable)
+        asyncio.run(queue.flush())
+    stats = queue.stats()
+    assert (stats["flush_errors"], stats["sealed_journals"], stats["queue_depth"]) == (1, 1, 1)
+    assert rating_count(client) == before
+
+    asyncio.run(queue.flush())
+    assert (queue.stats()["sealed_journals"], queue.stats()["flushed"]) == (0, 1)
+    assert rating_count(client) == before + 1
@@ -0,0 +1,45 @@
+"""The read-your-writes cookie set after writes (see replicas.py)"""
+
+import pytest
+from replicas import READ_PRIMARY_COOKIE, replica_router
+
+
+class StubReplica:
+    """Only the presence of a replica matters: writes go to the primary"""
+    healthy = True
+
+    async def check(self):
+        pass
+
+
+@pytest.fixture
+def course_id(client):
+    return client.get("/courses", params={"limit": 1}).json()[0]["course_id"]
+
+
+@pytest.fixture
+def with_replica(course_id, monkeypatch):
+    monkeypatch.setattr(replica_router, "replicas", [StubReplica()])
+
+
+def post_rating(client, base_url, course_id):
+    response = client.post(f"{base_url}/ratings", json={"course_id": course_id, "rating": 4, "review": "Cookie check"})
+    assert response.status_code == 200, response.text
+    return response.headers["set-cookie"]
+
+
+def test_cookie_over_http(client, course_id, with_replica):
+    cookie = post_rating(client, "http://testserver", course_id)
+    assert cookie.startswith(f"{READ_PRIMARY_COOKIE}=")
+    assert "HttpOnly" in cookie and "SameSite=lax" in cookie
+    assert "Secure" not in cookie
+
+
+def test_cookie_over_https_is_secure(client, course_id, with_replica):
+    cookie = post_rating(client, "https://testserver", course_id)
+    assert "Secure" in cookie and "SameSite=lax" in cookie
+
+
+def test_no_cookie_without_replicas(client, course_id):
+    response = client.post("/ratings", json={"course_id": course_id, "rating": 4, "review": "Cookie check"})
+    assert "set-cookie" not in response.headers
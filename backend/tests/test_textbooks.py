@@ -0,0 +1,48 @@
+"""Textbook resolution and its cache (see textbooks.py)"""
+
+import pytest
+from sqlalchemy import update
+from database import Book, SessionLocal
+from textbooks import resolve_textbooks, textbook_cache, textbook_key
+
+
+@pytest.fixture
+def db(client):
+    textbook_cache.clear()
+    session = SessionLocal()
+    yield session
+    session.close()
+    textbook_cache.clear()
+
+
+def test_committed_books_are_cached(db):
+    book_id = resolve_textbooks(db, ["Committed Textbook"])["Committed Textbook"]
+    assert textbook_cache.get(textbook_key("Committed Textbook")) is None
+    db.commit()
+    assert textbook_cache.get(textbook_key("Committed Textbook")) == book_id
+    assert resolve_textbooks(db, ["committed  textbook!"]) == {"committed  textbook!": book_id}
+
+
+def test_rolled_back_books_are_not_cached(db):
+    # As in the item-by-item retry of insert_rating_chunk: an earlier item creates
+    # the book, a later one finds it inside a savepoint, then the transaction rolls back.
+    # SQLite's driver only opens a transaction before DML, so start one first
+    db.execute(update(Book).where(Book.book_id < 0).values(title=None))
+    created = resolve_textbooks(db, ["Rolled Back Textbook"])["Rolled Back Textbook"]
+    with db.begin_nested():
+        assert resolve_textbooks(db, ["Rolled Back Textbook"])["Rolled Back Textbook"] == created
+    db.rollback()
+
+    assert textbook_cache.get(textbook_key("Rolled Back Textbook")) is None
+    assert db.get(Book, created) is None
+    # Resolved again from the database, not from a dangling id
+    book_id = resolve_textbooks(db, ["Rolled Back Textbook"])["Rolled Back Textbook"]
+    db.commit()
+    assert db.get(Book, book_id) is not None
+    assert textbook_cache.get(textbook_key("Rolled Back Textbook")) == book_id
+
+
+def test_isbn_forms_resolve_to_one_book(db):
+    resolved = resolve_textbooks(db, ["0-13-110362-8", "978-0131103627"])
+    db.commit()
+    assert resolved["0-13-110362-8"] == resolved["978-0131103627"]
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Textbook resolution for rating submissions.
+
+A submitted textbook is a free-text ISBN or title. Both are reduced to a
+canonical lookup key before touching the database:
+
+- ISBNs are stripped of hyphens/spaces and ISBN-10s are converted to
+  ISBN-13, so "0-13-110362-8" and "9780131103627" are the same book.
+- Titles are case-folded with punctuation and extra whitespace removed,
+  then hashed into the indexed books.title_hash column.
+
+resolve_textbooks maps a batch of textbooks to book ids with at most one
+indexed lookup, creating missing books with a single multi-row insert.
+Keys of committed books are remembered in a bounded LRU shared by every
+endpoint (TEXTBOOK_CACHE_SIZE entries, default 10000). Keys looked up or
+created inside a transaction are only added once it commits: a book
+flushed earlier in the same transaction disappears if it rolls back.
+
+Usage:
+    python textbooks.py backfill   # add title_hash, canonicalize ISBNs and merge duplicate books
+"""
+
+import hashlib
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from sqlalchemy import event, insert, inspect, or_, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal, engine, Book, Rating
+
+TEXTBOOK_CACHE_SIZE = int(os.getenv("TEXTBOOK_CACHE_SIZE", "10000"))
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def is_isbn(textbook: str) -> bool:
+    """Guess whether a textbook string is an ISBN rather than a title"""
+    stripped = textbook.replace("-", "").replace(" ", "")
+    return stripped[:-1].isdigit() and (stripped[-1].isdigit() or stripped[-1] in "xX")
+
+
+def _isbn13_check_digit(first12: str) -> str:
+    total = sum(int(digit) * (1 if position % 2 == 0 else 3) for position, digit in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def _valid_isbn10(isbn: str) -> bool:
+    total = sum((10 - position) * (10 if char == "X" else int(char)) for position, char in enumerate(isbn))
+    return total % 11 == 0
+
+
+def canonical_isbn(textbook: str) -> str:
+    """ISBN-13 for a valid ISBN-10/13, otherwise the ISBN with separators removed"""
+    isbn = textbook.replace("-", "").replace(" ", "").upper()
+    if len(isbn) == 10 and _valid_isbn10(isbn):
+        body = "978" + isbn[:9]
+        return body + _isbn13_check_digit(body)
+    return isbn
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", title.casefold()).split())
+
+
+def title_hash(title: str) -> str:
+    return hashlib.sha1(normalize_title(title).encode("utf-8")).hexdigest()
+
+
+def textbook_key(textbook: str):
+    """Canonical ('isbn', value) or ('title', hash) lookup key for a textbook string"""
+    if is_isbn(textbook):
+        return ("isbn", canonical_isbn(textbook))
+    return ("title", title_hash(textbook))
+
+
+class TextbookCache:
+    """Bounded LRU of textbook key -> book_id for committed books"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key) -> Optional[int]:
+        with self._lock:
+            book_id = self._entries.get(key)
+            if book_id is not None:
+                self._entries.move_to_end(key)
+            return book_id
+
+    def put(self, key, book_id: int):
+        with self._lock:
+            self._entries[key] = book_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+textbook_cache = TextbookCache(TEXTBOOK_CACHE_SIZE)
+
+# Session.info key of the {textbook key: book_id} to cache when the session commits
+_PENDING_CACHE_KEY = "textbook_cache_pending"
+
+
+def _remember_on_commit(db: Session, found: Dict[tuple, int]):
+    db.info.setdefault(_PENDING_CACHE_KEY, {}).update(found)
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_books(db: Session):
+    if db.in_nested_transaction():
+        # A savepoint was released; the enclosing transaction can still roll back
+        return
+    for key, book_id in db.info.pop(_PENDING_CACHE_KEY, {}).items():
+        textbook_cache.put(key, book_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_uncommitted_books(db: Session, previous_transaction):
+    # Any rollback, a savepoint's too, may have removed books found since the last commit
+    db.info.pop(_PENDING_CACHE_KEY, None)
+
+
+def _lookup(db: Session, keys) -> Dict[tuple, int]:
+    isbns = [value for kind, value in keys if kind == "isbn"]
+    hashes = [value for kind, value in keys if kind == "title"]
+    conditions = []
+    if isbns:
+        conditions.append(Book.isbn.in_(isbns))
+    if hashes:
+        conditions.append(Book.title_hash.in_(hashes))
+    found = {}
+    rows = db.query(Book.book_id, Book.isbn, Book.title_hash).filter(or_(*conditions)).order_by(Book.book_id)
+    for book_id, isbn, book_title_hash in rows:
+        for key in (("isbn", isbn), ("title", book_title_hash)):
+            if key in keys and key not in found:
+                found[key] = book_id
+    return found
+
+
+def resolve_textbooks(db: Session, textbooks: Iterable[str]) -> Dict[str, int]:
+    """Map each textbook string to a book_id, creating missing books (caller commits)"""
+    keys = {textbook: textbook_key(textbook) for textbook in textbooks if textbook}
+    if not keys:
+        return {}
+
+    by_key = {}
+    for key in set(keys.values()):
+        book_id = textbook_cache.get(key)
+        if book_id is not None:
+            by_key[key] = book_id
+
+    wanted = set(keys.values()) - by_key.keys()
+    if wanted:
+        found = _lookup(db, wanted)
+        _remember_on_commit(db, found)
+        by_key.update(found)
+
+        missing = wanted - found.keys()
+        if missing:
+            originals = {key: textbook for textbook, key in keys.items()}
+            rows = [
+                {"isbn": value} if kind == "isbn" else {"title": originals[(kind, value)], "title_hash": value}
+                for kind, value in missing
+            ]
+            try:
+                with db.begin_nested():
+                    db.execute(insert(Book), rows)
+            except IntegrityError:
+                # A concurrent writer created some of these ISBNs; add the rest one at a time
+                for row in rows:
+                    try:
+                        with db.begin_nested():
+                            db.execute(insert(Book), [row])
+                    except IntegrityError:
+                        pass
+            created = _lookup(db, missing)
+            _remember_on_commit(db, created)
+            by_key.update(created)
+
+    return {textbook: by_key[key] for textbook, key in keys.items() if key in by_key}
+
+
+def resolve_textbook(db: Session, textbook: str) -> Optional[int]:
+    """book_id for a single textbook string, creating the book if needed"""
+    return resolve_textbooks(db, [textbook]).get(textbook)
+
+
+def ensure_title_hash_column(bind=engine):
+    """Add books.title_hash and its index to databases created before it existed"""
+    inspector = inspect(bind)
+    if "title_hash" in {column["name"] for column in inspector.get_columns("books")}:
+        return
+    with bind.begin() as conn:
+        conn.execute(text("ALTER TABLE books ADD COLUMN title_hash VARCHAR(40)"))
+        conn.execute(text("CREATE INDEX ix_books_title_hash ON books (title_hash)"))
+
+
+def backfill_books(db: Session):
+    """
+    Canonicalize ISBNs, fill title_hash and merge duplicate books.
+
+    Returns (books updated, books merged away). Ratings of merged books are
+    moved to the surviving (lowest id) book.
+    """
+    groups = {}
+    for book in db.query(Book).order_by(Book.book_id):
+        if book.isbn:
+            key = ("isbn", canonical_isbn(book.isbn))
+        elif book.title:
+            key = ("title", title_hash(book.title))
+        else:
+            continue
+        groups.setdefault(key, []).append(book)
+
+    updated = 0
+    merged = 0
+    for (kind, value), books in groups.items():
+        survivor, duplicates = books[0], books[1:]
+        if duplicates:
+            duplicate_ids = [book.book_id for book in duplicates]
+            db.query(Rating).filter(Rating.book_id.in_(duplicate_ids)).update(
+                {Rating.book_id: survivor.book_id}, synchronize_session=False
+            )
+            if not survivor.title:
+                survivor.title = next((book.title for book in duplicates if book.title), None)
+            # Bulk delete: a session delete would load the books' ratings with every
+            # model column, which migrations run before later columns exist
+            for book in duplicates:
+                db.expunge(book)
+            db.flush()
+            # Delete before re-keying the survivor so the unique ISBN is free
+            db.query(Book).filter(Book.book_id.in_(duplicate_ids)).delete(synchronize_session=False)
+            merged += len(duplicates)
+
+        canonical = value if kind == "isbn" else survivor.isbn
+        new_hash = title_hash(survivor.title) if survivor.title else None
+        if survivor.isbn != canonical or survivor.title_hash != new_hash:
+            survivor.isbn = canonical
+            survivor.title_hash = new_hash
+            updated += 1
+
+    db.commit()
+    textbook_cache.clear()
+    return updated, merged
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] != "backfill":
+        print("Usage: python textbooks.py backfill")
+        sys.exit(2)
+
+    db = SessionLocal()
+    try:
+        ensure_title_hash_column()
+        updated, merged = backfill_books(db)
+        print(f"✓ Normalized {updated} books, merged {merged} duplicates")
+        print("Restart the API so its textbook cache forgets merged books.")
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -77,11 +77,34 @@ function Home() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
 
   useEffect(() => {
     loadCourses();
   }, []);
 
+  // Typeahead: ask for suggestions once typing pauses
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const data = await api.suggestCourses(term);
+        if (!cancelled) setSuggestions(data);
+      } catch (err) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm]);
+
   const loadCourses = async (search = '') => {
     try {
       setLoading(true);
@@ -123,7 +146,16 @@ function Home() {
                   placeholder="Search by Course Name, Course Number, Major..."
                   value={searchTerm}
                   onChange={(e) => setSearchTerm(e.target.value)}
+                  list="course-suggestions"
+                  autoComplete="off"
                 />
+                <datalist id="course-suggestions">
+                  {suggestions.map((course) => (
+                    <option key={course.course_id} value={course.course_number}>
+                      {course.course_name}
+                    </option>
+                  ))}
+                </datalist>
                 <button
                   type="submit"
                   className="absolute right-2 top-1/2 -translate-y-1/2 p-2 text-retro-cyan hover:text-retro-pink transition-colors"
@@ -1,11 +1,17 @@
 // API Configuration
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// Send and store the API's cookies: after a write, the API sets a cookie that
+// keeps this browser's reads on the primary database until replicas catch up
+function apiFetch(url, options = {}) {
+  return fetch(url, { credentials: 'include', ...options });
+}
+
 // API Service Functions
 export const api = {
   // Get all schools
   async getSchools() {
-    const response = await fetch(`${API_BASE_URL}/schools`);
+    const response = await apiFetch(`${API_BASE_URL}/schools`);
     if (!response.ok) {
       throw new Error('Failed to load schools');
     }
@@ -14,7 +20,7 @@ export const api = {
 
   // Get courses for a specific school
   async getCoursesBySchool(schoolId) {
-    const response = await fetch(`${API_BASE_URL}/schools/${schoolId}/courses`);
+    const response = await apiFetch(`${API_BASE_URL}/schools/${schoolId}/courses`);
     if (!response.ok) {
       throw new Error('Failed to load courses');
     }
@@ -27,16 +33,27 @@ export const api = {
       ? `${API_BASE_URL}/courses?search=${encodeURIComponent(searchTerm)}`
       : `${API_BASE_URL}/courses`;
     
-    const response = await fetch(url);
+    const response = await apiFetch(url);
     if (!response.ok) {
       throw new Error('Failed to load courses');
     }
     return response.json();
   },
 
+  // Course suggestions for the search box (number or name prefix)
+  async suggestCourses(query, limit = 8) {
+    const response = await apiFetch(
+      `${API_BASE_URL}/courses/suggest?q=${encodeURIComponent(query)}&limit=${limit}`
+    );
+    if (!response.ok) {
+      throw new Error('Failed to load suggestions');
+    }
+    return response.json();
+  },
+
   // Get a specific course by ID
   async getCourse(courseId) {
-    const response = await fetch(`${API_BASE_URL}/courses/${courseId}`);
+    const response = await apiFetch(`${API_BASE_URL}/courses/${courseId}`);
     if (!response.ok) {
       throw new Error('Failed to load course');
     }
@@ -45,7 +62,7 @@ export const api = {
 
   // Get course detail with all ratings
   async getCourseDetail(courseId) {
-    const response = await fetch(`${API_BASE_URL}/courses/${courseId}/detail`);
+    const response = await apiFetch(`${API_BASE_URL}/courses/${courseId}/detail`);
     if (!response.ok) {
       throw new Error('Failed to load course details');
     }
@@ -54,7 +71,7 @@ export const api = {
 
   // Create a new course with rating (admin only)
   async createCourse(courseData, token) {
-    const response = await fetch(`${API_BASE_URL}/courses`, {
+    const response = await apiFetch(`${API_BASE_URL}/courses`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -73,7 +90,7 @@ export const api = {
 
   // Create a rating for an existing course (no auth required)
   async createRating(ratingData) {
-    const response = await fetch(`${API_BASE_URL}/ratings`, {
+    const response = await apiFetch(`${API_BASE_URL}/ratings`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -91,7 +108,7 @@ export const api = {
 
   // Admin login
   async login(username, password) {
-    const response = await fetch(`${API_BASE_URL}/auth/login`, {
+    const response = await apiFetch(`${API_BASE_URL}/auth/login`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',